@@ -252,6 +252,7 @@ def setScratchWorkspace():
 ## =============================================== Main Body ====================================================
 
 import arcpy, sys, os, traceback
+import HEL_Buffer
 
 # Set overwrite
 arcpy.env.overwriteOutput = True
@@ -281,14 +282,14 @@ try:
     # Variables
     WGS84_DEM =    os.path.join(os.path.dirname(sys.argv[0]), "scratch.gdb" + os.sep + "WGS84_DEM")
     final_DEM =    os.path.join(os.path.dirname(sys.argv[0]), "scratch.gdb" + os.sep + "Downloaded_DEM")
-    clu_buffer =   os.path.join(os.path.dirname(sys.argv[0]), "scratch.gdb" + os.sep + "CLU_Buffer")
-    clu_buff_wgs = os.path.join(os.path.dirname(sys.argv[0]), "scratch.gdb" + os.sep + "CLU_Buffer_WGS")
 
-    # Buffer the selected CLUs by 400m
+    # Extent of the selected CLUs buffered by 410m, computed from the CLU vertices (HEL_Buffer.py) instead of Buffer
     arcpy.AddMessage("\nBuffering input CLU fields...")
     # Use 410 meter radius so that you have a bit of extra area for the HEL Determination tool to clip against
     # This distance is designed to minimize problems of no data crashes if the HEL Determiation tool's resampled 3-meter DEM doesn't perfectly snap with results from this tool.
-    arcpy.Buffer_analysis(source_clu, clu_buffer, "410 Meters", "FULL", "", "ALL", "")
+    clu_sr = arcpy.Describe(source_clu).spatialReference
+    vertices = arcpy.da.FeatureClassToNumPyArray(source_clu, ["SHAPE@X","SHAPE@Y"], explode_to_points=True)
+    buffer_ext = HEL_Buffer.bufferedExtent(vertices["SHAPE@X"], vertices["SHAPE@Y"], 410 / clu_sr.metersPerUnit)
     arcpy.AddMessage("Done!\n")
 
     # Delete the all posible temp datasets if they already exist
@@ -302,21 +303,19 @@ try:
             arcpy.Delete_management(final_DEM)
         except:
             pass
-    if arcpy.Exists(clu_buff_wgs):
-        try:
-            arcpy.Delete_management(clu_buff_wgs)
-        except:
-            pass
 
-    # Re-project the AOI to WGS84 Geographic (EPSG WKID: 4326)
+    # Re-project a densified outline of the buffered extent to WGS84 Geographic (EPSG WKID: 4326)
     arcpy.AddMessage("\nConverting CLU Buffer to WGS 1984...")
     wgs_CS = arcpy.SpatialReference(4326)
-    arcpy.Project_management(clu_buffer, clu_buff_wgs, wgs_CS)
+    buffer_outline = arcpy.Polygon(arcpy.Array([arcpy.Point(x,y) for x,y in HEL_Buffer.densifyExtent(buffer_ext)]), clu_sr)
     arcpy.AddMessage("Done!\n")
 
     # Use the WGS 1984 AOI to clip/extract the DEM from the service
     arcpy.AddMessage("\nDownloading Data...")
-    aoi_ext = arcpy.Describe(clu_buff_wgs).extent
+    if clu_sr.GCS.name != wgs_CS.GCS.name:
+        aoi_ext = buffer_outline.projectAs(wgs_CS, "WGS_1984_(ITRF00)_To_NAD_1983").extent
+    else:
+        aoi_ext = buffer_outline.projectAs(wgs_CS).extent
     xMin = aoi_ext.XMin
     yMin = aoi_ext.YMin
     xMax = aoi_ext.XMax
@@ -336,8 +335,6 @@ try:
     # Delete temporary data
     arcpy.AddMessage("\nCleaning up...")
     arcpy.Delete_management(WGS84_DEM)
-    arcpy.Delete_management(clu_buff_wgs)
-    arcpy.Delete_management(clu_buffer)
     arcpy.AddMessage("Done!\n")
 
     # Add resulting data to map
@@ -0,0 +1,356 @@
+# ==========================================================================================
+# Name:   HEL Batch Determination
+#
+# Runs the NRCS HEL Determination tool for a worklist of tracts without ArcMap.  Every
+# tract is run as its own NRCS_HEL_Determination.py process in batch mode: the CLU fields
+# are selected by attribute (no CLU selection or map document is needed) and the outputs
+# are written to a copy of HEL.mdb in a folder for the tract.  A summary of the field
+# determinations of all tracts is written to HEL_Batch_Summary.csv in the output folder.
+#
+# Tracts are distributed over a pool of workers (one per core by default).  Every tract
+# process has its own HEL.mdb and scratch.gdb in its tract folder so processes never share
+# outputs or scratch data.  When all tracts are done the Field Determination, Initial and
+# Final HEL Summary layers are merged into HEL_Batch.gdb.  The LiDAR HEL rasters stay in the
+# HEL.mdb of every tract (one raster over the bounding box of a state would be mostly NoData
+# and tracts can be in different UTM zones); their paths are listed in the summary.
+#
+# The worklist is a CSV file or a table (dbf, geodatabase table) with a TRACTNBR column.
+# Every other column that matches a field of the CLU layer (i.e. FARMNBR, ADMNSTATE,
+# ADMNCOU) is added to the selection.  An optional CUSTOMER column is used as the customer
+# name of the 026 form.
+#
+# The DEM can be a raster or image service, a virtual mosaic (*.vmosaic.json written by Merge
+# Local DEMs by CLU), the 3 meter DEM store (HEL_DEM_Store.vmosaic.json written by
+# HEL_Build_DEM_Store.py) or a folder of LAS files.  The last three are batch only: the Input
+# DEM parameter of the tool dialog is a raster layer.
+#
+# Usage:
+#   python HEL_Batch.py <worklist> <CLU feature class> <HEL soil layer> <DEM> <z units>
+#                       <DC signature> <use runoff LS: true|false> <output folder> [workers]
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial batch runner driven by a tract worklist.
+# - Tracts are run in parallel by a pool of workers and the results are merged.
+# - LiDAR HEL rasters are kept per tract instead of mosaicked into one raster.
+
+## ===================================================================================
+def AddMsgAndPrint(msg, severity=0):
+    # prints message to screen and adds tool message to the geoprocessor
+
+    try:
+        print(msg)
+
+        if severity == 0:
+            arcpy.AddMessage(msg)
+
+        elif severity == 1:
+            arcpy.AddWarning(msg)
+
+        elif severity == 2:
+            arcpy.AddError(msg)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+# Print traceback exceptions.  If sys.exit was trapped by default exception then
+# ignore traceback message.
+
+    try:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        theMsg = "\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[1] + "\n\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[-1]
+
+        if theMsg.find("sys.exit") > -1:
+            AddMsgAndPrint("\n\n")
+            pass
+        else:
+            AddMsgAndPrint("\n\tHEL Batch Error: -------------------------",2)
+            AddMsgAndPrint(theMsg,2)
+
+    except:
+        AddMsgAndPrint("Unhandled error in errorMsg method", 2)
+        pass
+
+## ===================================================================================
+def readWorklist(worklist):
+    # This function reads the tract worklist from a CSV file or a table.
+    # returns a list of column names and a list of rows as dictionaries
+
+    try:
+        if os.path.splitext(worklist)[1].lower() in ('.csv','.txt'):
+            with open(worklist,'rb') as f:
+                reader = csv.DictReader(f)
+                columns = [col.strip() for col in reader.fieldnames]
+                rows = list()
+                for row in reader:
+                    rows.append(dict([(key.strip(),(val or '').strip()) for key,val in row.items() if key]))
+
+        else:
+            columns = [fld.name for fld in arcpy.ListFields(worklist) if not fld.type in ('OID','Geometry')]
+            rows = [dict(zip(columns,row)) for row in arcpy.da.SearchCursor(worklist,columns)]
+
+        return columns,rows
+
+    except:
+        errorMsg()
+        return None,None
+
+## ===================================================================================
+def buildJobs(worklist,cluLayer):
+    # This function matches the worklist columns to the CLU fields and builds one job per
+    # unique tract.  Each job has an ID, an attribute where clause that selects its CLU
+    # fields and a customer name.
+    # returns a list of job dictionaries
+
+    try:
+        columns,rows = readWorklist(worklist)
+        if columns is None:
+            return list()
+
+        cluFields = dict([(fld.name.upper(),fld) for fld in arcpy.ListFields(cluLayer)])
+
+        keyColumns = [col for col in columns if col.upper() in cluFields]
+        if not "TRACTNBR" in [col.upper() for col in keyColumns]:
+            AddMsgAndPrint("\nThe worklist must have a TRACTNBR column. Exiting!",2)
+            return list()
+
+        # TRACTNBR first so the job IDs read tract, farm...
+        keyColumns.sort(key=lambda col: col.upper() != "TRACTNBR")
+        customerColumn = [col for col in columns if col.upper() == "CUSTOMER"]
+
+        jobs = list()
+        jobIDs = set()
+        for row in rows:
+            if row.get(keyColumns[0]) in (None,''):
+                continue
+
+            clauses = list()
+            idParts = list()
+            for col in keyColumns:
+                value = row.get(col)
+                if value in (None,''):
+                    continue
+
+                fld = cluFields[col.upper()]
+                if fld.type == "String":
+                    clauses.append(arcpy.AddFieldDelimiters(cluLayer,fld.name) + " = '" + str(value).replace("'","''") + "'")
+                else:
+                    clauses.append(arcpy.AddFieldDelimiters(cluLayer,fld.name) + " = " + str(int(float(value))))
+                idParts.append(fld.name + "_" + str(value))
+
+            jobID = "_".join(idParts)
+            if jobID in jobIDs:
+                continue
+            jobIDs.add(jobID)
+
+            jobs.append({'id':jobID,
+                         'where':" AND ".join(clauses),
+                         'customer':str(row.get(customerColumn[0]) or '') if customerColumn else ''})
+
+        return jobs
+
+    except:
+        errorMsg()
+        return list()
+
+## ===================================================================================
+def runTract(job,toolParams,outputFolder):
+    # This function runs NRCS_HEL_Determination.py in batch mode for one tract in its own
+    # process.  The tool messages are logged to HEL_Batch_Log.txt in the tract folder.
+    # returns the job dictionary updated with the tract folder, exit code and run time
+
+    try:
+        tractFolder = os.path.join(outputFolder,job['id'])
+        if not os.path.isdir(tractFolder):
+            os.makedirs(tractFolder)
+
+        # Results of a previous run should not be reported for this one
+        fieldDetermination = os.path.join(tractFolder,'HEL.mdb','Field_Determination')
+        if arcpy.Exists(fieldDetermination):
+            arcpy.Delete_management(fieldDetermination)
+
+        cluLayer,helLayer,inputDEM,zUnits,dcSignature,use_runoff_ls = toolParams
+        args = [sys.executable,helScript,cluLayer,helLayer,inputDEM,zUnits,dcSignature,job['customer'],use_runoff_ls,
+                job['where'],tractFolder]
+
+        startTime = time.time()
+        with open(os.path.join(tractFolder,'HEL_Batch_Log.txt'),'w') as log:
+            exitCode = subprocess.call(args,stdout=log,stderr=subprocess.STDOUT)
+
+        job['folder'] = tractFolder
+        job['exitCode'] = exitCode
+        job['seconds'] = time.time() - startTime
+        return job
+
+    except:
+        errorMsg()
+        job['exitCode'] = -1
+        job['seconds'] = 0
+        return job
+
+## ===================================================================================
+def readResults(job):
+    # This function reads the field determinations of a tract from its HEL.mdb.  The tract
+    # failed if the Field Determination layer was not populated.
+    # returns a list of (CLUNBR, HEL_YES, HEL_Acres, HEL_Pct) tuples
+
+    try:
+        fieldDetermination = os.path.join(job.get('folder',''),'HEL.mdb','Field_Determination')
+        if not arcpy.Exists(fieldDetermination):
+            return list()
+
+        fields = ["CLUNBR","HEL_YES","HEL_Acres","HEL_Pct"]
+        if len([fld for fld in arcpy.ListFields(fieldDetermination) if fld.name in fields]) != len(fields):
+            return list()
+
+        return sorted([row for row in arcpy.da.SearchCursor(fieldDetermination,fields)])
+
+    except:
+        errorMsg()
+        return list()
+
+## ===================================================================================
+def runTracts(jobs,toolParams,outputFolder,workers):
+    # This function distributes the tracts over a pool of workers.  Every worker starts one
+    # NRCS_HEL_Determination.py process at a time so the pool only needs threads to wait on
+    # them; the geoprocessing itself runs in the tract processes.
+    # returns the list of jobs in the order they finished
+
+    try:
+        def runJob(job):
+            return runTract(job,toolParams,outputFolder)
+
+        pool = ThreadPool(workers)
+        finished = list()
+        try:
+            for job in pool.imap_unordered(runJob,jobs):
+                finished.append(job)
+                status = "Finished" if job.get('exitCode') == 0 else "Exited with code " + str(job.get('exitCode'))
+                AddMsgAndPrint("\t" + str(len(finished)) + " of " + str(len(jobs)) + ": " + job['id'] + " -- " + status + " in " + "%.1f" % job.get('seconds',0) + " seconds")
+        finally:
+            pool.close()
+            pool.join()
+
+        return finished
+
+    except:
+        errorMsg()
+        return list()
+
+## ===================================================================================
+def mergeResults(jobs,outputFolder):
+    # This function merges the Field Determination, Initial and Final HEL Summary layers of every
+    # tract that completed into HEL_Batch.gdb in the output folder.  LiDAR HEL rasters are not
+    # merged (see lidarRaster).
+    # returns the path to HEL_Batch.gdb
+
+    try:
+        mergeGDB = os.path.join(outputFolder,'HEL_Batch.gdb')
+        if not arcpy.Exists(mergeGDB):
+            arcpy.CreateFileGDB_management(outputFolder,'HEL_Batch.gdb')
+
+        completed = [job for job in jobs if readResults(job)]
+        arcpy.env.overwriteOutput = True
+
+        for layer in ('Field_Determination','Initial_HEL_Summary','Final_HEL_Summary'):
+            inputs = [os.path.join(job['folder'],'HEL.mdb',layer) for job in completed]
+            inputs = [fc for fc in inputs if arcpy.Exists(fc)]
+            if inputs:
+                arcpy.Merge_management(inputs,os.path.join(mergeGDB,layer))
+
+        return mergeGDB
+
+    except:
+        errorMsg()
+        return False
+
+## ===================================================================================
+def lidarRaster(job):
+    # This function returns the LiDAR HEL raster of a tract.  Tracts that did not need LiDAR
+    # do not have one.
+    # returns the path to the raster or an empty string
+
+    raster = os.path.join(job.get('folder',''),'HEL.mdb','LiDAR_HEL_Summary')
+    return raster if arcpy.Exists(raster) else ""
+
+## ===================================================================================
+def writeSummary(jobs,outputFolder):
+    # This function writes one line per field of every tract to HEL_Batch_Summary.csv.
+    # Tracts that failed are written once with a status of Failed.
+    # returns the path to the summary
+
+    try:
+        summaryPath = os.path.join(outputFolder,'HEL_Batch_Summary.csv')
+        with open(summaryPath,'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Job","Status","Seconds","CLUNBR","HEL_YES","HEL_Acres","HEL_Pct","Output","LiDAR_HEL"])
+
+            for job in jobs:
+                results = readResults(job)
+                seconds = "%.1f" % job.get('seconds',0)
+                if results:
+                    raster = lidarRaster(job)
+                    for clu,helYes,helAcres,helPct in results:
+                        writer.writerow([job['id'],"Complete",seconds,clu,helYes,"%.2f" % (helAcres or 0),"%.2f" % (helPct or 0),job['folder'],raster])
+                else:
+                    writer.writerow([job['id'],"Failed",seconds,"","","","",job.get('folder',''),""])
+
+        return summaryPath
+
+    except:
+        errorMsg()
+        return False
+
+## ====================================== Main Body ==================================
+import sys, os, traceback, csv, time, subprocess, multiprocessing
+from multiprocessing.pool import ThreadPool
+import arcpy
+
+if __name__ == '__main__':
+
+    try:
+        if len(sys.argv) < 9:
+            AddMsgAndPrint("\nUsage: python HEL_Batch.py <worklist> <CLU feature class> <HEL soil layer> <DEM> <z units> <DC signature> <use runoff LS: true|false> <output folder> [workers]",2)
+            sys.exit()
+
+        worklist = sys.argv[1]
+        cluLayer = sys.argv[2]
+        helLayer = sys.argv[3]
+        inputDEM = sys.argv[4]
+        zUnits = sys.argv[5]
+        dcSignature = sys.argv[6]
+        use_runoff_ls = sys.argv[7]
+        outputFolder = sys.argv[8]
+        workers = int(sys.argv[9]) if len(sys.argv) > 9 else multiprocessing.cpu_count()
+
+        helScript = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])),'NRCS_HEL_Determination.py')
+        if not os.path.isdir(outputFolder):
+            os.makedirs(outputFolder)
+
+        jobs = buildJobs(worklist,cluLayer)
+        if not jobs:
+            AddMsgAndPrint("\nThere are no tracts to process in " + worklist + ". Exiting!",2)
+            sys.exit()
+
+        workers = max(1,min(workers,len(jobs)))
+        AddMsgAndPrint("\nProcessing " + str(len(jobs)) + " tract(s) with " + str(workers) + " worker(s)\n")
+        toolParams = (cluLayer,helLayer,inputDEM,zUnits,dcSignature,use_runoff_ls)
+        batchStart = time.time()
+
+        runTracts(jobs,toolParams,outputFolder,workers)
+
+        AddMsgAndPrint("\nMerging tract results")
+        mergeGDB = mergeResults(jobs,outputFolder)
+        summaryPath = writeSummary(jobs,outputFolder)
+        failed = len([job for job in jobs if not readResults(job)])
+
+        AddMsgAndPrint("\nProcessed " + str(len(jobs) - failed) + " of " + str(len(jobs)) + " tract(s) in " + "%.1f" % (time.time() - batchStart) + " seconds")
+        if failed:
+            AddMsgAndPrint("\t" + str(failed) + " tract(s) failed. See HEL_Batch_Log.txt in the tract folder",1)
+        AddMsgAndPrint("\tSummary: " + str(summaryPath))
+        AddMsgAndPrint("\tMerged outputs: " + str(mergeGDB))
+
+    except:
+        errorMsg()
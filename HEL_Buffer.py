@@ -0,0 +1,168 @@
+# ==========================================================================================
+# Name:   HEL Buffer
+#
+# Buffer helpers for DEM extraction in the NRCS HEL Determination tools.  DEM extraction only
+# needs the extent of the CLU fields buffered by 410 meters, yet every tool ran a full
+# Buffer_analysis (and sometimes a Project of the buffer) just to read its extent.  The
+# extent of a round buffer is the extent of the polygon vertices grown by the buffer
+# distance, so it is computed straight from the vertex arrays:
+#
+#  - bufferedExtent returns the buffered bounding box from the vertex coordinates.
+#  - densifyExtent returns the outline of a box with extra vertices along every side so
+#    that projecting it to another coordinate system (i.e. WGS84) keeps the curved sides
+#    of the box inside the projected extent.
+#  - bufferMask rasterizes the true buffer onto a DEM grid for the tools that need a buffer
+#    mask (ExtractByMask): a cell is in the buffer when its center is inside a polygon or
+#    within the buffer distance of a polygon edge.  The polygons, the rectangles along
+#    every edge and the disks around every vertex are filled as row spans and accumulated
+#    in one vectorized pass.
+#
+# This module does not import arcpy (see bufferedAOIExtent in NRCS_HEL_Determination.py).
+# Grid rows run from north to south the same as arcpy.RasterToNumPyArray.
+#
+# Running this script directly checks bufferMask against a brute force distance test:
+#     python HEL_Buffer.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial vertex based buffered extent, densified outline and rasterized buffer mask.
+
+import sys, math
+import numpy as np
+import HEL_Rasterize
+
+## ===================================================================================
+def bufferedExtent(xs, ys, distance):
+    """ Returns the (xMin, yMin, xMax, yMax) extent of the vertices grown by distance.
+        This is the exact extent of a round buffer of the polygons. """
+
+    xs = np.asarray(xs, dtype=np.float64); ys = np.asarray(ys, dtype=np.float64)
+    return (float(xs.min() - distance), float(ys.min() - distance), float(xs.max() + distance), float(ys.max() + distance))
+
+## ===================================================================================
+def densifyExtent(extent, segments=32):
+    """ Returns the closed outline of an extent as a list of (x, y) with segments
+        vertices along every side """
+
+    xMin, yMin, xMax, yMax = extent
+    t = np.arange(segments, dtype=np.float64) / segments
+    xs = np.concatenate((xMin + t * (xMax - xMin), np.full(segments, xMax), xMax - t * (xMax - xMin), np.full(segments, xMin)))
+    ys = np.concatenate((np.full(segments, yMin), yMin + t * (yMax - yMin), np.full(segments, yMax), yMax - t * (yMax - yMin)))
+    points = list(zip(xs.tolist(), ys.tolist()))
+    return points + points[:1]
+
+## ===================================================================================
+def diskSpans(cx, cy, radius, xMin, yMax, cellSize, rows, cols):
+    """ Returns the row, start column and end column (exclusive) of the cell centers
+        inside the disks of radius around every (cx, cy) """
+
+    cx = np.asarray(cx, dtype=np.float64); cy = np.asarray(cy, dtype=np.float64)
+    rFirst = np.maximum(np.ceil((yMax - (cy + radius)) / cellSize - 0.5).astype(np.int64), 0)
+    rLast = np.minimum(np.floor((yMax - (cy - radius)) / cellSize - 0.5).astype(np.int64), rows - 1)
+
+    counts = np.maximum(rLast - rFirst + 1, 0)
+    if not counts.sum():
+        return None
+
+    idx = np.repeat(np.arange(counts.size), counts)
+    rowIdx = rFirst[idx] + (np.arange(idx.size) - np.repeat(np.cumsum(counts) - counts, counts))
+    dy = yMax - (rowIdx + 0.5) * cellSize - cy[idx]
+    halfWidth = np.sqrt(np.maximum(radius * radius - dy * dy, 0.0))
+
+    cStart = np.clip(np.ceil((cx[idx] - halfWidth - xMin) / cellSize - 0.5).astype(np.int64), 0, cols)
+    cEnd = np.clip(np.floor((cx[idx] + halfWidth - xMin) / cellSize - 0.5).astype(np.int64) + 1, 0, cols)
+    return rowIdx, cStart, cEnd
+
+## ===================================================================================
+def bufferMask(polygons, distance, lowerLeft, cellSize, rows, cols):
+    """ Rasterizes the round buffer of a list of polygons (each a list of rings of (x, y)
+        vertices) onto a grid that starts at the lowerLeft (x, y) corner.  Returns a
+        boolean array that is True where the cell center is in the buffer. """
+
+    xMin, yMin = lowerLeft
+    yMax = yMin + rows * cellSize
+
+    spanRows = list(); spanStarts = list(); spanEnds = list()
+    def addSpans(spans):
+        if spans is not None:
+            spanRows.append(spans[0]); spanStarts.append(spans[1]); spanEnds.append(spans[2])
+
+    vertices = list()
+    for rings in polygons:
+        # Inside of the polygon (interior rings are holes)
+        addSpans(HEL_Rasterize.polygonSpans(rings, xMin, yMax, cellSize, rows, cols))
+
+        edges = HEL_Rasterize.ringEdges(rings)
+        if edges is None:
+            continue
+        x0, y0, x1, y1 = edges
+        vertices.append(np.column_stack((x0, y0)))
+
+        # Rectangle of width 2 x distance along every edge
+        length = np.hypot(x1 - x0, y1 - y0)
+        keep = length > 0
+        nx = -(y1 - y0)[keep] / length[keep] * distance
+        ny = (x1 - x0)[keep] / length[keep] * distance
+        for ax, ay, bx, by, ox, oy in zip(x0[keep], y0[keep], x1[keep], y1[keep], nx, ny):
+            rectangle = [[(ax + ox, ay + oy), (bx + ox, by + oy), (bx - ox, by - oy), (ax - ox, ay - oy)]]
+            addSpans(HEL_Rasterize.polygonSpans(rectangle, xMin, yMax, cellSize, rows, cols))
+
+    # Disk around every vertex
+    if vertices:
+        vertices = np.vstack(vertices)
+        addSpans(diskSpans(vertices[:,0], vertices[:,1], distance, xMin, yMax, cellSize, rows, cols))
+
+    if not spanRows:
+        return np.zeros((rows, cols), dtype=bool)
+
+    # Accumulate every span as +1 at its start and -1 at its end, then a running sum per row
+    r = np.concatenate(spanRows); c0 = np.concatenate(spanStarts); c1 = np.concatenate(spanEnds)
+    valid = c1 > c0
+    coverage = np.zeros((rows, cols + 1), dtype=np.int32)
+    np.add.at(coverage, (r[valid], c0[valid]), 1)
+    np.add.at(coverage, (r[valid], c1[valid]), -1)
+    return np.cumsum(coverage, axis=1)[:, :cols] > 0
+
+## ===================================================================================
+def selfTest():
+    """ Compares bufferMask with a brute force point to polygon distance test """
+
+    outer = [(1000.0, 1000.0), (1600.0, 1050.0), (1500.0, 1500.0), (1250.0, 1300.0), (1050.0, 1550.0)]
+    hole = [(1150.0, 1150.0), (1300.0, 1150.0), (1250.0, 1250.0)]
+    second = [(2100.0, 1200.0), (2300.0, 1200.0), (2200.0, 1400.0)]
+    polygons = [[outer, hole], [second]]
+    distance = 410.0
+
+    xs = [p[0] for p in outer + second]
+    ys = [p[1] for p in outer + second]
+    extent = bufferedExtent(xs, ys, distance)
+
+    cellSize = 10.0
+    lowerLeft = (math.floor(extent[0] / cellSize) * cellSize, math.floor(extent[1] / cellSize) * cellSize)
+    cols = int(math.ceil((extent[2] - lowerLeft[0]) / cellSize)); rows = int(math.ceil((extent[3] - lowerLeft[1]) / cellSize))
+    mask = bufferMask(polygons, distance, lowerLeft, cellSize, rows, cols)
+
+    # Brute force: inside any polygon (even-odd) or within distance of any edge
+    y, x = np.mgrid[0:rows, 0:cols]
+    px = lowerLeft[0] + (x + 0.5) * cellSize
+    py = lowerLeft[1] + rows * cellSize - (y + 0.5) * cellSize
+    expected = np.zeros((rows, cols), dtype=bool)
+    for rings in polygons:
+        inside = np.zeros((rows, cols), dtype=bool)
+        for ring in rings:
+            for (ax, ay), (bx, by) in zip(ring, ring[1:] + ring[:1]):
+                crosses = ((ay > py) != (by > py)) & (px < (bx - ax) * (py - ay) / (by - ay + 1e-300) + ax)
+                inside ^= crosses
+                t = np.clip(((px - ax) * (bx - ax) + (py - ay) * (by - ay)) / ((bx - ax) ** 2 + (by - ay) ** 2), 0, 1)
+                expected |= np.hypot(px - (ax + t * (bx - ax)), py - (ay + t * (by - ay))) <= distance
+        expected |= inside
+
+    mismatches = int((mask != expected).sum())
+    print("Buffered extent: %s" % str(extent))
+    print("Buffer mask: %d x %d cells, %d in the buffer, %d mismatches against brute force" % (rows, cols, mask.sum(), mismatches))
+    return mismatches == 0
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
@@ -0,0 +1,210 @@
+# ==========================================================================================
+# Name:   HEL Build DEM Store
+#
+# Builds or refreshes the pre-resampled 3 meter DEM store of a county or state DEM library
+# (HEL_DEM_Store.py).  The library folder is indexed the same way as the DEM library of the
+# Merge Local DEMs by CLU tool (HEL_DEM_Index.json), then every 3 meter store tile whose
+# source DEMs were added, changed or removed since the last build is regenerated.  Run it
+# again after new LiDAR tiles are copied into the library.
+#
+# The store is built in the coordinate system of the county boundary when one is given,
+# otherwise in the coordinate system shared by most DEMs in the library.  DEMs in any other
+# coordinate system or coarser than 3 meters (9.84252 feet) are skipped.  The cell size is 3 in
+# the linear units of the store, the grid extractDEM of the NRCS HEL Determination tool
+# resamples to.  Use HEL_DEM_Store.vmosaic.json in the store folder as the DEM of the tool.
+#
+# Usage:
+#   python HEL_Build_DEM_Store.py <DEM library folder> <store folder> [county boundary] [tile cells]
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial build command of the 3 meter DEM store.
+# - DEM windows are read by HEL_DEM_Reader.readRasterWindow (shared with the HEL Determination
+#   tool; integer DEMs keep their NoData value) and foot stores use the extractDEM cell size.
+
+## ===================================================================================
+def AddMsgAndPrint(msg, severity=0):
+    # prints message to screen and adds tool message to the geoprocessor
+
+    try:
+        print(msg)
+
+        if severity == 0:
+            arcpy.AddMessage(msg)
+
+        elif severity == 1:
+            arcpy.AddWarning(msg)
+
+        elif severity == 2:
+            arcpy.AddError(msg)
+
+    except:
+        pass
+
+## ===================================================================================
+def errorMsg():
+# Print traceback exceptions.  If sys.exit was trapped by default exception then
+# ignore traceback message.
+
+    try:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        theMsg = "\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[1] + "\n\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[-1]
+
+        if theMsg.find("sys.exit") > -1:
+            AddMsgAndPrint("\n\n")
+            pass
+        else:
+            AddMsgAndPrint("\n\tHEL Build DEM Store Error: -------------------------",2)
+            AddMsgAndPrint(theMsg,2)
+
+    except:
+        AddMsgAndPrint("Unhandled error in errorMsg method", 2)
+        pass
+
+## ===================================================================================
+def describeDEM(raster):
+    # This function describes a DEM of the library for the DEM library index (HEL_DEM_Index.py).
+    # The properties are the same as describeDEM in Merge_Local_DEMs_by_CLU.py so that both tools
+    # share the index of a library folder.
+    # returns a dictionary of properties or None if the raster cannot be described
+
+    try:
+        desc = arcpy.Describe(raster)
+        sr = desc.SpatialReference
+
+        # This is the 'VALUETYPE' code returned by the getRasterProperty tool
+        cellValueCode = int(arcpy.GetRasterProperties_management(raster,"VALUETYPE").getOutput(0))
+
+        return {'extent':[desc.extent.XMin,desc.extent.YMin,desc.extent.XMax,desc.extent.YMax],
+                'spatialReference':sr.exportToString(),'srType':sr.Type,'linearUnits':sr.LinearUnitName,
+                'cellSize':desc.MeanCellWidth,'pixelType':pixelTypeDict[cellValueCode],'bandCount':desc.bandCount}
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def readDEMWindow(path,extent):
+    # This function is the tile reader of the store build (HEL_Mosaic.readWindow).  The window is
+    # read by HEL_DEM_Reader.readRasterWindow, the same reader as the NRCS HEL Determination tool.
+    # returns the window array, its lower left (x,y), cell size and NoData value or None
+
+    window = HEL_DEM_Reader.readRasterWindow(path,extent,numpyNoData)
+    if window is None:
+        return None
+    demArray,lowerLeft,cellSize,noData,mode = window
+    return demArray,lowerLeft,cellSize[0],noData
+
+## ===================================================================================
+def boundaryExtent(boundary,sr):
+    # This function returns the extent of the county boundary in the coordinate system of the
+    # store.  A densified outline of the boundary extent is projected (HEL_Buffer.py).
+    # returns (xMin, yMin, xMax, yMax)
+
+    desc = arcpy.Describe(boundary)
+    extent = (desc.extent.XMin,desc.extent.YMin,desc.extent.XMax,desc.extent.YMax)
+    if desc.spatialReference.name == sr.name:
+        return extent
+
+    outline = arcpy.Polygon(arcpy.Array([arcpy.Point(x,y) for x,y in HEL_Buffer.densifyExtent(extent)]),desc.spatialReference)
+    if desc.spatialReference.GCS.name != sr.GCS.name:
+        projected = outline.projectAs(sr,"WGS_1984_(ITRF00)_To_NAD_1983").extent
+    else:
+        projected = outline.projectAs(sr).extent
+    return (projected.XMin,projected.YMin,projected.XMax,projected.YMax)
+
+## ====================================== Main Body ==================================
+import sys, os, traceback, time
+import arcpy
+import HEL_DEM_Index, HEL_DEM_Reader, HEL_DEM_Store, HEL_Buffer
+
+if __name__ == '__main__':
+
+    try:
+        if len(sys.argv) < 3:
+            AddMsgAndPrint("\nUsage: python HEL_Build_DEM_Store.py <DEM library folder> <store folder> [county boundary] [tile cells]",2)
+            sys.exit()
+
+        demLibrary = sys.argv[1]
+        storeFolder = sys.argv[2]
+        boundary = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != "#" else ""
+        tileCells = int(sys.argv[4]) if len(sys.argv) > 4 else 2000
+
+        # Dictionary for code values returned by the getRasterProperties tool (keys)
+        # Values represent the pixel_type inputs for the mosaic to new raster tool
+        pixelTypeDict = {0:'1_BIT',1:'2_BIT',2:'4_BIT',3:'8_BIT_UNSIGNED',4:'8_BIT_SIGNED',5:'16_BIT_UNSIGNED',
+                        6:'16_BIT_SIGNED',7:'32_BIT_UNSIGNED',8:'32_BIT_SIGNED',9:'32_BIT_FLOAT',10:'64_BIT'}
+        numpyNoData = -3.40282346639e+38
+
+        # Like extractDEM the store cell size is 3 in the linear units of the store and DEMs up to
+        # 3 meters in those units are used
+        outputCellSize = 3
+        toleranceDict = {"Meter":3,"Foot":9.84252,"Foot_US":9.84252}
+
+        # --------------------------------------------------------------------------------------- Index the DEM library
+        AddMsgAndPrint("\nUpdating DEM library index: " + demLibrary)
+
+        def indexProgress(n,total,path):
+            AddMsgAndPrint("\tIndexing " + os.path.basename(path) + " " + str(n) + " of " + str(total))
+
+        tiles,described,removed = HEL_DEM_Index.updateIndex(demLibrary,describeDEM,indexProgress)
+        AddMsgAndPrint("\t" + str(len(tiles)) + " DEM tiles indexed; " + str(described) + " new or changed, " + str(removed) + " removed")
+        if not tiles:
+            AddMsgAndPrint("\nThere are no DEMs in " + demLibrary + ". Exiting!",2)
+            sys.exit()
+
+        # --------------------------------------------------------------------------------------- Coordinate system of the store
+        if boundary:
+            sr = arcpy.Describe(boundary).spatialReference
+            srString = None
+            for candidate in sorted(set([tile['spatialReference'] for tile in tiles.values()])):
+                candidateSR = arcpy.SpatialReference()
+                candidateSR.loadFromString(candidate)
+                if candidateSR.name == sr.name:
+                    srString = candidate
+                    break
+            if srString is None:
+                AddMsgAndPrint("\nNo DEMs in " + demLibrary + " are in the coordinate system of " + boundary + " (" + sr.name + "). Exiting!",2)
+                sys.exit()
+        else:
+            srCounts = dict()
+            for tile in tiles.values():
+                srCounts[tile['spatialReference']] = srCounts.get(tile['spatialReference'],0) + 1
+            srString = max(srCounts,key=srCounts.get)
+
+        sr = arcpy.SpatialReference()
+        sr.loadFromString(srString)
+        storeTiles = [tile for tile in tiles.values() if tile['spatialReference'] == srString]
+        linearUnits = storeTiles[0]['linearUnits']
+
+        if not linearUnits in toleranceDict:
+            AddMsgAndPrint("\nHorizontal units of the DEMs must be in feet or meters (" + sr.name + "). Exiting!",2)
+            sys.exit()
+        cellSize = outputCellSize
+        tolerance = toleranceDict[linearUnits]
+
+        skipped = len(tiles) - len([tile for tile in storeTiles if tile['cellSize'] <= tolerance * (1 + 1e-6)])
+        AddMsgAndPrint("\nBuilding 3 meter DEM store in " + sr.name)
+        AddMsgAndPrint("\tStore tiles: " + str(tileCells) + " x " + str(tileCells) + " cells of " + str(cellSize) + " " + linearUnits)
+        if skipped:
+            AddMsgAndPrint("\t" + str(skipped) + " DEMs in another coordinate system or coarser than 3 meters are skipped",1)
+
+        extent = boundaryExtent(boundary,sr) if boundary else None
+
+        # --------------------------------------------------------------------------------------- Build the store
+        def storeProgress(n,total,key):
+            AddMsgAndPrint("\tBuilding store tile " + key + " (" + str(n) + " of " + str(total) + ")")
+
+        buildStart = time.time()
+        if not os.path.isdir(storeFolder):
+            os.makedirs(storeFolder)
+
+        descriptorPath,stats = HEL_DEM_Store.buildStore(storeFolder,demLibrary,tiles,srString,linearUnits,cellSize,tileCells,
+                                                        (0.0,0.0),extent,readDEMWindow,storeProgress,tolerance)
+
+        AddMsgAndPrint("\nBuilt " + str(stats['built']) + ", kept " + str(stats['kept']) + " and removed " + str(stats['removed']) + " store tile(s) in " + "%.1f" % (time.time() - buildStart) + " seconds")
+        AddMsgAndPrint("\tDEM store: " + descriptorPath)
+        AddMsgAndPrint("\tUse it as the DEM of the NRCS HEL Determination tool\n")
+
+    except:
+        errorMsg()
@@ -0,0 +1,122 @@
+# ==========================================================================================
+# Name:   HEL Compact
+#
+# Compact storage of the intermediate grids of the NumPy engines used by the NRCS HEL
+# Determination tool.  The intermediates used to be float64 grids (8 bytes per cell) that
+# lived side by side until the end of the LiDAR section.  The storage policy is:
+#
+#  - Continuous surfaces (DEM, preslope, slope, flow length, K, R and T factors) are float32
+#    with NaN as NoData, the precision of the Spatial Analyst rasters they replace.  Stages
+#    still compute in float64 and store the result as float32 (floatGrid).
+#  - Flow direction is uint8 D8 codes (HEL_Flow.py).
+#  - Class grids with up to 3 classes (Og_HELcode: 0 HEL, 1 NHEL, 2 PHEL) are packed 4 cells
+#    per byte, 2 bits per cell, with code 3 as NoData (PackedClasses).  A packed grid is
+#    unpacked one window at a time so the block engine (HEL_Tiles.py) reads it like any
+#    other grid.
+#
+# This module does not import arcpy.
+#
+# Running this script directly checks the packing and the window reads:
+#     python HEL_Compact.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial float32 and 2 bit class storage.
+
+import sys
+import numpy as np
+
+classNoData = 3
+
+## ===================================================================================
+def floatGrid(array):
+    """ Returns a float32 grid of a continuous surface; no copy when it already is one """
+
+    return np.asarray(array, dtype=np.float32)
+
+## ===================================================================================
+def classCodes(array):
+    """ Converts a class grid (0, 1, 2 with NaN or any other value as NoData) to uint8
+        codes with classNoData as NoData """
+
+    array = np.asarray(array)
+    codes = np.full(array.shape, classNoData, dtype=np.uint8)
+    with np.errstate(invalid='ignore'):
+        valid = (array >= 0) & (array < classNoData) & (array == np.floor(array))
+    codes[valid] = array[valid]
+    return codes
+
+## ===================================================================================
+def pack2bit(codes):
+    """ Packs uint8 codes (0 to 3) 4 cells per byte along every row.  Returns a uint8
+        array of (rows, ceil(cols / 4)). """
+
+    rows, cols = codes.shape
+    padded = np.full((rows, (cols + 3) // 4 * 4), classNoData, dtype=np.uint8)
+    padded[:, :cols] = codes
+    return padded[:, 0::4] | (padded[:, 1::4] << 2) | (padded[:, 2::4] << 4) | (padded[:, 3::4] << 6)
+
+## ===================================================================================
+def unpack2bit(packed, r0, r1, c0, c1):
+    """ Unpacks the codes of rows r0:r1 and columns c0:c1 of a packed grid """
+
+    b0 = c0 // 4; b1 = (c1 + 3) // 4
+    block = packed[r0:r1, b0:b1]
+    codes = np.empty((block.shape[0], block.shape[1] * 4), dtype=np.uint8)
+    for k in range(4):
+        codes[:, k::4] = (block >> (2 * k)) & 3
+    return codes[:, c0 - b0 * 4:c1 - b0 * 4]
+
+## ===================================================================================
+class PackedClasses(object):
+    """ Class grid packed 2 bits per cell.  Indexing with two slices returns the uint8
+        codes of the window (classNoData as NoData). """
+
+    def __init__(self, array=None, packed=None, shape=None):
+        if array is not None:
+            self.shape = tuple(array.shape)
+            self.packed = pack2bit(classCodes(array))
+        else:
+            self.shape = tuple(shape)
+            self.packed = packed
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __getitem__(self, window):
+        rowSlice, colSlice = window
+        r0, r1, step = rowSlice.indices(self.shape[0])
+        c0, c1, step = colSlice.indices(self.shape[1])
+        return unpack2bit(self.packed, r0, r1, c0, c1)
+
+    def unpack(self):
+        """ Returns the uint8 codes of the whole grid """
+        return self[:, :]
+
+## ===================================================================================
+def selfTest():
+    """ Packs a class grid and checks the whole grid, windows at every column phase and
+        the storage size """
+
+    rng = np.random.RandomState(11)
+    rows, cols = 211, 157
+    classes = rng.randint(0, 3, (rows, cols)).astype(np.float64)
+    classes[rng.uniform(size=(rows, cols)) < 0.1] = np.nan
+
+    grid = PackedClasses(classes)
+    expected = classCodes(classes)
+
+    windows = [(slice(r0, r0 + 37), slice(c0, c0 + w)) for r0 in (0, 50, 190) for c0 in (0, 1, 2, 3, 5, 150) for w in (1, 4, 7)]
+    windowsOK = all([np.array_equal(grid[w], expected[w]) for w in windows])
+    wholeOK = np.array_equal(grid.unpack(), expected)
+    nodataOK = bool((grid.unpack()[np.isnan(classes)] == classNoData).all())
+
+    print("Packed %d x %d classes into %d bytes (%.0fx smaller than float64)" % (rows, cols, grid.nbytes, classes.nbytes / float(grid.nbytes)))
+    print("Whole grid: %s; %d windows: %s; NoData: %s" % (wholeOK, len(windows), windowsOK, nodataOK))
+    return wholeOK and windowsOK and nodataOK
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
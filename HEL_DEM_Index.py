@@ -0,0 +1,303 @@
+# ==========================================================================================
+# Name:   HEL DEM Index
+#
+# Persistent spatial index of the DEM tiles in a local DEM library for the Merge Local DEMs
+# by CLU tool.  Instead of making the user pick DEM files by hand and probing every one of
+# them with Describe and GetRasterProperties on every run, the library folder is indexed once:
+#
+#  - HEL_DEM_Index.json in the library folder records the extent, spatial reference, linear
+#    units, cell size, pixel type and band count of every DEM tile.  When the library folder
+#    is read only (a shared network drive) the index is written to a per-user folder instead
+#    (%LOCALAPPDATA%\HEL_DEM_Index, named by a hash of the library path) and the newest of the
+#    two is read.  The index is replaced atomically so that a reader never sees a partial
+#    file; a failure to write it is raised, not ignored.
+#  - Every tile carries the size and modification time of its files.  Refreshing the index
+#    only describes tiles that are new or changed and drops the ones that are gone.
+#  - At query time the tile extents are bucketed on a regular grid per spatial reference so
+#    only the tiles that intersect the buffered CLU extent are returned.
+#
+# This module does not import arcpy.  The calling script hands in a describe function that
+# returns the properties of one tile (see describeDEM in Merge_Local_DEMs_by_CLU.py).
+#
+# Running this script directly exercises the index with a stand-in describe function:
+#     python HEL_DEM_Index.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial DEM library index with incremental refresh and a grid query.
+# - Per-user index location for read only libraries, atomic replace of the index and write
+#   failures raised to the caller.
+
+import os, sys, json, math, time, tempfile, shutil, hashlib
+
+indexName = 'HEL_DEM_Index.json'
+rasterExtensions = ('.tif', '.tiff', '.img')
+
+## ===================================================================================
+def findRasters(folder):
+    """ Returns the paths of the raster files under a folder """
+
+    paths = list()
+    for root, dirs, names in os.walk(folder):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in rasterExtensions:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+## ===================================================================================
+def fileFingerprint(path):
+    """ Returns the size and modification time of a raster file """
+
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+## ===================================================================================
+def userIndexPath(folder):
+    """ Returns the per-user index file of a library folder """
+
+    userFolder = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    libraryHash = hashlib.sha1(os.path.normcase(os.path.abspath(folder)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(userFolder, 'HEL_DEM_Index', libraryHash + '.json')
+
+## ===================================================================================
+def readIndexFile(indexPath):
+    """ Reads an index file.  Returns the dict of the file or None when it does not exist
+        or is not valid. """
+
+    if not os.path.isfile(indexPath):
+        return None
+    try:
+        with open(indexPath, 'r') as f:
+            index = json.load(f)
+    except ValueError:
+        return None
+    return index if isinstance(index, dict) else None
+
+## ===================================================================================
+def indexLocation(folder):
+    """ Returns the index file of a library folder that is read: the newest of the
+        library and per-user index files, or None when there is no index yet """
+
+    newest = None
+    for indexPath in (os.path.join(folder, indexName), userIndexPath(folder)):
+        index = readIndexFile(indexPath)
+        if index is not None and (newest is None or index.get('updated', 0) > newest[0]):
+            newest = (index.get('updated', 0), indexPath)
+    return newest[1] if newest else None
+
+## ===================================================================================
+def loadIndex(folder):
+    """ Reads the index of a library folder.  Returns a dict of relative path -> tile
+        properties. """
+
+    indexPath = indexLocation(folder)
+    if indexPath is None:
+        return dict()
+    return readIndexFile(indexPath).get('tiles', dict())
+
+## ===================================================================================
+def replaceFile(source, target):
+    """ Renames source to target, replacing target in one step.  os.rename replaces
+        atomically on POSIX; on Windows (Python 2 has no os.replace) MoveFileEx is
+        called with MOVEFILE_REPLACE_EXISTING. """
+
+    if hasattr(os, 'replace'):
+        os.replace(source, target)
+    elif os.name == 'nt':
+        import ctypes
+        if not ctypes.windll.kernel32.MoveFileExW(unicode(source), unicode(target), 0x1 | 0x8):
+            raise ctypes.WinError()
+    else:
+        os.rename(source, target)
+
+## ===================================================================================
+def writeIndexFile(indexPath, tiles):
+    """ Writes an index file through a temporary file in the same folder and replaces
+        the old index in one step """
+
+    folder = os.path.dirname(indexPath)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    handle, tempPath = tempfile.mkstemp(suffix='.tmp', prefix=indexName, dir=folder)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'updated': time.time(), 'tiles': tiles}, f, indent=1, sort_keys=True)
+        replaceFile(tempPath, indexPath)
+    except:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+## ===================================================================================
+def saveIndex(folder, tiles):
+    """ Writes the index of a library folder, in the library folder or, when it cannot
+        be written there, in the per-user folder.  Returns the index file written and
+        raises IOError when neither can be written. """
+
+    errors = list()
+    for indexPath in (os.path.join(folder, indexName), userIndexPath(folder)):
+        try:
+            writeIndexFile(indexPath, tiles)
+            return indexPath
+        except EnvironmentError as e:
+            errors.append("%s: %s" % (indexPath, e))
+    raise IOError("The DEM library index could not be written; " + "; ".join(errors))
+
+## ===================================================================================
+def updateIndex(folder, describe, progress=None):
+    """ Brings the index of a library folder up to date.  describe(path) returns a dict
+        of tile properties ('extent' as [xMin, yMin, xMax, yMax], 'spatialReference',
+        'srType', 'linearUnits', 'cellSize', 'pixelType', 'bandCount') or None when the
+        file cannot be read.  Only new and changed files are described.
+
+        Returns the dict of relative path -> tile properties and the number of tiles
+        described and removed.  The index is saved only when it changed (saveIndex);
+        an index that cannot be written raises IOError. """
+
+    tiles = loadIndex(folder)
+    paths = findRasters(folder)
+    current = set()
+    described = 0
+
+    for n, path in enumerate(paths):
+        relPath = os.path.relpath(path, folder)
+        current.add(relPath)
+        fingerprint = fileFingerprint(path)
+
+        tile = tiles.get(relPath)
+        if tile is not None and tile.get('fingerprint') == fingerprint:
+            continue
+
+        if progress:
+            progress(n + 1, len(paths), path)
+        properties = describe(path)
+        described += 1
+        if properties is None:
+            tiles.pop(relPath, None)
+            continue
+        properties['fingerprint'] = fingerprint
+        tiles[relPath] = properties
+
+    removed = [relPath for relPath in tiles if relPath not in current]
+    for relPath in removed:
+        del tiles[relPath]
+
+    if described or removed:
+        saveIndex(folder, tiles)
+    return tiles, described, len(removed)
+
+## ===================================================================================
+class GridIndex(object):
+    """ Regular grid over the tile extents of every spatial reference.  The bucket size
+        is the median tile width or height so that a tile falls in a handful of buckets. """
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.buckets = dict()
+
+        sizes = sorted([max(t['extent'][2] - t['extent'][0], t['extent'][3] - t['extent'][1]) for t in tiles.values()])
+        self.bucketSize = sizes[len(sizes) // 2] if sizes and sizes[len(sizes) // 2] > 0 else 1.0
+
+        for relPath, tile in tiles.items():
+            for key in self.bucketKeys(tile['spatialReference'], tile['extent']):
+                self.buckets.setdefault(key, list()).append(relPath)
+
+    def bucketKeys(self, spatialReference, extent):
+        xMin, yMin, xMax, yMax = extent
+        size = self.bucketSize
+        for ix in range(int(math.floor(xMin / size)), int(math.floor(xMax / size)) + 1):
+            for iy in range(int(math.floor(yMin / size)), int(math.floor(yMax / size)) + 1):
+                yield (spatialReference, ix, iy)
+
+    def spatialReferences(self):
+        """ Returns the distinct spatial references of the indexed tiles """
+        return sorted(set([tile['spatialReference'] for tile in self.tiles.values()]))
+
+    def query(self, spatialReference, extent):
+        """ Returns the relative paths of the tiles in a spatial reference whose extent
+            intersects an (xMin, yMin, xMax, yMax) extent in that spatial reference """
+
+        xMin, yMin, xMax, yMax = extent
+        found = set()
+        for key in self.bucketKeys(spatialReference, extent):
+            for relPath in self.buckets.get(key, ()):
+                if relPath in found:
+                    continue
+                txMin, tyMin, txMax, tyMax = self.tiles[relPath]['extent']
+                if txMin < xMax and txMax > xMin and tyMin < yMax and tyMax > yMin:
+                    found.add(relPath)
+        return sorted(found)
+
+## ===================================================================================
+def selfTest():
+    """ Indexes a folder of empty stand-in tiles, refreshes it and queries it """
+
+    folder = tempfile.mkdtemp(prefix='HEL_DEM_Index_')
+    try:
+        # 20 x 20 library of 1 km tiles named by their lower left corner in km
+        for i in range(20):
+            for j in range(20):
+                with open(os.path.join(folder, "dem_%d_%d.tif" % (500 + i, 4400 + j)), 'wb') as f:
+                    f.write(b'0')
+
+        calls = list()
+        def describe(path):
+            calls.append(path)
+            x, y = [int(v) for v in os.path.splitext(os.path.basename(path))[0].split('_')[1:]]
+            return {'extent': [x * 1000.0, y * 1000.0, x * 1000.0 + 1000, y * 1000.0 + 1000],
+                    'spatialReference': 'NAD_1983_UTM_Zone_15N', 'srType': 'Projected', 'linearUnits': 'Meter',
+                    'cellSize': 1.0, 'pixelType': '32_BIT_FLOAT', 'bandCount': 1}
+
+        tiles, described, removed = updateIndex(folder, describe)
+        first = len(calls)
+
+        # Refresh after one tile changes and one is deleted
+        with open(os.path.join(folder, "dem_505_4405.tif"), 'wb') as f:
+            f.write(b'changed')
+        os.remove(os.path.join(folder, "dem_519_4419.tif"))
+        tiles, described2, removed2 = updateIndex(folder, describe)
+
+        grid = GridIndex(loadIndex(folder))
+        hits = grid.query('NAD_1983_UTM_Zone_15N', (504590.0, 4406590.0, 506410.0, 4408410.0))
+        brute = sorted([p for p, t in tiles.items() if t['extent'][0] < 506410 and t['extent'][2] > 504590 and t['extent'][1] < 4408410 and t['extent'][3] > 4406590])
+
+        print("Initial build described %d tiles; refresh described %d and removed %d" % (first, described2, removed2))
+        print("Query returned %d tiles: %s" % (len(hits), ", ".join(hits)))
+
+        # Library index that cannot be written (a folder in its place): the per-user index is used
+        userFolder = tempfile.mkdtemp(prefix='HEL_DEM_Index_User_')
+        localAppData = os.environ.get('LOCALAPPDATA')
+        try:
+            os.environ['LOCALAPPDATA'] = userFolder
+            os.remove(os.path.join(folder, indexName))
+            os.mkdir(os.path.join(folder, indexName))
+            with open(os.path.join(folder, "dem_505_4405.tif"), 'wb') as f:
+                f.write(b'changed again')
+            updateIndex(folder, describe)
+            fallbackOK = indexLocation(folder) == userIndexPath(folder) and len(loadIndex(folder)) == 399
+
+            # Neither location can be written: the error is raised
+            os.environ['LOCALAPPDATA'] = os.path.join(folder, "dem_500_4400.tif")
+            try:
+                saveIndex(folder, tiles)
+                raisedOK = False
+            except IOError:
+                raisedOK = True
+        finally:
+            if localAppData is None:
+                del os.environ['LOCALAPPDATA']
+            else:
+                os.environ['LOCALAPPDATA'] = localAppData
+            shutil.rmtree(userFolder, ignore_errors=True)
+
+        print("Read only library: per-user index %s; write failure raised %s" % (fallbackOK, raisedOK))
+        return first == 400 and described2 == 1 and removed2 == 1 and hits == brute and len(hits) == 9 and fallbackOK and raisedOK
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
@@ -0,0 +1,436 @@
+# ==========================================================================================
+# Name:   HEL DEM Reader
+#
+# Windowed reader of local GeoTIFF DEMs for the NRCS HEL Determination tool.  Instead of
+# copying the 410 meter buffer window out of a (possibly statewide) DEM with Clip into
+# in_memory, the window is read straight from the file:
+#
+#  - Uncompressed stripped GeoTIFFs are memory mapped and the window is returned as a
+#    zero-copy NumPy view of the mapped rows.  Only the rows of the window are mapped so the
+#    32 bit address space of ArcMap is not exhausted by statewide files.
+#  - Uncompressed tiled GeoTIFFs, stripped files whose window rows are too wide to map
+#    (maxMapBytes) and Deflate compressed files (predictor 1, 2 or 3) are read block by block;
+#    only the strips or tiles that overlap the window are touched.
+#  - Any other layout (LZW, JPEG, multi-band, ERDAS IMG, file geodatabase rasters) falls back
+#    to a windowed arcpy.RasterToNumPyArray read (readRasterWindow).  Integer DEMs are read
+#    with their own NoData value and returned as float32 with NaN as NoData.
+#
+# Windows are snapped outward to the cells of the DEM the same way Clip does with
+# NO_MAINTAIN_EXTENT.  Arrays run north to south the same as arcpy.RasterToNumPyArray.
+# readWindow reads NoData from the GDAL_NODATA tag only; readRasterWindow gets it from
+# arcpy.Describe when the tag is missing (.aux.xml, an internal mask).  arcpy is only imported
+# by readRasterWindow, which is the DEM window reader of both NRCS_HEL_Determination.py and
+# HEL_Build_DEM_Store.py.
+#
+# Running this script directly writes synthetic GeoTIFFs in every supported layout and checks
+# the windows against the source array:
+#     python HEL_DEM_Reader.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial memory mapped and block GeoTIFF window reader.
+# - writeTestTiff renamed writeTiff; it also writes the tiles of the 3 meter DEM store.
+# - Documented that NoData is None without the GDAL_NODATA tag.
+# - readRasterWindow: the GeoTIFF reader with the arcpy fallback and integer NoData handling
+#   shared by the HEL Determination tool and the DEM store build.
+
+import os, sys, math, struct, zlib, tempfile, shutil
+import numpy as np
+
+# TIFF field types -> (struct code, size)
+fieldTypes = {1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8), 6: ('b', 1),
+              7: ('B', 1), 8: ('h', 2), 9: ('i', 4), 10: ('ii', 8), 11: ('f', 4), 12: ('d', 8),
+              16: ('Q', 8), 17: ('q', 8), 18: ('Q', 8)}
+
+sampleKinds = {1: 'u', 2: 'i', 3: 'f'}
+deflateCodes = (8, 32946)
+maxMapBytes = 256 * 1048576
+
+## ===================================================================================
+def readTags(f):
+    """ Reads the tags of the first IFD of a classic or Big TIFF.  Returns the byte
+        order ('<' or '>') and a dict of tag -> tuple of values (ASCII tags are strings). """
+
+    f.seek(0)
+    header = f.read(16)
+    if header[:2] == b'II':
+        order = '<'
+    elif header[:2] == b'MM':
+        order = '>'
+    else:
+        return None, None
+
+    version = struct.unpack(order + 'H', header[2:4])[0]
+    if version == 42:
+        ifdOffset = struct.unpack(order + 'I', header[4:8])[0]
+        countFmt, entryFmt, entrySize, inline = 'H', 'HHI', 12, 4
+    elif version == 43:
+        ifdOffset = struct.unpack(order + 'Q', header[8:16])[0]
+        countFmt, entryFmt, entrySize, inline = 'Q', 'HHQ', 20, 8
+    else:
+        return None, None
+
+    f.seek(ifdOffset)
+    countSize = struct.calcsize(countFmt)
+    numEntries = struct.unpack(order + countFmt, f.read(countSize))[0]
+    entries = f.read(numEntries * entrySize)
+
+    tags = dict()
+    headSize = struct.calcsize(order + entryFmt)
+    for i in range(numEntries):
+        entry = entries[i * entrySize:(i + 1) * entrySize]
+        tag, fieldType, count = struct.unpack(order + entryFmt, entry[:headSize])
+        if fieldType not in fieldTypes:
+            continue
+        code, size = fieldTypes[fieldType]
+        nbytes = size * count
+        if nbytes <= inline:
+            raw = entry[headSize:headSize + nbytes]
+        else:
+            offset = struct.unpack(order + ('I' if inline == 4 else 'Q'), entry[headSize:])[0]
+            here = f.tell()
+            f.seek(offset)
+            raw = f.read(nbytes)
+            f.seek(here)
+
+        if fieldType == 2:
+            tags[tag] = raw.rstrip(b'\x00').decode('ascii', 'replace')
+        else:
+            values = struct.unpack(order + code * count, raw)
+            if fieldType in (5, 10):
+                values = tuple([float(values[k]) / values[k + 1] for k in range(0, len(values), 2)])
+            tags[tag] = values
+
+    return order, tags
+
+## ===================================================================================
+def readTiffInfo(path):
+    """ Reads the layout and georeferencing of a single band GeoTIFF.  Returns a dict
+        or None if the file is not a GeoTIFF this module can read. """
+
+    with open(path, 'rb') as f:
+        order, tags = readTags(f)
+    if not tags or 33550 not in tags or 33922 not in tags:
+        return None
+
+    bits = tags.get(258, (1,))[0]
+    kind = sampleKinds.get(tags.get(339, (1,))[0])
+    if tags.get(277, (1,))[0] != 1 or kind is None or bits not in (8, 16, 32, 64):
+        return None
+
+    width = tags[256][0]; height = tags[257][0]
+    cellX, cellY = tags[33550][0], tags[33550][1]
+    i, j, k, x, y, z = tags[33922][:6]
+    xMin = x - i * cellX; yMax = y + j * cellY
+
+    # GeoKeyDirectory: GTRasterTypeGeoKey (1025) = 2 is PixelIsPoint; tie point is the cell center
+    geoKeys = tags.get(34735, ())
+    for n in range(4, len(geoKeys), 4):
+        if geoKeys[n] == 1025 and geoKeys[n + 1] == 0 and geoKeys[n + 3] == 2:
+            xMin -= cellX / 2.0; yMax += cellY / 2.0
+
+    noData = None
+    if 42113 in tags:
+        try:
+            noData = float(tags[42113])
+        except ValueError:
+            pass
+
+    info = {'path': path, 'width': width, 'height': height, 'dtype': np.dtype(order + kind + str(bits // 8)),
+            'compression': tags.get(259, (1,))[0], 'predictor': tags.get(317, (1,))[0],
+            'origin': (xMin, yMax), 'cellSize': (cellX, cellY), 'noData': noData}
+
+    if 322 in tags:
+        info['blockWidth'] = tags[322][0]; info['blockHeight'] = tags[323][0]
+        info['offsets'] = tags[324]; info['byteCounts'] = tags[325]
+    else:
+        info['blockWidth'] = width; info['blockHeight'] = min(tags.get(278, (height,))[0], height)
+        info['offsets'] = tags[273]; info['byteCounts'] = tags[279]
+
+    return info
+
+## ===================================================================================
+def snapWindow(origin, cellSize, shape, extent):
+    """ Returns the (firstRow, lastRow, firstCol, lastCol) (exclusive ends) of the cells of
+        a raster that overlap an (xMin, yMin, xMax, yMax) extent, clipped to the raster. """
+
+    xOrigin, yOrigin = origin
+    cellX, cellY = cellSize
+    rows, cols = shape
+    xMin, yMin, xMax, yMax = extent
+
+    c0 = int(math.floor((xMin - xOrigin) / cellX)); c1 = int(math.ceil((xMax - xOrigin) / cellX))
+    r0 = int(math.floor((yOrigin - yMax) / cellY)); r1 = int(math.ceil((yOrigin - yMin) / cellY))
+    return max(r0, 0), min(r1, rows), max(c0, 0), min(c1, cols)
+
+## ===================================================================================
+def isContiguous(info):
+    """ True when the file is uncompressed and its strips follow each other so that the
+        image is one row major block on disk """
+
+    if info['compression'] != 1 or info['blockWidth'] != info['width']:
+        return False
+    rowBytes = info['width'] * info['dtype'].itemsize
+    start = info['offsets'][0]
+    for n, offset in enumerate(info['offsets']):
+        if offset != start + n * info['blockHeight'] * rowBytes:
+            return False
+    return True
+
+## ===================================================================================
+def decodeBlock(info, raw, rows, cols):
+    """ Decodes the bytes of one strip or tile to a rows x cols array """
+
+    dtype = info['dtype']
+    if info['compression'] in deflateCodes:
+        raw = zlib.decompress(raw)
+
+    predictor = info['predictor']
+    if predictor == 3:
+        # Floating point predictor: byte planes (most significant first) differenced along the row
+        planes = np.frombuffer(raw, dtype=np.uint8, count=rows * cols * dtype.itemsize).reshape(rows, cols * dtype.itemsize)
+        planes = np.cumsum(planes, axis=1, dtype=np.uint8)
+        data = planes.reshape(rows, dtype.itemsize, cols).transpose(0, 2, 1).copy()
+        return data.view(dtype.newbyteorder('>')).reshape(rows, cols)
+
+    data = np.frombuffer(raw, dtype=dtype, count=rows * cols).reshape(rows, cols)
+    if predictor == 2:
+        data = np.cumsum(data, axis=1, dtype=dtype)
+    return data
+
+## ===================================================================================
+def readBlocks(info, r0, r1, c0, c1):
+    """ Reads the window rows r0:r1 and cols c0:c1 block by block.  Only the strips or
+        tiles that overlap the window are read; rows of uncompressed strips are read one
+        at a time. """
+
+    dtype = info['dtype']
+    out = np.empty((r1 - r0, c1 - c0), dtype=dtype.newbyteorder('='))
+    blockWidth = info['blockWidth']; blockHeight = info['blockHeight']
+    blocksAcross = (info['width'] + blockWidth - 1) // blockWidth
+
+    with open(info['path'], 'rb') as f:
+
+        # Uncompressed strips: read only the window columns of every row
+        if info['compression'] == 1 and blockWidth == info['width']:
+            rowBytes = info['width'] * dtype.itemsize
+            for r in range(r0, r1):
+                strip, inStrip = divmod(r, blockHeight)
+                f.seek(info['offsets'][strip] + inStrip * rowBytes + c0 * dtype.itemsize)
+                out[r - r0] = np.frombuffer(f.read((c1 - c0) * dtype.itemsize), dtype=dtype)
+            return out
+
+        for br in range(r0 // blockHeight, (r1 - 1) // blockHeight + 1):
+            for bc in range(c0 // blockWidth, (c1 - 1) // blockWidth + 1):
+                block = br * blocksAcross + bc
+                f.seek(info['offsets'][block])
+                raw = f.read(info['byteCounts'][block])
+
+                # The last strip of a stripped file can be short
+                rows = blockHeight if blockWidth != info['width'] else min(blockHeight, info['height'] - br * blockHeight)
+                data = decodeBlock(info, raw, rows, blockWidth)
+
+                top = br * blockHeight; left = bc * blockWidth
+                wr0 = max(r0, top); wr1 = min(r1, top + rows)
+                wc0 = max(c0, left); wc1 = min(c1, left + blockWidth)
+                out[wr0 - r0:wr1 - r0, wc0 - c0:wc1 - c0] = data[wr0 - top:wr1 - top, wc0 - left:wc1 - left]
+
+    return out
+
+## ===================================================================================
+def readWindow(path, extent):
+    """ Reads the cells of a GeoTIFF that overlap an (xMin, yMin, xMax, yMax) extent in
+        the coordinate system of the file.
+
+        Returns the window array (a read only memory mapped view when the layout allows
+        it), the (x, y) lower left corner of the window, the (x, y) cell size, the NoData
+        value of the GDAL_NODATA tag (or None without the tag) and the read mode ('view' or 'blocks').  Returns None
+        when the file layout is not supported or the extent misses the raster. """
+
+    try:
+        info = readTiffInfo(path)
+    except (IOError, OSError, struct.error, KeyError, IndexError):
+        return None
+    if info is None:
+        return None
+
+    supported = info['compression'] == 1 or (info['compression'] in deflateCodes and info['predictor'] in (1, 2, 3))
+    if not supported or (info['predictor'] == 2 and info['dtype'].kind == 'f'):
+        return None
+
+    r0, r1, c0, c1 = snapWindow(info['origin'], info['cellSize'], (info['height'], info['width']), extent)
+    if r1 <= r0 or c1 <= c0:
+        return None
+
+    cellX, cellY = info['cellSize']
+    lowerLeft = (info['origin'][0] + c0 * cellX, info['origin'][1] - r1 * cellY)
+    rowBytes = info['width'] * info['dtype'].itemsize
+
+    if isContiguous(info) and (r1 - r0) * rowBytes <= maxMapBytes:
+        rowsMap = np.memmap(path, dtype=info['dtype'], mode='r', offset=info['offsets'][0] + r0 * rowBytes,
+                            shape=(r1 - r0, info['width']))
+        return rowsMap[:, c0:c1], lowerLeft, info['cellSize'], info['noData'], 'view'
+
+    return readBlocks(info, r0, r1, c0, c1), lowerLeft, info['cellSize'], info['noData'], 'blocks'
+
+## ===================================================================================
+def readRasterWindow(path, extent, noDataFill=-3.40282346639e+38):
+    """ Reads the cells of any raster DEM that overlap an (xMin, yMin, xMax, yMax) extent.
+        GeoTIFFs are read with readWindow; other formats and layouts with a windowed
+        arcpy.RasterToNumPyArray.  Float DEMs read through arcpy have noDataFill as NoData;
+        integer DEMs are read with their own NoData value (noDataFill does not fit the
+        pixel type) and returned as float32 with NaN as NoData.
+
+        Returns the window array, its (x, y) lower left corner, the (x, y) cell size, the
+        NoData value (None when NoData is NaN) and the read mode ('view', 'blocks' or
+        'arcpy').  Returns None when the extent misses the raster. """
+
+    import arcpy
+
+    if os.path.splitext(path)[1].lower() in ('.tif', '.tiff'):
+        window = readWindow(path, extent)
+        if window is not None:
+            array, lowerLeft, cellSize, noData, mode = window
+            if not array.dtype.isnative:
+                array = array.astype(array.dtype.newbyteorder('='))
+            if noData is None:
+                try:
+                    noData = arcpy.Describe(path).noDataValue
+                except AttributeError:
+                    pass
+                noData = float(noData) if noData not in (None, "") else None
+            return array, lowerLeft, cellSize, noData, mode
+
+    desc = arcpy.Describe(path)
+    cellX = desc.meanCellWidth; cellY = desc.meanCellHeight
+    r0, r1, c0, c1 = snapWindow((desc.extent.XMin, desc.extent.YMax), (cellX, cellY), (desc.height, desc.width), extent)
+    if r1 <= r0 or c1 <= c0:
+        return None
+
+    lowerLeft = arcpy.Point(desc.extent.XMin + c0 * cellX, desc.extent.YMax - r1 * cellY)
+    if desc.isInteger:
+        array = arcpy.RasterToNumPyArray(path, lowerLeft, c1 - c0, r1 - r0).astype(np.float32)
+        if desc.noDataValue is not None:
+            array[array == np.float32(desc.noDataValue)] = np.nan
+        noData = None
+    else:
+        array = arcpy.RasterToNumPyArray(path, lowerLeft, c1 - c0, r1 - r0, noDataFill)
+        noData = noDataFill
+    return array, (lowerLeft.X, lowerLeft.Y), (cellX, cellY), noData, 'arcpy'
+
+## ===================================================================================
+def writeTiff(path, data, origin, cellSize, blockSize=None, deflate=False, predictor=1, noData=None):
+    """ Writes a little endian single band GeoTIFF (the self tests and the tiles of the 3
+        meter DEM store, HEL_DEM_Store.py).  blockSize is the (width, height) of tiles or
+        None for strips of 16 rows. """
+
+    rows, cols = data.shape
+    dtype = data.dtype.newbyteorder('<')
+    itemsize = dtype.itemsize
+
+    if blockSize:
+        blockWidth, blockHeight = blockSize
+    else:
+        blockWidth, blockHeight = cols, 16
+
+    blocks = list()
+    for top in range(0, rows, blockHeight):
+        for left in range(0, cols, blockWidth):
+            block = data[top:top + blockHeight, left:left + blockWidth]
+            if blockSize:
+                padded = np.zeros((blockHeight, blockWidth), dtype=data.dtype)
+                padded[:block.shape[0], :block.shape[1]] = block
+                block = padded
+            if predictor == 3:
+                planes = block.astype(data.dtype.newbyteorder('>')).view(np.uint8).reshape(block.shape[0], block.shape[1], itemsize)
+                planes = planes.transpose(0, 2, 1).reshape(block.shape[0], -1)
+                raw = np.diff(np.hstack((np.zeros((block.shape[0], 1), np.uint8), planes)), axis=1).astype(np.uint8).tobytes()
+            elif predictor == 2:
+                raw = np.diff(np.hstack((np.zeros((block.shape[0], 1), block.dtype), block)), axis=1).astype(dtype).tobytes()
+            else:
+                raw = block.astype(dtype).tobytes()
+            blocks.append(zlib.compress(raw) if deflate else raw)
+
+    kind = {'u': 1, 'i': 2, 'f': 3}[data.dtype.kind]
+    tags = [(256, 4, [cols]), (257, 4, [rows]), (258, 3, [itemsize * 8]), (259, 3, [8 if deflate else 1]),
+            (262, 3, [1]), (277, 3, [1]), (284, 3, [1]), (317, 3, [predictor]), (339, 3, [kind]),
+            (33550, 12, [cellSize, cellSize, 0.0]), (33922, 12, [0.0, 0.0, 0.0, origin[0], origin[1], 0.0])]
+    if blockSize:
+        tags += [(322, 3, [blockWidth]), (323, 3, [blockHeight]), (324, 4, None), (325, 4, [len(b) for b in blocks])]
+    else:
+        tags += [(273, 4, None), (278, 4, [blockHeight]), (279, 4, [len(b) for b in blocks])]
+    if noData is not None:
+        tags.append((42113, 2, repr(noData)))
+    tags.sort()
+
+    # Layout: header, image blocks, out of line tag values, IFD
+    offsets = list(); position = 8
+    for b in blocks:
+        offsets.append(position); position += len(b)
+
+    extra = b''; entries = list()
+    for tag, fieldType, values in tags:
+        if values is None:
+            values = offsets
+        if fieldType == 2:
+            raw = values.encode('ascii') + b'\x00'; count = len(raw)
+        else:
+            code = fieldTypes[fieldType][0]
+            raw = struct.pack('<' + code * len(values), *values); count = len(values)
+        if len(raw) <= 4:
+            entries.append(struct.pack('<HHI', tag, fieldType, count) + raw.ljust(4, b'\x00'))
+        else:
+            entries.append(struct.pack('<HHII', tag, fieldType, count, position + len(extra)))
+            extra += raw + (b'\x00' if len(raw) % 2 else b'')
+
+    with open(path, 'wb') as f:
+        f.write(b'II' + struct.pack('<HI', 42, position + len(extra)))
+        for b in blocks:
+            f.write(b)
+        f.write(extra)
+        f.write(struct.pack('<H', len(entries)) + b''.join(entries) + struct.pack('<I', 0))
+
+## ===================================================================================
+def selfTest():
+    """ Reads windows from synthetic GeoTIFFs in every supported layout """
+
+    folder = tempfile.mkdtemp(prefix='HEL_DEM_Reader_')
+    try:
+        rows, cols = 300, 420
+        y, x = np.mgrid[0:rows, 0:cols]
+        data = (200.0 + 0.05 * x + 0.02 * y + np.sin(x / 17.0)).astype(np.float32)
+        origin = (500000.0, 4400000.0); cellSize = 1.0
+        extent = (500123.4, 4399712.6, 500301.2, 4399890.3)
+
+        expected = data[int(4400000 - 4399890.3):int(math.ceil(4400000 - 4399712.6)), 123:int(math.ceil(301.2))]
+
+        layouts = [('strips', {}), ('tiles', {'blockSize': (64, 32)}),
+                   ('deflate strips', {'deflate': True}),
+                   ('deflate tiles predictor 3', {'blockSize': (64, 64), 'deflate': True, 'predictor': 3})]
+
+        bOK = True
+        for name, options in layouts:
+            path = os.path.join(folder, name.replace(' ', '_') + '.tif')
+            writeTiff(path, data, origin, cellSize, noData=-9999.0, **options)
+            window, lowerLeft, size, noData, mode = readWindow(path, extent)
+            match = window.shape == expected.shape and np.array_equal(window, expected)
+            print("%-26s %-7s %s  lower left %s  NoData %s" % (name, mode, 'OK' if match else 'MISMATCH', str(lowerLeft), str(noData)))
+            bOK = bOK and match and lowerLeft == (500123.0, 4399712.0)
+            del window
+
+        # Integer DEM with the horizontal differencing predictor
+        intData = (data * 100).astype(np.int32)
+        path = os.path.join(folder, 'int_predictor_2.tif')
+        writeTiff(path, intData, origin, cellSize, blockSize=(128, 128), deflate=True, predictor=2)
+        window = readWindow(path, extent)[0]
+        match = np.array_equal(window, intData[109:288, 123:302])
+        print("%-26s %-7s %s" % ('int deflate predictor 2', 'blocks', 'OK' if match else 'MISMATCH'))
+        return bOK and match
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
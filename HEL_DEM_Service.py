@@ -0,0 +1,412 @@
+# ==========================================================================================
+# Name:   HEL DEM Service
+#
+# Concurrent tile fetcher for the elevation image service used by the NRCS HEL Determination
+# tool.  Instead of clipping the whole buffered AOI with one blocking Clip request, the WGS84
+# extent is split into tiles on the cell grid of the service and every tile is requested
+# from the ImageServer exportImage endpoint as raw 32 bit float (format=bsq, pixelType=F32).
+# The tiles are stitched into one array in memory.
+#
+# This module does not import arcpy (see clipImageService in NRCS_HEL_Determination.py):
+#  - Tiles are fetched by a thread pool over a bounded pool of keep-alive HTTP connections
+#    so that the TLS handshake is paid once per connection instead of once per tile.
+#  - Connection errors, timeouts, HTTP 429 and 5xx responses and truncated tiles are
+#    retried with exponential backoff.  Other HTTP errors fail right away, and so do ArcGIS
+#    errors (token required, 498/499, invalid parameters) that arrive as HTTP 200 with a
+#    JSON, HTML or text body instead of cells.  The first tile that fails stops the others.
+#  - Every tile reports its latency, bytes transferred and number of attempts.
+#  - Tiles stay under the maximum image size of the service, so large tracts no longer fail
+#    when the service limits the export size.
+#  - serviceVersion returns a digest of the service description (f=json).  Its extent and
+#    statistics change when new elevation data is published, so caches of service data
+#    (HEL_DEM_Tile_Cache.py, HEL_Result_Cache.py) include it in their keys.
+#
+# Running this script directly exercises the fetcher against a local mock image service:
+#     python HEL_DEM_Service.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial pooled, concurrent exportImage fetcher with retry/backoff and a mock server.
+# - Service version from the service description.
+# - Non-binary HTTP 200 responses fail without retries and the first failed tile terminates
+#   the thread pool.
+# - The query string of the service URL (i.e. token=...) is kept on every exportImage request.
+
+import sys, math, time, json, threading, hashlib
+import numpy as np
+from multiprocessing.pool import ThreadPool
+
+try:
+    import httplib
+    import Queue as queue
+    from urlparse import urlparse, parse_qs
+    from urllib import urlencode
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    import http.client as httplib
+    import queue
+    from urllib.parse import urlparse, parse_qs, urlencode
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+serviceNoData = -9999.0
+
+## ===================================================================================
+class ConnectionPool(object):
+    """ Bounded pool of keep-alive HTTP(S) connections to one host.  Connections are
+        created on demand up to size and handed back after every request; a connection
+        that failed is closed and replaced. """
+
+    def __init__(self, url, size=4, timeout=60):
+        parts = urlparse(url)
+        self.scheme = parts.scheme.lower()
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.slots = threading.Semaphore(size)
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                self.created += 1
+            if self.scheme == 'https':
+                return httplib.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+            return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def put(self, conn, reuse=True):
+        if reuse:
+            self.idle.put(conn)
+        else:
+            conn.close()
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+## ===================================================================================
+def splitExtent(extent, cellSize, origin, tileCells=1024):
+    """ Splits a WGS84 (xMin, yMin, xMax, yMax) extent into tiles of at most tileCells x
+        tileCells cells on the service grid that starts at the (x, y) origin (upper left
+        corner of the service).  cellSize is a number or an (x, y) tuple.
+
+        Returns the snapped window (xMin, yMin, xMax, yMax), its rows and cols and a list
+        of tiles (dicts with 'tile', 'extent', 'rows', 'cols', 'rowOff' and 'colOff'). """
+
+    cellX, cellY = cellSize if isinstance(cellSize, (tuple, list)) else (cellSize, cellSize)
+    xOrigin, yOrigin = origin
+    xMin, yMin, xMax, yMax = extent
+
+    # Snap the window outward to the service cells
+    c0 = int(math.floor((xMin - xOrigin) / cellX)); c1 = int(math.ceil((xMax - xOrigin) / cellX))
+    r0 = int(math.floor((yOrigin - yMax) / cellY)); r1 = int(math.ceil((yOrigin - yMin) / cellY))
+    rows = r1 - r0; cols = c1 - c0
+
+    wxMin = xOrigin + c0 * cellX; wyMax = yOrigin - r0 * cellY
+    window = (wxMin, wyMax - rows * cellY, wxMin + cols * cellX, wyMax)
+
+    tiles = list()
+    for rowOff in range(0, rows, tileCells):
+        for colOff in range(0, cols, tileCells):
+            tRows = min(tileCells, rows - rowOff); tCols = min(tileCells, cols - colOff)
+            txMin = wxMin + colOff * cellX; tyMax = wyMax - rowOff * cellY
+            tiles.append({'tile': (rowOff // tileCells, colOff // tileCells),
+                          'extent': (txMin, tyMax - tRows * cellY, txMin + tCols * cellX, tyMax),
+                          'rows': tRows, 'cols': tCols, 'rowOff': rowOff, 'colOff': colOff})
+    return window, rows, cols, tiles
+
+## ===================================================================================
+def exportQuery(tile, wkid=4326, noData=serviceNoData):
+    """ Returns the exportImage query string of a tile as raw float32 cells """
+
+    params = [('bbox', ",".join([repr(float(v)) for v in tile['extent']])),
+              ('bboxSR', wkid), ('imageSR', wkid),
+              ('size', "%d,%d" % (tile['cols'], tile['rows'])),
+              ('format', 'bsq'), ('pixelType', 'F32'), ('noData', noData),
+              ('interpolation', 'RSP_NearestNeighbor'), ('f', 'image')]
+    return urlencode(params)
+
+## ===================================================================================
+def serviceError(response, body):
+    """ Returns the error of an HTTP 200 response that does not hold raw cells (an ArcGIS
+        JSON error or an HTML/text page) or None for a binary response """
+
+    contentType = (response.getheader('content-type', '') or '').lower()
+    text = any([t in contentType for t in ('json', 'text', 'html', 'xml')])
+    if not text and not body.lstrip()[:1] in (b'{', b'<'):
+        return None
+
+    try:
+        error = json.loads(body.decode('utf-8')).get('error', dict())
+        return "service error %s: %s" % (error.get('code', ''), error.get('message', ''))
+    except (ValueError, AttributeError, UnicodeDecodeError):
+        if not text:
+            return None                              # raw cells that start with '{' or '<'
+        return "%s response: %s" % (contentType or 'non-binary', body[:200].decode('utf-8', 'replace').strip())
+
+## ===================================================================================
+def fetchTile(pool, path, tile, wkid=4326, noData=serviceNoData, retries=3, backoff=0.5, query=''):
+    """ Requests one tile through the connection pool.  query is the query string of the
+        service URL (i.e. token=...) and is appended to the exportImage parameters.
+        Retryable failures are tried again after backoff, 2 x backoff, 4 x backoff ...
+        seconds.
+
+        Returns the float32 tile (NaN as NoData) and a dict of statistics (tile,
+        seconds, bytes, attempts).  Raises RuntimeError when the tile cannot be fetched;
+        an HTTP 200 response that is not raw cells (serviceError) is not retried. """
+
+    url = path.rstrip('/') + '/exportImage?' + exportQuery(tile, wkid, noData) + ('&' + query if query else '')
+    expected = tile['rows'] * tile['cols'] * 4
+    start = time.time()
+    transferred = 0
+    error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+        conn = pool.get()
+        reuse = False
+        try:
+            conn.request('GET', url)
+            response = conn.getresponse()
+            body = response.read()
+            transferred += len(body)
+            reuse = response.getheader('connection', '').lower() != 'close'
+
+            if response.status == 200:
+                error = serviceError(response, body)
+                if error is not None:
+                    break
+
+            if response.status == 200 and len(body) == expected:
+                data = np.frombuffer(body, dtype='<f4').reshape(tile['rows'], tile['cols']).astype(np.float32)
+                data[data == np.float32(noData)] = np.nan
+                return data, {'tile': tile['tile'], 'seconds': time.time() - start,
+                              'bytes': transferred, 'attempts': attempt + 1}
+
+            if response.status == 200:
+                error = "%d of %d bytes" % (len(body), expected)
+            else:
+                error = "HTTP %d %s" % (response.status, response.reason)
+                if response.status != 429 and response.status < 500:
+                    break
+
+        except (httplib.HTTPException, EnvironmentError) as e:
+            error = "%s: %s" % (type(e).__name__, e)
+
+        finally:
+            pool.put(conn, reuse)
+
+    raise RuntimeError("Tile %s failed after %d attempts (%s)" % (str(tile['tile']), attempt + 1, error))
+
+## ===================================================================================
+def serviceVersion(url, timeout=60):
+    """ Returns a version of an ImageServer: the SHA-1 digest of its service description
+        (f=json), or None when the description cannot be read """
+
+    parts = urlparse(url)
+    pool = ConnectionPool(url, 1, timeout)
+    conn = pool.get()
+    try:
+        conn.request('GET', parts.path.rstrip('/') + '?f=json' + ('&' + parts.query if parts.query else ''))
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            return None
+        description = json.loads(body.decode('utf-8'))
+        if not isinstance(description, dict) or 'error' in description:
+            return None
+        return hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    except (httplib.HTTPException, EnvironmentError, ValueError):
+        return None
+
+    finally:
+        pool.put(conn, False)
+        pool.close()
+
+## ===================================================================================
+def fetchExtent(url, extent, cellSize, origin, wkid=4326, tileCells=1024, workers=4,
+                retries=3, backoff=0.5, timeout=60, noData=serviceNoData):
+    """ Downloads a WGS84 (xMin, yMin, xMax, yMax) extent from an ImageServer url in
+        tiles over a pool of workers connections and stitches them together.
+
+        Returns the float32 array (north up, NaN as NoData), its (xMin, yMin, xMax, yMax)
+        window and a dict of statistics (tiles: list of per tile statistics, bytes,
+        seconds, connections). """
+
+    start = time.time()
+    window, rows, cols, tiles = splitExtent(extent, cellSize, origin, tileCells)
+    out = np.full((rows, cols), np.nan, dtype=np.float32)
+
+    pool = ConnectionPool(url, workers, timeout)
+    parts = urlparse(url)
+
+    def fetch(tile):
+        data, stats = fetchTile(pool, parts.path, tile, wkid, noData, retries, backoff, parts.query)
+        return tile, data, stats
+
+    # The first tile that fails terminates the pool so that the tiles still queued are dropped
+    threads = ThreadPool(max(1, min(workers, len(tiles))))
+    tileStats = list()
+    try:
+        for tile, data, stats in threads.imap_unordered(fetch, tiles):
+            out[tile['rowOff']:tile['rowOff'] + tile['rows'], tile['colOff']:tile['colOff'] + tile['cols']] = data
+            tileStats.append(stats)
+        threads.close()
+    except:
+        threads.terminate()
+        raise
+    finally:
+        threads.join()
+        pool.close()
+
+    stats = {'tiles': tileStats, 'bytes': sum([s['bytes'] for s in tileStats]),
+             'seconds': time.time() - start, 'connections': pool.created}
+    return out, window, stats
+
+## ===================================================================================
+class MockImageService(ThreadingMixIn, HTTPServer):
+    """ Local stand-in for an ImageServer that answers exportImage with raw float32
+        cells of a smooth analytic surface.  The first failFirst requests of every
+        tile answer HTTP 503 to exercise the retries.  When errorBody is set exportImage
+        answers HTTP 200 with that JSON error instead; when token is set requests without
+        that token get the ArcGIS token required error. """
+
+    daemon_threads = True
+
+    def __init__(self, failFirst=0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), MockImageHandler)
+        self.failFirst = failFirst
+        self.errorBody = None
+        self.token = None
+        self.description = {'currentVersion': 10.81, 'extent': {'xmin': -94.0, 'ymin': 41.0, 'xmax': -93.0, 'ymax': 42.0}}
+        self.attempts = dict()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/arcgis/rest/services/elevation/ImageServer" % self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    @staticmethod
+    def elevation(x, y):
+        return (250.0 + 800.0 * (x + 93.5) + 500.0 * (y - 41.5) + 3.0 * np.sin(x * 900.0) * np.cos(y * 700.0)).astype(np.float32)
+
+## ===================================================================================
+class MockImageHandler(BaseHTTPRequestHandler):
+    """ exportImage handler of MockImageService """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlparse(self.path)
+        query = dict([(k, v[0]) for k, v in parse_qs(parts.query).items()])
+        if parts.path.endswith('/ImageServer') and query.get('f') == 'json':
+            return self.reply(200, json.dumps(self.server.description).encode('utf-8'))
+        if not parts.path.endswith('/exportImage'):
+            return self.reply(404, b'')
+
+        with self.server.lock:
+            attempt = self.server.attempts.get(query['bbox'], 0)
+            self.server.attempts[query['bbox']] = attempt + 1
+        if self.server.errorBody is not None:
+            return self.reply(200, json.dumps(self.server.errorBody).encode('utf-8'), 'application/json')
+        if self.server.token is not None and query.get('token') != self.server.token:
+            error = {'error': {'code': 499, 'message': 'Token Required', 'details': []}}
+            return self.reply(200, json.dumps(error).encode('utf-8'), 'application/json')
+        if attempt < self.server.failFirst:
+            return self.reply(503, b'busy')
+
+        xMin, yMin, xMax, yMax = [float(v) for v in query['bbox'].split(',')]
+        cols, rows = [int(v) for v in query['size'].split(',')]
+        y, x = np.mgrid[0:rows, 0:cols]
+        x = xMin + (x + 0.5) * (xMax - xMin) / cols
+        y = yMax - (y + 0.5) * (yMax - yMin) / rows
+        self.reply(200, self.server.elevation(x, y).astype('<f4').tobytes())
+
+    def reply(self, status, body, contentType='application/octet-stream'):
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+## ===================================================================================
+def selfTest():
+    """ Fetches an extent from the mock image service and checks the stitched array and
+        the service version """
+
+    server = MockImageService(failFirst=1)
+    try:
+        cellSize = 1.0 / 10800                        # 1/3 arc-second
+        origin = (-94.0, 42.0)
+        extent = (-93.512345, 41.471234, -93.487654, 41.489876)
+
+        dem, window, stats = fetchExtent(server.url, extent, cellSize, origin, tileCells=100,
+                                         workers=4, backoff=0.01)
+
+        rows, cols = dem.shape
+        y, x = np.mgrid[0:rows, 0:cols]
+        expected = MockImageService.elevation(window[0] + (x + 0.5) * cellSize, window[3] - (y + 0.5) * cellSize)
+        maxDiff = np.abs(dem - expected).max()
+
+        latency = [s['seconds'] for s in stats['tiles']]
+        print("Window: %d x %d cells in %d tiles over %d connections" % (rows, cols, len(stats['tiles']), stats['connections']))
+        print("Transferred %.2f MB in %.2f seconds" % (stats['bytes'] / 1048576.0, stats['seconds']))
+        print("Tile latency: mean %.3f  max %.3f seconds; %d attempts" % (np.mean(latency), max(latency), sum([s['attempts'] for s in stats['tiles']])))
+        print("Max difference from the service: %g" % maxDiff)
+
+        # New data changes the extent of the service description
+        version = serviceVersion(server.url)
+        server.description['extent']['xmin'] = -95.0
+        versionOK = version is not None and serviceVersion(server.url) not in (None, version)
+        print("Service version changes with the service description: %s" % versionOK)
+
+        # The token of the service URL is sent with every tile
+        server.token = 'abc123'
+        tokenDEM, tokenWindow, tokenStats = fetchExtent(server.url + '?token=abc123', extent, cellSize, origin, tileCells=100,
+                                                        workers=4, backoff=0.01)
+        server.token = None
+        tokenOK = np.array_equal(tokenDEM, dem)
+        print("Service URL with a token: %s" % tokenOK)
+
+        # Token required comes back as HTTP 200 with a JSON error; every tile is requested at most once
+        server.errorBody = {'error': {'code': 499, 'message': 'Token Required', 'details': []}}
+        server.attempts.clear()
+        try:
+            fetchExtent(server.url, extent, cellSize, origin, tileCells=100, workers=4, backoff=0.01)
+            errorOK = False
+        except RuntimeError as e:
+            errorOK = 'Token Required' in str(e) and max(server.attempts.values()) == 1
+            print("JSON error: %s; tiles requested %d of %d" % (e, len(server.attempts), len(stats['tiles'])))
+
+        return maxDiff < 1e-3 and all([s['attempts'] == 2 for s in stats['tiles']]) and stats['connections'] <= 4 and versionOK and tokenOK and errorOK
+
+    finally:
+        server.stop()
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
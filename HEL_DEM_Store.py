@@ -0,0 +1,278 @@
+# ==========================================================================================
+# Name:   HEL DEM Store
+#
+# Pre-resampled 3 meter DEM store for the NRCS HEL Determination tool.  Every LiDAR run that
+# starts from 1 or 2 meter DEMs resamples the same source cells to 3 meters again.  The store
+# does that work once per county or state (see HEL_Build_DEM_Store.py):
+#
+#  - The store is a folder of 3 meter GeoTIFF tiles of tileCells x tileCells cells on a grid
+#    anchored at a fixed origin (0, 0), the same grid extractDEM resamples to.  Like extractDEM
+#    the cell size is 3 in the linear units of the coordinate system (3 feet in a foot
+#    system) and sources up to 3 meters (9.84252 feet) are used.
+#  - HEL_DEM_Store.vmosaic.json in the store folder is a virtual mosaic descriptor
+#    (HEL_Mosaic.py) of the tiles, so the HEL Determination tool reads it like any virtual
+#    mosaic; the cell size is already 3 meters so nothing is resampled at run time.
+#  - Every tile records the DEM library tiles that fed it and their size and modification
+#    time (HEL_DEM_Index.py).  A rebuild only regenerates the tiles whose sources were added,
+#    changed or removed; tiles left without sources are deleted.
+#  - A store tile is the MEAN mosaic of its source DEMs (the Merge Local DEMs rule) resampled
+#    bilinearly (HEL_Resample.py) exactly as extractDEM would resample the same DEMs.
+#
+# This module does not import arcpy.  Source windows are read through a reader function
+# (HEL_DEM_Reader.py by default).
+#
+# Running this script directly builds a store from synthetic 1 meter GeoTIFFs, compares it
+# with a direct resample and rebuilds it after one source changes:
+#     python HEL_DEM_Store.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial 3 meter tiled DEM store with incremental rebuilds.
+# - maxSourceCell (the extractDEM limit of 3 meters in foot systems) and atomic replace of
+#   the descriptor (HEL_DEM_Index.replaceFile).
+
+import os, sys, json, math, time, tempfile, shutil
+import numpy as np
+import HEL_DEM_Index, HEL_DEM_Reader, HEL_Mosaic, HEL_Resample
+
+storeName = 'HEL_DEM_Store' + HEL_Mosaic.descriptorExtension
+tileFolder = 'tiles'
+noDataValue = -9999.0
+
+## ===================================================================================
+def tileExtent(key, tileSize, origin):
+    """ Returns the (xMin, yMin, xMax, yMax) extent of the (row, col) store tile """
+
+    row, col = key
+    return (origin[0] + col * tileSize, origin[1] + row * tileSize, origin[0] + (col + 1) * tileSize, origin[1] + (row + 1) * tileSize)
+
+## ===================================================================================
+def tileKeys(extent, tileSize, origin):
+    """ Returns the (row, col) keys of the store tiles that intersect an extent.  Rows
+        count north from the origin. """
+
+    xMin, yMin, xMax, yMax = extent
+    c0 = int(math.floor((xMin - origin[0]) / tileSize)); c1 = int(math.ceil((xMax - origin[0]) / tileSize))
+    r0 = int(math.floor((yMin - origin[1]) / tileSize)); r1 = int(math.ceil((yMax - origin[1]) / tileSize))
+    return [(row, col) for row in range(r0, r1) for col in range(c0, c1)]
+
+## ===================================================================================
+def loadStore(storeFolder):
+    """ Reads the descriptor of a store folder.  Returns None when there is none. """
+
+    path = os.path.join(storeFolder, storeName)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return HEL_Mosaic.readDescriptor(path)
+    except ValueError:
+        return None
+
+## ===================================================================================
+def resampleTile(sources, extent, cellSize, origin, reader):
+    """ Mosaics the source DEMs ((path, properties) pairs) that overlap a store tile with
+        MEAN and resamples them to the cellSize grid of the tile.  Sources of different
+        cell sizes are mosaicked separately and averaged after resampling.  Returns the
+        float32 tile (NaN as NoData) or None when the tile has no data. """
+
+    groups = dict()
+    for path, properties in sources:
+        groups.setdefault(round(properties['cellSize'], 6), list()).append((path, properties))
+
+    # Shrink the extent by half a cell so that snapping it outward gives exactly the tile
+    half = cellSize / 2.0
+    inner = (extent[0] + half, extent[1] + half, extent[2] - half, extent[3] - half)
+
+    total = None
+    for srcCell in sorted(groups):
+        mosaic = {'cellSize': groups[srcCell][0][1]['cellSize'], 'rule': 'MEAN',
+                  'tiles': [{'path': path, 'extent': properties['extent']} for path, properties in groups[srcCell]]}
+        pad = cellSize + srcCell
+        window, lowerLeft, tilesRead = HEL_Mosaic.readWindow(mosaic, (extent[0] - pad, extent[1] - pad, extent[2] + pad, extent[3] + pad), reader)
+        values, tileLowerLeft = HEL_Resample.bilinearResample(window, lowerLeft, mosaic['cellSize'], inner, cellSize, origin)
+        del window
+
+        if len(groups) == 1:
+            return values if np.isfinite(values).any() else None
+
+        valid = np.isfinite(values)
+        if total is None:
+            total = np.zeros(values.shape, dtype=np.float64); count = np.zeros(values.shape, dtype=np.int32)
+        total += np.where(valid, values, 0.0)
+        count += valid
+
+    if not count.any():
+        return None
+    tile = np.full(total.shape, np.nan, dtype=np.float32)
+    tile[count > 0] = (total[count > 0] / count[count > 0]).astype(np.float32)
+    return tile
+
+## ===================================================================================
+def writeStore(storeFolder, descriptor):
+    """ Writes the descriptor of a store folder through a temporary file that replaces
+        the old descriptor in one step """
+
+    path = os.path.join(storeFolder, storeName)
+    tempPath = path + '.tmp'
+    with open(tempPath, 'w') as f:
+        json.dump(descriptor, f, indent=1)
+    HEL_DEM_Index.replaceFile(tempPath, path)
+    return path
+
+## ===================================================================================
+def buildStore(storeFolder, library, sources, spatialReference, linearUnits, cellSize=3.0, tileCells=2000,
+               origin=(0.0, 0.0), extent=None, reader=HEL_Mosaic.geoTiffReader, progress=None, maxSourceCell=None):
+    """ Builds or refreshes the store of a DEM library.  sources is the dict of relative
+        path -> tile properties of the library index (HEL_DEM_Index.updateIndex); only the
+        sources in spatialReference with a cell size of maxSourceCell (default cellSize) or
+        finer are used.  extent
+        optionally limits the store to the tiles that intersect an (xMin, yMin, xMax, yMax)
+        extent, i.e. a county.  progress(n, total, key) is called for every tile rebuilt.
+
+        Returns the descriptor path and a dict with the number of tiles built, kept
+        (unchanged sources) and removed. """
+
+    settings = {'spatialReference': spatialReference, 'linearUnits': linearUnits, 'cellSize': cellSize,
+                'tileCells': tileCells, 'origin': list(origin)}
+    tileSize = tileCells * cellSize
+
+    # A store built with other settings is rebuilt from scratch
+    old = loadStore(storeFolder)
+    oldTiles = dict()
+    if old and all([old.get(name) == value for name, value in settings.items()]):
+        oldTiles = dict([(tile['key'], tile) for tile in old['tiles']])
+    elif old:
+        for tile in old['tiles']:
+            if os.path.exists(tile['path']):
+                os.remove(tile['path'])
+
+    usable = dict([(relPath, tile) for relPath, tile in sources.items()
+                   if tile['spatialReference'] == spatialReference and tile['cellSize'] <= (maxSourceCell or cellSize) * (1 + 1e-6)])
+    grid = HEL_DEM_Index.GridIndex(usable)
+    maxPad = cellSize + max([tile['cellSize'] for tile in usable.values()] or [0.0])
+
+    keys = set()
+    for tile in usable.values():
+        tExtent = tile['extent']
+        if extent:
+            tExtent = (max(tExtent[0], extent[0]), max(tExtent[1], extent[1]), min(tExtent[2], extent[2]), min(tExtent[3], extent[3]))
+            if tExtent[0] >= tExtent[2] or tExtent[1] >= tExtent[3]:
+                continue
+        keys.update(tileKeys(tExtent, tileSize, origin))
+
+    if not os.path.isdir(os.path.join(storeFolder, tileFolder)):
+        os.makedirs(os.path.join(storeFolder, tileFolder))
+
+    # Rows run north to south so the first tile is the upper left one
+    stats = {'built': 0, 'kept': 0, 'removed': 0}
+    tiles = list()
+    for n, key in enumerate(sorted(keys, key=lambda k: (-k[0], k[1]))):
+        keyName = "%d_%d" % key
+        tilePath = os.path.join(storeFolder, tileFolder, "dem_" + keyName + ".tif")
+        xMin, yMin, xMax, yMax = tileExtent(key, tileSize, origin)
+
+        feeding = grid.query(spatialReference, (xMin - maxPad, yMin - maxPad, xMax + maxPad, yMax + maxPad))
+        fingerprints = dict([(relPath, usable[relPath]['fingerprint']) for relPath in feeding])
+
+        oldTile = oldTiles.pop(keyName, None)
+        if oldTile and oldTile['sources'] == fingerprints and os.path.isfile(tilePath):
+            tiles.append(oldTile)
+            stats['kept'] += 1
+            continue
+
+        if progress:
+            progress(n + 1, len(keys), keyName)
+        data = resampleTile([(os.path.join(library, relPath), usable[relPath]) for relPath in feeding],
+                            (xMin, yMin, xMax, yMax), cellSize, origin, reader)
+        if data is None:
+            if os.path.exists(tilePath):
+                os.remove(tilePath)
+                stats['removed'] += 1
+            continue
+
+        data[np.isnan(data)] = noDataValue
+        HEL_DEM_Reader.writeTiff(tilePath, data, (xMin, yMax), cellSize, blockSize=(256, 256), deflate=True, predictor=3, noData=noDataValue)
+        del data
+
+        tiles.append({'key': keyName, 'path': os.path.abspath(tilePath), 'extent': [xMin, yMin, xMax, yMax],
+                      'sources': fingerprints, 'built': time.time()})
+        stats['built'] += 1
+
+    # Tiles whose sources are all gone
+    for keyName, tile in oldTiles.items():
+        tilePath = os.path.join(storeFolder, tileFolder, "dem_" + keyName + ".tif")
+        if os.path.exists(tilePath):
+            os.remove(tilePath)
+        stats['removed'] += 1
+
+    descriptor = dict(settings)
+    descriptor.update({'rule': 'FIRST', 'updated': time.time(), 'tiles': tiles})
+    return writeStore(storeFolder, descriptor), stats
+
+## ===================================================================================
+def selfTest():
+    """ Builds a store from four 1 meter GeoTIFFs, compares a window with a direct MEAN
+        mosaic and resample, then rebuilds it after one source changes and one is removed """
+
+    folder = tempfile.mkdtemp(prefix='HEL_DEM_Store_')
+    try:
+        library = os.path.join(folder, 'library'); storeFolder = os.path.join(folder, 'store')
+        os.makedirs(library)
+
+        # 2 x 2 library of 1 meter tiles of 700 cells that overlap by 100 cells
+        sr = 'NAD_1983_UTM_Zone_15N'
+        size = 700; step = 600
+        y, x = np.mgrid[0:1300, 0:1300]
+        truth = (300.0 + 0.02 * x - 0.01 * y + 2.0 * np.sin(x / 37.0) * np.cos(y / 23.0)).astype(np.float32)
+
+        def writeSource(i, j, offset=0.0):
+            xMin = 500003.0 + j * step; yMax = 4400001.0 - i * step
+            path = os.path.join(library, "dem_%d_%d.tif" % (i, j))
+            HEL_DEM_Reader.writeTiff(path, truth[i * step:i * step + size, j * step:j * step + size] + offset, (xMin, yMax), 1.0, noData=-9999.0)
+            return path
+
+        def describe(path):
+            info = HEL_DEM_Reader.readTiffInfo(path)
+            xMin, yMax = info['origin']
+            return {'extent': [xMin, yMax - info['height'], xMin + info['width'], yMax], 'spatialReference': sr,
+                    'srType': 'Projected', 'linearUnits': 'Meter', 'cellSize': info['cellSize'][0],
+                    'pixelType': '32_BIT_FLOAT', 'bandCount': 1}
+
+        for i in range(2):
+            for j in range(2):
+                writeSource(i, j)
+        sources, described, removed = HEL_DEM_Index.updateIndex(library, describe)
+
+        # 150 cell (450 m) store tiles
+        descriptorPath, first = buildStore(storeFolder, library, sources, sr, 'Meter', tileCells=150)
+        store = HEL_Mosaic.readDescriptor(descriptorPath)
+
+        # A window of the store against the direct path of extractDEMfromMosaic
+        window = (500400.0, 4399302.0, 500901.0, 4399800.0)
+        stored, storedLowerLeft, tilesRead = HEL_Mosaic.readWindow(store, window)
+        mosaic = {'cellSize': 1.0, 'rule': 'MEAN', 'tiles': [{'path': os.path.join(library, relPath), 'extent': tile['extent']} for relPath, tile in sorted(sources.items())]}
+        source, sourceLowerLeft, n = HEL_Mosaic.readWindow(mosaic, (window[0] - 4, window[1] - 4, window[2] + 4, window[3] + 4))
+        direct, directLowerLeft = HEL_Resample.bilinearResample(source, sourceLowerLeft, 1.0, window, 3.0, (0.0, 0.0))
+        maxDiff = np.abs(stored - direct).max()
+
+        # Change one source and remove another: only the tiles they fed are rebuilt
+        changed = writeSource(0, 0, 5.0)
+        os.utime(changed, (time.time() + 10, time.time() + 10))
+        os.remove(os.path.join(library, "dem_1_1.tif"))
+        sources, described, removed = HEL_DEM_Index.updateIndex(library, describe)
+        descriptorPath, second = buildStore(storeFolder, library, sources, sr, 'Meter', tileCells=150)
+        third = buildStore(storeFolder, library, sources, sr, 'Meter', tileCells=150)[1]
+
+        print("Initial build: %d tiles; window of %d x %d cells from %d tiles, max difference from a direct resample %g" % (first['built'], stored.shape[0], stored.shape[1], tilesRead, maxDiff))
+        print("After one change and one removal: %s" % str(second))
+        print("Without changes: %s" % str(third))
+        return (maxDiff == 0 and storedLowerLeft == directLowerLeft and stored.shape == direct.shape
+                and 0 < second['built'] < first['built'] and second['removed'] > 0 and third['built'] == 0 and third['removed'] == 0)
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
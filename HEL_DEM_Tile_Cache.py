@@ -0,0 +1,342 @@
+# ==========================================================================================
+# Name:   HEL DEM Tile Cache
+#
+# Persistent on-disk cache of elevation tiles for the NRCS HEL Determination tool.  DEMs
+# that come from the NRCS elevation image service are cut into fixed tiles of the CLU's
+# projected grid so that neighboring tracts reuse the tiles that were already downloaded
+# instead of clipping and projecting the service again for every run.
+#
+# This module does not import arcpy.  The calling script hands in a fetcher that downloads
+# the missing tiles (see fetchServiceTiles in NRCS_HEL_Determination.py); StandInService is
+# a local stand-in for testing.
+#
+#  - Tiles are tileSize x tileSize cells at the output resolution (3 meters) and line up with
+#    the origin of the projected coordinate system: tile (row, col) covers
+#    x = col * span to (col + 1) * span and y = row * span to (row + 1) * span where
+#    span = tileSize * resolution.  Every window is snapped to the same cell grid.
+#  - Tiles are keyed by service and service version, coordinate system (WKID), resolution
+#    and tile row/col and stored as compressed float32 .npz files with NaN as NoData:
+#        <cacheFolder>\<service and version hash>\<wkid>_<resolution>m\<row>_<col>.npz
+#    A new version of the service (new LiDAR) starts a new set of tiles; the tiles of the
+#    old version are never read again and age out of the cache.
+#  - Only complete tiles are cached.  A tile with any NoData (a failed or partial download,
+#    the edge of the LiDAR coverage) is used for the current window and fetched again the
+#    next time so that it picks up data published later.
+#  - Reading a tile touches its modification time, at most once every touchSeconds.  When the
+#    cache is over its disk budget the least recently used tiles are deleted first.  The
+#    cache is walked for eviction once every evictSeconds (per cache folder, across
+#    processes) or when a process wrote evictFraction of the budget since its last eviction.
+#  - Tiles are written to a temporary file and renamed so that concurrent batch processes
+#    never read a partial tile.
+#
+# Running this script directly exercises the cache against the stand-in service:
+#     python HEL_DEM_Tile_Cache.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial tile cache with LRU eviction by disk budget and a stand-in service.
+# - Tiles are keyed by service version, tiles with NoData are not cached and eviction only
+#   walks the cache periodically or after a share of the budget was written.
+
+import os, sys, math, time, hashlib, tempfile, shutil
+import numpy as np
+
+touchSeconds = 3600                                  # minimum age before a read touches a tile
+evictSeconds = 3600                                  # minimum time between evictions of a cache
+evictFraction = 0.05                                 # share of the budget written that forces an eviction
+evictStamp = 'evict.stamp'                           # file in the cache folder marking the last eviction
+bytesWritten = dict()                                # cache folder -> bytes written since the last eviction
+
+## ===================================================================================
+def tileSpan(resolution, tileSize):
+    """ Returns the ground width of a tile """
+
+    return resolution * tileSize
+
+## ===================================================================================
+def snapExtent(extent, resolution):
+    """ Snaps an (xMin, yMin, xMax, yMax) extent outward to the cell grid """
+
+    xMin, yMin, xMax, yMax = extent
+    return (math.floor(xMin / resolution) * resolution, math.floor(yMin / resolution) * resolution,
+            math.ceil(xMax / resolution) * resolution, math.ceil(yMax / resolution) * resolution)
+
+## ===================================================================================
+def tilesForExtent(extent, resolution, tileSize):
+    """ Returns the (row, col) of every tile that overlaps an extent """
+
+    span = tileSpan(resolution, tileSize)
+    xMin, yMin, xMax, yMax = extent
+
+    cols = range(int(math.floor(xMin / span)), int(math.ceil(xMax / span)))
+    rows = range(int(math.floor(yMin / span)), int(math.ceil(yMax / span)))
+    return [(row, col) for row in rows for col in cols]
+
+## ===================================================================================
+def tileExtent(tile, resolution, tileSize):
+    """ Returns the (xMin, yMin, xMax, yMax) extent of a tile """
+
+    span = tileSpan(resolution, tileSize)
+    row, col = tile
+    return (col * span, row * span, (col + 1) * span, (row + 1) * span)
+
+## ===================================================================================
+def tileFolder(cacheFolder, serviceID, wkid, resolution, version=None):
+    """ Returns the folder that holds the tiles of a service version, coordinate system and
+        resolution """
+
+    key = str(serviceID).lower() if version is None else str(serviceID).lower() + '|' + str(version)
+    serviceHash = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cacheFolder, serviceHash, "%s_%gm" % (wkid, resolution))
+
+## ===================================================================================
+def tilePath(folder, tile):
+    """ Returns the file of a tile """
+
+    return os.path.join(folder, "%d_%d.npz" % tile)
+
+## ===================================================================================
+def readTile(path):
+    """ Reads a cached tile and marks it as recently used (once every touchSeconds).
+        Returns None if the tile is not cached or cannot be read. """
+
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path) as npz:
+            tile = npz['elevation']
+        if time.time() - os.path.getmtime(path) > touchSeconds:
+            os.utime(path, None)
+        return tile
+    except Exception:
+        return None
+
+## ===================================================================================
+def writeTile(path, tile):
+    """ Writes a compressed tile through a temporary file.  Returns the size of the file
+        or 0 if it was not written. """
+
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            pass                                     # created by another process
+
+    handle, tempPath = tempfile.mkstemp(suffix='.npz', dir=folder)
+    os.close(handle)
+    np.savez_compressed(tempPath, elevation=np.asarray(tile, dtype=np.float32))
+    try:
+        size = os.path.getsize(tempPath)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tempPath, path)
+        return size
+    except OSError:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        return 0
+
+## ===================================================================================
+def evict(cacheFolder, maxBytes):
+    """ Deletes the least recently used tiles until the cache fits in maxBytes.
+        Returns the number of tiles deleted. """
+
+    tiles = list()
+    for root, dirs, names in os.walk(cacheFolder):
+        for name in names:
+            if name.endswith('.npz'):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    tiles.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+
+    total = sum([t[1] for t in tiles])
+    deleted = 0
+    for modified, size, path in sorted(tiles):
+        if total <= maxBytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+## ===================================================================================
+def evictIfDue(cacheFolder, maxBytes):
+    """ Evicts the cache when its last eviction is older than evictSeconds or when this
+        process wrote evictFraction of maxBytes since its last eviction.  The time of the
+        last eviction is the modification time of evictStamp, shared by every process
+        that uses the cache.  Returns the number of tiles deleted. """
+
+    stamp = os.path.join(cacheFolder, evictStamp)
+    try:
+        age = time.time() - os.path.getmtime(stamp)
+    except OSError:
+        age = None
+
+    if age is not None and age < evictSeconds and bytesWritten.get(cacheFolder, 0) < maxBytes * evictFraction:
+        return 0
+
+    deleted = evict(cacheFolder, maxBytes)
+    bytesWritten[cacheFolder] = 0
+    try:
+        with open(stamp, 'a'):
+            os.utime(stamp, None)
+    except EnvironmentError:
+        pass
+    return deleted
+
+## ===================================================================================
+def extractWindow(cacheFolder, serviceID, wkid, extent, fetcher, resolution=3.0, tileSize=256, maxBytes=None, version=None):
+    """ Assembles the DEM of an (xMin, yMin, xMax, yMax) extent in the projected
+        coordinate system wkid from cached tiles and fetches only the missing ones.
+
+        fetcher is called once with a list of requests (dicts with 'tile', 'extent',
+        'rows', 'cols' and 'cellSize') and returns a dict of tile -> float32 array of
+        rows x cols with NaN as NoData.  Tiles missing from the result are left NoData;
+        tiles missing from the result or with any NoData are not cached.
+
+        version is the version of the service data (i.e. HEL_DEM_Service.serviceVersion);
+        tiles of another version are not used.  The cache is evicted down to maxBytes
+        when it is due (evictIfDue).
+
+        Returns the float32 window array (north up, NaN as NoData), its lower left
+        (x, y) corner and a dict of statistics (tiles, hits, fetched, seconds). """
+
+    start = time.time()
+    window = snapExtent(extent, resolution)
+    wxMin, wyMin, wxMax, wyMax = window
+    rows = int(round((wyMax - wyMin) / resolution))
+    cols = int(round((wxMax - wxMin) / resolution))
+    out = np.full((rows, cols), np.nan, dtype=np.float32)
+
+    folder = tileFolder(cacheFolder, serviceID, wkid, resolution, version)
+    tiles = tilesForExtent(window, resolution, tileSize)
+
+    found = dict()
+    requests = list()
+    for tile in tiles:
+        cached = readTile(tilePath(folder, tile))
+        if cached is not None and cached.shape == (tileSize, tileSize):
+            found[tile] = cached
+        else:
+            requests.append({'tile': tile, 'extent': tileExtent(tile, resolution, tileSize),
+                             'rows': tileSize, 'cols': tileSize, 'cellSize': resolution})
+    hits = len(found)
+
+    if requests:
+        fetched = fetcher(requests) or dict()
+        for request in requests:
+            tile = fetched.get(request['tile'])
+            if tile is None or np.shape(tile) != (tileSize, tileSize):
+                continue
+            tile = np.asarray(tile, dtype=np.float32)
+            if np.isfinite(tile).all():
+                bytesWritten[cacheFolder] = bytesWritten.get(cacheFolder, 0) + writeTile(tilePath(folder, request['tile']), tile)
+            found[request['tile']] = tile
+
+    # Copy the overlapping part of every tile into the window
+    for tile, data in found.items():
+        txMin, tyMin, txMax, tyMax = tileExtent(tile, resolution, tileSize)
+        colOff = int(round((txMin - wxMin) / resolution))
+        rowOff = int(round((wyMax - tyMax) / resolution))
+
+        r0 = max(rowOff, 0); r1 = min(rowOff + tileSize, rows)
+        c0 = max(colOff, 0); c1 = min(colOff + tileSize, cols)
+        if r1 > r0 and c1 > c0:
+            out[r0:r1, c0:c1] = data[r0 - rowOff:r1 - rowOff, c0 - colOff:c1 - colOff]
+
+    if maxBytes is not None:
+        evictIfDue(cacheFolder, maxBytes)
+
+    stats = {'tiles': len(tiles), 'hits': hits, 'fetched': len(found) - hits,
+             'seconds': time.time() - start}
+    return out, (wxMin, wyMin), stats
+
+## ===================================================================================
+class StandInService(object):
+    """ Local stand-in for the elevation image service.  Returns tiles of a smooth
+        analytic surface sampled at cell centers and records every request so that
+        cache hits and misses can be checked.  Cells west of noDataWest are NoData. """
+
+    def __init__(self, noDataWest=None):
+        self.requests = list()
+        self.noDataWest = noDataWest
+
+    def elevation(self, x, y):
+        return (300.0 + 0.004 * x + 0.002 * y + 5.0 * np.sin(x / 400.0) * np.cos(y / 650.0)).astype(np.float32)
+
+    def __call__(self, requests):
+        tiles = dict()
+        for request in requests:
+            self.requests.append(request['tile'])
+            xMin, yMin, xMax, yMax = request['extent']
+            size = request['cellSize']
+            y, x = np.mgrid[0:request['rows'], 0:request['cols']]
+            x = xMin + (x + 0.5) * size
+            y = yMax - (y + 0.5) * size
+            tile = self.elevation(x, y)
+            if self.noDataWest is not None:
+                tile[x < self.noDataWest] = np.nan
+            tiles[request['tile']] = tile
+        return tiles
+
+## ===================================================================================
+def selfTest():
+    """ Extracts overlapping windows from the stand-in service and checks the cache """
+
+    cacheFolder = tempfile.mkdtemp(prefix='HEL_DEM_Tile_Cache_')
+    try:
+        service = StandInService()
+        extent = (500123.4, 4400056.7, 502345.6, 4401987.6)
+
+        first, lowerLeft, stats1 = extractWindow(cacheFolder, 'stand-in', 26915, extent, service)
+        shifted = (extent[0] + 1000, extent[1], extent[2] + 1000, extent[3])
+        second, lowerLeft2, stats2 = extractWindow(cacheFolder, 'stand-in', 26915, shifted, service)
+
+        rows, cols = second.shape
+        y, x = np.mgrid[0:rows, 0:cols]
+        expected = service.elevation(lowerLeft2[0] + (x + 0.5) * 3.0, lowerLeft2[1] + rows * 3.0 - (y + 0.5) * 3.0)
+
+        print("First window:  %d tiles, %d hits, %d fetched" % (stats1['tiles'], stats1['hits'], stats1['fetched']))
+        print("Second window: %d tiles, %d hits, %d fetched" % (stats2['tiles'], stats2['hits'], stats2['fetched']))
+        print("Max difference from the service: %g" % np.abs(second - expected).max())
+
+        evict(cacheFolder, 0)
+        third, lowerLeft3, stats3 = extractWindow(cacheFolder, 'stand-in', 26915, extent, service)
+        print("After eviction: %d hits, %d fetched" % (stats3['hits'], stats3['fetched']))
+
+        # A new version of the service does not use the tiles of the old one
+        newVersion, lowerLeft4, stats4 = extractWindow(cacheFolder, 'stand-in', 26915, extent, service, version='2')
+        print("New service version: %d hits, %d fetched" % (stats4['hits'], stats4['fetched']))
+
+        # Tiles with NoData are used but not cached
+        partial = StandInService(noDataWest=extent[0] + 500)
+        extractWindow(cacheFolder, 'partial', 26915, extent, partial)
+        fifth, lowerLeft5, stats5 = extractWindow(cacheFolder, 'partial', 26915, extent, partial)
+        print("Tiles with NoData: %d hits, %d fetched" % (stats5['hits'], stats5['fetched']))
+
+        # Eviction waits for evictSeconds unless evictFraction of the budget was written
+        extractWindow(cacheFolder, 'stand-in', 26915, extent, service, maxBytes=0)
+        extractWindow(cacheFolder, 'stand-in', 26915, extent, service, maxBytes=10 ** 12)
+        bytesWritten[cacheFolder] = 0
+        throttled = len(service.requests)
+        extractWindow(cacheFolder, 'stand-in', 26915, extent, service, maxBytes=1)
+        extractWindow(cacheFolder, 'stand-in', 26915, extent, service, maxBytes=10 ** 12)
+        print("Tiles fetched after a throttled eviction: %d" % (len(service.requests) - throttled))
+
+        return (stats2['hits'] > 0 and stats3['hits'] == 0 and np.abs(second - expected).max() == 0 and
+                stats4['hits'] == 0 and 0 < stats5['hits'] < stats5['tiles'] and len(service.requests) - throttled == 0)
+
+    finally:
+        shutil.rmtree(cacheFolder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
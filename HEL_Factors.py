@@ -0,0 +1,323 @@
+# ==========================================================================================
+# Name:   HEL Factors Engine
+#
+# NumPy implementation of the LS, EI and HEL factor raster algebra used by the NRCS HEL
+# Determination tool.  This module does not import arcpy.  Inputs are 2D NumPy arrays
+# that share the DEM grid with NaN as NoData.
+#
+# Only PHEL cells (Og_HELcode = 2) need the erodibility index; HEL (0) and NHEL (1) cells get
+# their constant codes.  The PHEL mask is built first and the S, L, LS and EI factors are
+# evaluated on the PHEL cells only, so the Sin, Cos, Power and ATan work is skipped for
+# every other cell of the 410 meter buffer.
+#
+#   radians  = ATan(slope * 0.01)
+#   AH537:     S  = 65.41 * Sin(radians)^2 + 4.56 * Sin(radians) + 0.065
+#              L  = (flowLengthFT / 72.6) ^ m   m = 0.2 (<1%), 0.3 (1-3%), 0.4 (3-5%), 0.5 (>=5%)
+#              LS = L * S
+#   Runoff:    LS = ((flowLengthFT / 72.6) * Cos(radians)) ^ 0.5 * (Sin(radians) / Sin(5.143 deg)) ^ 0.7
+#   EI         = LS * K * R / T
+#   HEL factor = EI for PHEL, 9 for HEL, 1 for NHEL
+#   LiDAR HEL  = 1 (NHEL) where 0 <= HEL factor <= 8, 2 (HEL) where 8 < HEL factor <= 100000000
+#
+# helFactor evaluates the whole chain from slope to EI in one pass over chunks of chunkCells
+# PHEL cells (evaluateChunk).  Every step writes into a handful of float64 buffers of the
+# chunk size that are reused from chunk to chunk and stay in the CPU cache, so no temporary
+# the size of the grid is created.
+#
+# S and the slope term of the runoff LS equation, Cos(radians) ^ 0.5 * (Sin(radians) /
+# Sin(5.143 deg)) ^ 0.7, are functions of percent slope alone.  By default they are read from
+# lookup tables instead of evaluating ATan, Sin, Cos and Power on every cell.  The tables
+# have tableSteps knots per unit of Sqrt(percent slope) up to tableMaxSlope and are linearly
+# interpolated; the square root spacing puts the knots close together near flat slopes where
+# the runoff term behaves like slope ^ 0.7.  The maximum error against the formulas is:
+#
+#   S:            relative error below maxSFactorError (1e-6)
+#   Runoff term:  absolute error below maxRunoffTermError (5e-6); relative error below 1e-6
+#                 from 1 percent slope
+#
+# Steeper slopes and NoData use the formulas.  With tables=False the steps are the same
+# operations in the same order as lsFactor and the results are identical, bit for bit.
+#
+# Running this script directly checks the table errors, compares the chunked evaluator with
+# lsFactor for both LS equations and times them:
+#     python HEL_Factors.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial NumPy backend for the LS, EI and HEL factor computations restricted to PHEL cells.
+# - Fused chunked evaluation of the S, L, LS, EI and HEL factor chain (evaluateChunk).
+# - Lookup tables of the S factor and the runoff slope term over percent slope.
+
+import sys, math, time
+import numpy as np
+
+# Og_HELcode values of the HEL Summary layer
+helCode = 0
+nhelCode = 1
+phelCode = 2
+
+# LiDAR HEL Summary values
+lidarNHEL = 1
+lidarHEL = 2
+
+# PHEL cells per chunk of helFactor; 7 float64 buffers of 16384 cells take 896 KB
+chunkCells = 16384
+
+# L factor exponents by percent slope: < 1, 1 - 3, 3 - 5, >= 5
+slopeBreaks = np.array([1.0, 3.0, 5.0])
+lExponents = np.array([0.2, 0.3, 0.4, 0.5])
+
+# Denominator of the slope term of the runoff LS equation
+sin5143 = math.sin(5.143 * (math.pi / 180))
+
+# Lookup tables of the slope terms: knots per unit of Sqrt(percent slope), last tabulated
+# percent slope and the maximum errors checked by selfTest
+tableSteps = 500
+tableMaxSlope = 1000.0
+maxSFactorError = 1e-6
+maxRunoffTermError = 5e-6
+
+## ===================================================================================
+def lsFactor(slope, flowLengthFT, useRunoffLS=False):
+    """ Computes the LS factor from percent slope and flow length in feet.  Uses the
+        AH537 S and L factors or, if useRunoffLS is True, the runoff LS equation
+        for partially frozen soils.  Works on arrays of any shape. """
+
+    slope = np.asarray(slope, dtype=np.float64)
+    flowLengthFT = np.asarray(flowLengthFT, dtype=np.float64)
+
+    radians = np.arctan(slope * 0.01)
+    sinRad = np.sin(radians)
+
+    if useRunoffLS:
+        with np.errstate(invalid='ignore'):
+            return (np.power((flowLengthFT / 72.6) * np.cos(radians), 0.5) *
+                    np.power(sinRad / math.sin(5.143 * (math.pi / 180)), 0.7))
+
+    sFactor = (np.power(sinRad, 2) * 65.41) + (sinRad * 4.56) + 0.065
+
+    exponent = np.where(slope < 1, 0.2, np.where(slope < 3, 0.3, np.where(slope < 5, 0.4, 0.5)))
+    with np.errstate(invalid='ignore'):
+        lFactor = np.power(flowLengthFT / 72.6, exponent)
+
+    return lFactor * sFactor
+
+## ===================================================================================
+def sFactor(slope):
+    """ AH537 S factor of percent slope """
+
+    sinRad = np.sin(np.arctan(np.asarray(slope, dtype=np.float64) * 0.01))
+    return (np.power(sinRad, 2) * 65.41) + (sinRad * 4.56) + 0.065
+
+## ===================================================================================
+def runoffSlopeTerm(slope):
+    """ Slope term of the runoff LS equation, Cos(radians) ^ 0.5 * (Sin(radians) /
+        Sin(5.143 deg)) ^ 0.7, of percent slope """
+
+    radians = np.arctan(np.asarray(slope, dtype=np.float64) * 0.01)
+    with np.errstate(invalid='ignore'):
+        return np.power(np.cos(radians), 0.5) * np.power(np.sin(radians) / sin5143, 0.7)
+
+## ===================================================================================
+def slopeTable(function):
+    """ Tabulates function of percent slope at the knots (i / tableSteps) ^ 2 up to
+        tableMaxSlope """
+
+    knots = np.arange(int(math.ceil(math.sqrt(tableMaxSlope) * tableSteps)) + 2) / float(tableSteps)
+    return function(knots * knots)
+
+sFactorTable = slopeTable(sFactor)
+runoffTermTable = slopeTable(runoffSlopeTerm)
+
+## ===================================================================================
+def lookupSlopeTerm(slope, table, function, out, x):
+    """ Interpolates a slope term table at the percent slopes of a 1D float64 chunk into
+        out; x is a scratch buffer of the same size.  NoData and slopes beyond the table
+        are evaluated with function. """
+
+    np.sqrt(slope, out=x)
+    np.multiply(x, tableSteps, out=x)
+    outside = ~(x < table.size - 1)
+    x[outside] = 0
+
+    index = x.astype(np.intp)
+    np.subtract(x, index, out=x)
+    np.take(table, index, out=out)
+    index += 1
+    upper = table[index]
+    np.subtract(upper, out, out=upper)
+    np.multiply(upper, x, out=upper)
+    np.add(out, upper, out=out)
+
+    if outside.any():
+        out[outside] = function(slope[outside])
+
+## ===================================================================================
+def evaluateChunk(slope, flowLengthFT, k, r, t, a, b, useRunoffLS=False, tables=True):
+    """ Evaluates EI = LS * K * R / T on 1D float64 chunks in place.  slope, flowLengthFT,
+        k, r and t hold the inputs of the chunk; a and b are scratch buffers of the same
+        size.  S and the runoff slope term are read from the lookup tables unless tables
+        is False.  The EI is left in flowLengthFT; every other buffer is overwritten. """
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if useRunoffLS and tables:
+            lookupSlopeTerm(slope, runoffTermTable, runoffSlopeTerm, a, b)
+            np.divide(flowLengthFT, 72.6, out=flowLengthFT)
+            np.sqrt(flowLengthFT, out=flowLengthFT)
+            np.multiply(flowLengthFT, a, out=flowLengthFT)  # LS
+
+        elif useRunoffLS:
+            np.multiply(slope, 0.01, out=a)
+            np.arctan(a, out=a)                          # radians
+            np.cos(a, out=b)
+            np.divide(flowLengthFT, 72.6, out=flowLengthFT)
+            np.multiply(flowLengthFT, b, out=flowLengthFT)
+            np.power(flowLengthFT, 0.5, out=flowLengthFT)
+            np.sin(a, out=a)
+            np.divide(a, sin5143, out=a)
+            np.power(a, 0.7, out=a)
+            np.multiply(flowLengthFT, a, out=flowLengthFT)  # LS
+
+        else:
+            if tables:
+                lookupSlopeTerm(slope, sFactorTable, sFactor, b, a)
+            else:
+                np.multiply(slope, 0.01, out=a)
+                np.arctan(a, out=a)                      # radians
+                np.sin(a, out=a)
+                np.power(a, 2, out=b)
+                np.multiply(b, 65.41, out=b)
+                np.multiply(a, 4.56, out=a)
+                np.add(b, a, out=b)
+                np.add(b, 0.065, out=b)                  # S
+
+            np.take(lExponents, np.searchsorted(slopeBreaks, slope, side='right'), out=a)
+            np.divide(flowLengthFT, 72.6, out=flowLengthFT)
+            np.power(flowLengthFT, a, out=flowLengthFT)     # L
+            np.multiply(flowLengthFT, b, out=flowLengthFT)  # LS
+
+        np.multiply(flowLengthFT, k, out=flowLengthFT)
+        np.multiply(flowLengthFT, r, out=flowLengthFT)
+        t[t == 0] = np.nan                               # Divide by 0 is NoData
+        np.divide(flowLengthFT, t, out=flowLengthFT)     # EI
+
+## ===================================================================================
+def helFactor(slope, flowLengthFT, kFactor, rFactor, tFactor, helValue, useRunoffLS=False, chunkSize=chunkCells, tables=True):
+    """ Computes the HEL factor raster.  The LS and EI factors are only evaluated on PHEL
+        cells, chunkSize cells at a time (evaluateChunk); HEL cells are set to 9 and NHEL
+        cells to 1.  Cells with no Og_HELcode are NoData.  Returns a float32 array with NaN
+        as NoData. """
+
+    helValue = np.asarray(helValue)
+    out = np.full(helValue.shape, np.nan, dtype=np.float32)
+
+    out[helValue == helCode] = 9
+    out[helValue == nhelCode] = 1
+
+    phel = np.flatnonzero(helValue.ravel() == phelCode)
+    if not phel.size:
+        return out
+
+    inputs = [np.ravel(grid) for grid in (slope, flowLengthFT, kFactor, rFactor, tFactor)]
+    buffers = [np.empty(min(chunkSize, phel.size), dtype=np.float64) for i in range(7)]
+    outFlat = out.ravel()
+
+    for start in range(0, phel.size, chunkSize):
+        cells = phel[start:start + chunkSize]
+        chunk = [buffer[:cells.size] for buffer in buffers]
+        for grid, buffer in zip(inputs, chunk):
+            buffer[...] = grid[cells]
+        evaluateChunk(*(chunk + [useRunoffLS, tables]))
+        outFlat[cells] = chunk[1]
+
+    return out
+
+## ===================================================================================
+def classifyHEL(helFactorArray):
+    """ Reclassifies the HEL factor ("0 8 1;8 100000000 2") into the LiDAR HEL values.
+        Returns a uint8 array where 0 is NoData. """
+
+    f = np.asarray(helFactorArray)
+    out = np.zeros(f.shape, dtype=np.uint8)
+    with np.errstate(invalid='ignore'):
+        out[(f >= 0) & (f <= 8)] = lidarNHEL
+        out[(f > 8) & (f <= 100000000)] = lidarHEL
+    return out
+
+## ===================================================================================
+def selfTest(cells=2000000):
+    """ Checks the maximum errors of the slope term tables on flat to steep slopes and
+        compares the chunked HEL factor with lsFactor on the whole PHEL subset for both LS
+        equations, with chunks that do not divide the number of PHEL cells """
+
+    rng = np.random.RandomState(5)
+    slopes = np.concatenate([rng.uniform(0.0, tableMaxSlope, cells), np.exp(rng.uniform(math.log(1e-7), math.log(tableMaxSlope), cells))])
+    sLookup = np.empty(slopes.size); runoffLookup = np.empty(slopes.size)
+    lookupSlopeTerm(slopes, sFactorTable, sFactor, sLookup, np.empty(slopes.size))
+    lookupSlopeTerm(slopes, runoffTermTable, runoffSlopeTerm, runoffLookup, np.empty(slopes.size))
+    sError = (np.abs(sLookup - sFactor(slopes)) / sFactor(slopes)).max()
+    runoffTerm = runoffSlopeTerm(slopes)
+    runoffError = np.abs(runoffLookup - runoffTerm).max()
+    runoffRelative = (np.abs(runoffLookup - runoffTerm) / runoffTerm)[slopes >= 1].max()
+    tablesOK = sError < maxSFactorError and runoffError < maxRunoffTermError and runoffRelative < 1e-6
+    print("Slope term tables of %d knots: S relative error %.2g; runoff term absolute error %.2g, relative from 1%% slope %.2g" %
+          (sFactorTable.size, sError, runoffError, runoffRelative))
+
+    side = int(math.sqrt(cells))
+    slope = rng.gamma(1.5, 4.0, (side, side)).astype(np.float32)
+    slope[rng.uniform(size=slope.shape) < 0.01] = np.nan
+    flowLength = rng.uniform(0.0, 1500.0, slope.shape).astype(np.float32)
+    k = rng.choice([0.24, 0.32, 0.43], slope.shape).astype(np.float32)
+    r = np.full(slope.shape, 125.0, dtype=np.float32)
+    t = rng.choice([0.0, 3.0, 5.0], slope.shape, p=[0.01, 0.49, 0.5]).astype(np.float32)
+    helValue = rng.choice([0, 1, 2, 3], slope.shape, p=[0.2, 0.2, 0.55, 0.05]).astype(np.uint8)
+
+    allOK = True
+    for useRunoffLS in (False, True):
+        start = time.time()
+        phel = helValue == phelCode
+        expected = np.full(slope.shape, np.nan, dtype=np.float32)
+        expected[helValue == helCode] = 9
+        expected[helValue == nhelCode] = 1
+        tPHEL = t[phel].astype(np.float64)
+        tPHEL[tPHEL == 0] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            expected[phel] = lsFactor(slope[phel], flowLength[phel], useRunoffLS) * k[phel] * r[phel] / tPHEL
+        whole = time.time() - start
+
+        start = time.time()
+        fused = helFactor(slope, flowLength, k, r, t, helValue, useRunoffLS, tables=False)
+        chunked = time.time() - start
+        odd = helFactor(slope, flowLength, k, r, t, helValue, useRunoffLS, 1000, False)
+
+        start = time.time()
+        lookup = helFactor(slope, flowLength, k, r, t, helValue, useRunoffLS)
+        tabled = time.time() - start
+        oddLookup = helFactor(slope, flowLength, k, r, t, helValue, useRunoffLS, 1000)
+
+        same = all([bool(((a == expected) | (np.isnan(a) & np.isnan(expected))).all()) for a in (fused, odd)])
+
+        # Relative EI error from 1 percent slope; below it the runoff term error is absolute so
+        # the EI error is scaled back to the term with (flowLengthFT / 72.6) ^ 0.5 * K * R / T
+        valid = phel & np.isfinite(expected)
+        error = np.abs(lookup[valid].astype(np.float64) - expected[valid])
+        steep = slope[valid] >= 1
+        lookupError = (error / np.abs(expected[valid]))[steep].max()
+        flatError = 0.0
+        if useRunoffLS:
+            scale = np.sqrt(flowLength[valid] / 72.6) * k[valid] * r[valid] / t[valid]
+            flatError = (error / scale)[~steep & (scale > 0)].max()
+        close = (lookupError < 1e-5 and flatError < maxRunoffTermError + 1e-6 and
+                 np.array_equal(np.isnan(lookup), np.isnan(expected)) and
+                 bool(((lookup == oddLookup) | np.isnan(lookup)).all()))
+        allOK = allOK and same and close
+        print("%s LS on %d cells: whole PHEL subset %.2f s; chunks of %d cells %.2f s, identical: %s; tables %.2f s, relative error %.2g%s" %
+              ("Runoff" if useRunoffLS else "AH537", slope.size, whole, chunkCells, chunked, same, tabled, lookupError,
+               ", term error below 1%% slope %.2g" % flatError if useRunoffLS else ""))
+
+    return tablesOK and allOK
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
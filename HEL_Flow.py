@@ -0,0 +1,276 @@
+# ==========================================================================================
+# Name:   HEL Flow Engine
+#
+# NumPy implementation of the flow routing used by the NRCS HEL Determination tool:
+#
+#     FlowDirection(preslope, "FORCE") -> FlowLength(flowDirection, "UPSTREAM")
+#
+# This module does not import arcpy.  Inputs are 2D NumPy arrays with NaN as NoData.
+#
+# Flow direction (D8) follows the ArcGIS conventions:
+#  - Direction codes are 1=E, 2=SE, 4=S, 8=SW, 16=W, 32=NW, 64=N, 128=NE.  0 is used for
+#    NoData and for cells with no defined direction (sinks that are wider than one cell).
+#  - Flow goes to the neighbor with the steepest drop (drop / distance).  Ties are broken
+#    in code order.
+#  - FORCE: every cell on the edge of the grid flows outward.  A cell next to NoData with no
+#    downslope neighbor flows into the NoData.
+#  - A one-cell sink is treated as noise: it is raised to its lowest neighbor and drains
+#    with it like a flat.  One-cell sinks next to NoData are left as is.
+#  - Flat areas drain toward their outlets.  Each flat cell flows to the neighbor that is one
+#    step closer to the nearest cell on the flat's edge that can drain.
+#
+# Upstream flow length is the longest distance along the flow path from a cell up to the
+# top of its drainage.  Cells are processed in topological order (Kahn's algorithm) one
+# wavefront at a time, so the whole grid is visited once with no recursion.  Distances are
+# returned as float32 in the linear units of the DEM.
+#
+# Running this script directly checks the direction and length grids of small DEMs with known
+# answers:
+#     python HEL_Flow.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial NumPy backend for the FlowDirection (FORCE) and FlowLength (UPSTREAM) tools.
+# - Known answer self test.
+
+import sys, math
+import numpy as np
+
+# D8 codes with their row and column offsets and distance in cells
+directionCodes = (1, 2, 4, 8, 16, 32, 64, 128)
+directionOffsets = ((0,1), (1,1), (1,0), (1,-1), (0,-1), (-1,-1), (-1,0), (-1,1))
+directionDistance = (1.0, math.sqrt(2), 1.0, math.sqrt(2), 1.0, math.sqrt(2), 1.0, math.sqrt(2))
+
+## ===================================================================================
+def paddedFlatGrid(array):
+    """ Flattens an array into a grid with a 1 cell NaN ring around it.  Returns the
+        flat elevations, the flat valid mask, the padded number of columns and the
+        flat offsets of the 8 neighbors in direction code order. """
+
+    rows, cols = array.shape
+    stride = cols + 2
+
+    z = np.full((rows + 2, cols + 2), np.nan, dtype=np.float64)
+    z[1:-1,1:-1] = array
+    z = z.ravel()
+
+    offsets = np.array([dr * stride + dc for dr, dc in directionOffsets], dtype=np.int64)
+    return z, np.isfinite(z), stride, offsets
+
+## ===================================================================================
+def flowDirection(dem):
+    """ D8 flow direction with the FORCE edge option.  Returns a uint8 array of
+        direction codes; 0 is NoData or an undefined direction. """
+
+    dem = np.asarray(dem, dtype=np.float64)
+    rows, cols = dem.shape
+    z, valid, stride, offsets = paddedFlatGrid(dem)
+
+    cells = np.flatnonzero(valid)
+    zc = z[cells]
+
+    # Neighbor elevations (NaN for off-grid and NoData)
+    nbZ = np.empty((8, cells.size), dtype=np.float64)
+    for k in range(8):
+        nbZ[k] = z[cells + offsets[k]]
+    nbValid = np.isfinite(nbZ)
+
+    # Edge of the grid and NoData neighbors
+    rowIdx = cells // stride - 1
+    colIdx = cells % stride - 1
+    onEdge = (rowIdx == 0) | (rowIdx == rows - 1) | (colIdx == 0) | (colIdx == cols - 1)
+    nextToNoData = ~nbValid.all(axis=0)
+
+    # One-cell sinks that are not on the edge are raised to their lowest neighbor
+    with np.errstate(invalid='ignore'):
+        lowest = np.nanmin(np.where(nbValid, nbZ, np.inf), axis=0)
+    oneCellSink = (~nextToNoData) & (lowest > zc)
+    zc = np.where(oneCellSink, lowest, zc)
+    z[cells] = zc
+    for k in range(8):
+        nbZ[k] = z[cells + offsets[k]]
+
+    # Steepest drop
+    with np.errstate(invalid='ignore'):
+        drop = (zc[np.newaxis,:] - nbZ) / np.array(directionDistance)[:,np.newaxis]
+    drop[~nbValid] = -np.inf
+    steepest = np.argmax(drop, axis=0)
+    maxDrop = drop[steepest, np.arange(cells.size)]
+
+    codes = np.array(directionCodes, dtype=np.uint8)
+    direction = np.zeros(z.size, dtype=np.uint8)
+    direction[cells[maxDrop > 0]] = codes[steepest[maxDrop > 0]]
+
+    # Cells next to NoData with nowhere to go flow into the NoData.  Raised one-cell
+    # sinks are now part of a flat and are resolved with it.
+    noDescent = maxDrop <= 0
+    intoNoData = noDescent & nextToNoData & ~onEdge
+    if intoNoData.any():
+        direction[cells[intoNoData]] = codes[np.argmax(~nbValid[:,intoNoData], axis=0)]
+
+    # FORCE: edge cells flow outward
+    if onEdge.any():
+        edgeCodes = np.zeros(cells.size, dtype=np.uint8)
+        top = rowIdx == 0; bottom = rowIdx == rows - 1
+        left = colIdx == 0; right = colIdx == cols - 1
+        edgeCodes[right] = 1; edgeCodes[left] = 16
+        edgeCodes[bottom] = 4; edgeCodes[top] = 64
+        edgeCodes[bottom & right] = 2; edgeCodes[bottom & left] = 8
+        edgeCodes[top & left] = 32; edgeCodes[top & right] = 128
+        direction[cells[onEdge]] = edgeCodes[onEdge]
+
+    # Resolve flats: spread outward from the cells that already drain
+    flat = np.zeros(z.size, dtype=bool)
+    flat[cells[noDescent & ~onEdge & ~intoNoData]] = True
+    if flat.any():
+        frontier = np.flatnonzero(direction)
+        while frontier.size and flat.any():
+            newCells = list()
+            for k in range(8):
+                nb = frontier - offsets[k]       # neighbor that would flow in direction k
+                take = flat[nb] & (z[nb] == z[frontier])
+                nb = nb[take]
+                direction[nb] = directionCodes[k]
+                flat[nb] = False
+                newCells.append(nb)
+            frontier = np.concatenate(newCells)
+
+    return direction.reshape(rows + 2, cols + 2)[1:-1,1:-1].copy()
+
+## ===================================================================================
+def flowLength(direction, cellSize, valid=None):
+    """ Upstream flow length (FlowLength "UPSTREAM") from a D8 direction array.
+        valid is the data mask of the DEM; cells outside of it are returned as NaN.
+        Returns float32 distances in the linear units of cellSize. """
+
+    direction = np.asarray(direction, dtype=np.uint8)
+    rows, cols = direction.shape
+    stride = cols + 2
+    if valid is None:
+        valid = direction > 0
+
+    dirPad = np.zeros((rows + 2, cols + 2), dtype=np.uint8)
+    dirPad[1:-1,1:-1] = np.where(valid, direction, 0)
+    dirPad = dirPad.ravel()
+    validPad = np.zeros((rows + 2, cols + 2), dtype=bool)
+    validPad[1:-1,1:-1] = valid
+    validPad = validPad.ravel()
+
+    # Receiver of every cell and length of the step to it
+    offsetLookup = np.zeros(256, dtype=np.int64)
+    stepLookup = np.zeros(256, dtype=np.float64)
+    for code, (dr, dc), dist in zip(directionCodes, directionOffsets, directionDistance):
+        offsetLookup[code] = dr * stride + dc
+        stepLookup[code] = dist * cellSize
+
+    cells = np.flatnonzero(validPad)
+    receiver = np.full(dirPad.size, -1, dtype=np.int64)
+    hasStep = offsetLookup[dirPad[cells]] != 0
+    target = cells[hasStep] + offsetLookup[dirPad[cells[hasStep]]]
+    target[~validPad[target]] = -1
+    receiver[cells[hasStep]] = target
+    step = stepLookup[dirPad].astype(np.float64)
+
+    # Number of donors of every cell
+    flows = receiver >= 0
+    inDegree = np.bincount(receiver[flows], minlength=dirPad.size).astype(np.int32)
+
+    length = np.zeros(dirPad.size, dtype=np.float64)
+    frontier = cells[inDegree[cells] == 0]
+
+    while frontier.size:
+        donors = frontier[receiver[frontier] >= 0]
+        if not donors.size:
+            break
+        targets = receiver[donors]
+        np.maximum.at(length, targets, length[donors] + step[donors])
+
+        targets, counts = np.unique(targets, return_counts=True)
+        inDegree[targets] -= counts
+        frontier = targets[inDegree[targets] == 0]
+
+    out = length.reshape(rows + 2, cols + 2)[1:-1,1:-1].astype(np.float32)
+    out[~valid] = np.nan
+    return out
+
+## ===================================================================================
+def upstreamFlowLength(dem, cellSize):
+    """ Runs FlowDirection (FORCE) and FlowLength (UPSTREAM) on a DEM array.
+        Returns the uint8 direction array and the float32 flow length array. """
+
+    dem = np.asarray(dem)
+    direction = flowDirection(dem)
+    return direction, flowLength(direction, cellSize, np.isfinite(dem))
+
+## ===================================================================================
+def selfTest():
+    """ Checks flowDirection and flowLength against hand worked answers: FORCE edges and
+        upstream length on a plane, a flat drained to its outlet, a one-cell sink, a pit
+        wider than one cell and cells next to NoData """
+
+    results = list()
+    def check(name, actual, expected):
+        ok = np.array_equal(actual, np.array(expected))
+        results.append(ok)
+        print("%-32s %s" % (name, 'OK' if ok else 'MISMATCH\n' + str(actual)))
+
+    # Plane sloping east: interior cells flow east, edge cells flow off the grid (FORCE)
+    plane = 10.0 - np.tile(np.arange(6, dtype=np.float64), (5, 1))
+    direction, length = upstreamFlowLength(plane, 3.0)
+    check("FORCE edges on a plane", direction,
+          [[32, 64, 64, 64, 64, 128],
+           [16,  1,  1,  1,  1,   1],
+           [16,  1,  1,  1,  1,   1],
+           [16,  1,  1,  1,  1,   1],
+           [ 8,  4,  4,  4,  4,   2]])
+
+    # The edge cells drain off the grid, so a row starts at column 1
+    check("Upstream length on a plane", length,
+          [[0, 0, 0, 0, 0,  0],
+           [0, 0, 3, 6, 9, 12],
+           [0, 0, 3, 6, 9, 12],
+           [0, 0, 3, 6, 9, 12],
+           [0, 0, 0, 0, 0,  0]])
+
+    # Valley with a flat floor that drains through one outlet on the east edge
+    valley = np.full((5, 5), 10.0)
+    valley[1:4, 1:4] = 5.0
+    valley[2, 4] = 4.0
+    check("Flat drained to its outlet", flowDirection(valley)[1:4, 1:4],
+          [[1, 1,   2],
+           [1, 1,   1],
+           [1, 1, 128]])
+
+    # A one-cell sink is raised to its lowest neighbor (7), drains east with the cells at 7
+    # and still collects its upslope corner neighbors, for which it is the steepest drop
+    sink = plane.copy()
+    sink[2, 2] = 0.0
+    check("One-cell sink", flowDirection(sink)[1:4, 1:4],
+          [[2, 1, 1],
+           [1, 1, 1],
+           [128, 1, 1]])
+
+    # A pit two cells wide has no outlet and keeps code 0; its rim drains into it
+    pit = np.full((5, 6), 10.0)
+    pit[2, 2:4] = 5.0
+    check("Pit wider than one cell", flowDirection(pit)[1:4, 1:5],
+          [[2, 4, 4,  8],
+           [1, 0, 0, 16],
+           [128, 64, 64, 32]])
+
+    # Flat cells next to NoData flow into the NoData
+    hole = np.full((5, 5), 10.0)
+    hole[2, 2] = np.nan
+    direction, length = upstreamFlowLength(hole, 3.0)
+    check("Cells next to NoData", direction[1:4, 1:4],
+          [[2, 4, 8],
+           [1, 0, 16],
+           [128, 64, 32]])
+    check("NoData flow length", np.isnan(length), np.isnan(hole))
+
+    return all(results)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
@@ -0,0 +1,286 @@
+# ==========================================================================================
+# Name:   HEL LAS
+#
+# LAS point cloud to 3 meter DEM gridding for the NRCS HEL Determination tool.  Field offices
+# that get classified LiDAR before any DEM product exists can use a folder of LAS files as
+# the DEM (see extractDEMfromLAS in NRCS_HEL_Determination.py):
+#
+#  - Only the files whose header bounds overlap the 410 meter CLU buffer are opened.
+#  - Points are streamed in chunks of chunkPoints records so memory stays bounded on dense
+#    clouds; only X, Y, Z and the classification of every record are decoded.
+#  - Ground returns (class 2) that are not withheld are binned to the 3 meter cells of a grid
+#    anchored at 0, 0 with np.bincount; a cell is the mean elevation of its returns.
+#  - Small gaps (runs of at most maxGap empty cells between ground cells along a row or a
+#    column) are filled by linear interpolation between the cells on either side.  Larger
+#    voids (water, buildings) stay NoData.
+#
+# LAS 1.0 to 1.4 files with point data formats 0 to 10 are read.  Compressed LAZ files are
+# not.  The points must be in the coordinate system of the CLU layer.  This module does not
+# import arcpy.
+#
+# Running this script directly grids synthetic LAS 1.2 and 1.4 files and checks the cells:
+#     python HEL_LAS.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial chunked LAS ground return gridding with small gap fill.
+
+import os, sys, struct, tempfile, shutil
+import numpy as np
+import HEL_Resample
+
+lasExtensions = ('.las',)
+groundClasses = (2,)
+
+## ===================================================================================
+def findLAS(folder):
+    """ Returns the paths of the LAS files in a folder """
+
+    if not os.path.isdir(folder):
+        return list()
+    return sorted([os.path.join(folder, name) for name in os.listdir(folder) if os.path.splitext(name)[1].lower() in lasExtensions])
+
+## ===================================================================================
+def readHeader(path):
+    """ Reads the public header block of a LAS file.  Returns a dict or None if the
+        file is not an uncompressed LAS file. """
+
+    with open(path, 'rb') as f:
+        raw = f.read(375)
+    if len(raw) < 227 or raw[:4] != b'LASF':
+        return None
+
+    versionMinor = struct.unpack('<B', raw[25:26])[0]
+    pointOffset = struct.unpack('<I', raw[96:100])[0]
+    pointFormat = struct.unpack('<B', raw[104:105])[0]
+    recordLength = struct.unpack('<H', raw[105:107])[0]
+    pointCount = struct.unpack('<I', raw[107:111])[0]
+    scale = struct.unpack('<3d', raw[131:155])
+    offset = struct.unpack('<3d', raw[155:179])
+    maxX, minX, maxY, minY, maxZ, minZ = struct.unpack('<6d', raw[179:227])
+
+    # Compressed (LAZ) point formats have the high bits set
+    if pointFormat > 10:
+        return None
+
+    # LAS 1.4 keeps the point count in a 64 bit field
+    if versionMinor >= 4 and len(raw) >= 255 and pointCount == 0:
+        pointCount = struct.unpack('<Q', raw[247:255])[0]
+
+    return {'path': path, 'version': (1, versionMinor), 'pointOffset': pointOffset, 'pointFormat': pointFormat,
+            'recordLength': recordLength, 'pointCount': pointCount, 'scale': scale, 'offset': offset,
+            'extent': (minX, minY, maxX, maxY), 'zRange': (minZ, maxZ)}
+
+## ===================================================================================
+def recordType(header):
+    """ Returns the NumPy dtype of the point records that decodes X, Y, Z and the
+        classification fields """
+
+    if header['pointFormat'] >= 6:
+        names = ['X', 'Y', 'Z', 'flags', 'classification']; offsets = [0, 4, 8, 15, 16]
+    else:
+        names = ['X', 'Y', 'Z', 'classification']; offsets = [0, 4, 8, 15]
+    formats = ['<i4', '<i4', '<i4'] + ['u1'] * (len(names) - 3)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': header['recordLength']})
+
+## ===================================================================================
+def readGround(header, extent, classes=groundClasses, chunkPoints=1000000):
+    """ Yields the x, y and z arrays of the returns of a LAS file in classes (not
+        withheld) inside an (xMin, yMin, xMax, yMax) extent, chunkPoints records at a
+        time """
+
+    dtype = recordType(header)
+    (sx, sy, sz), (ox, oy, oz) = header['scale'], header['offset']
+    xMin, yMin, xMax, yMax = extent
+    bLegacy = header['pointFormat'] < 6
+    wanted = np.zeros(256, dtype=bool)
+    wanted[list(classes)] = True
+
+    with open(header['path'], 'rb') as f:
+        f.seek(header['pointOffset'])
+        remaining = header['pointCount']
+        while remaining > 0:
+            records = np.fromfile(f, dtype=dtype, count=min(chunkPoints, remaining))
+            if not records.size:
+                break
+            remaining -= records.size
+
+            # Legacy formats: class in bits 0-4, withheld in bit 7.  Formats 6-10: withheld is flag bit 2
+            if bLegacy:
+                cls = records['classification'] & 31
+                keep = (records['classification'] & 128) == 0
+            else:
+                cls = records['classification']
+                keep = (records['flags'] & 4) == 0
+            keep &= wanted[cls]
+
+            x = records['X'][keep] * sx + ox
+            y = records['Y'][keep] * sy + oy
+            z = records['Z'][keep] * sz + oz
+            del records
+
+            inside = (x >= xMin) & (x < xMax) & (y >= yMin) & (y < yMax)
+            yield x[inside], y[inside], z[inside]
+
+## ===================================================================================
+def fillGaps(grid, maxGap):
+    """ Fills runs of at most maxGap NaN cells that have data on both sides along rows
+        or columns by linear interpolation.  Cells filled along both axes get the mean of
+        the two interpolations.  Returns the filled grid. """
+
+    def axisFill(values):
+        rows, cols = values.shape
+        valid = np.isfinite(values)
+        index = np.arange(cols)[None, :]
+
+        # Column of the previous and next valid cell of every cell in its row
+        previous = np.maximum.accumulate(np.where(valid, index, -1), axis=1)
+        following = np.minimum.accumulate(np.where(valid, index, cols)[:, ::-1], axis=1)[:, ::-1]
+
+        gap = following - previous - 1
+        fill = ~valid & (previous >= 0) & (following < cols) & (gap <= maxGap)
+        r, c = np.nonzero(fill)
+        p = previous[r, c]; n = following[r, c]
+        result = np.full(values.shape, np.nan, dtype=np.float64)
+        result[r, c] = values[r, p] + (values[r, n] - values[r, p]) * (c - p) / (n - p).astype(np.float64)
+        return result
+
+    byRow = axisFill(grid)
+    byCol = axisFill(grid.T).T
+    total = np.where(np.isfinite(byRow), byRow, 0.0) + np.where(np.isfinite(byCol), byCol, 0.0)
+    count = np.isfinite(byRow).astype(np.int8) + np.isfinite(byCol)
+
+    filled = grid.copy()
+    gaps = count > 0
+    filled[gaps] = (total[gaps] / count[gaps]).astype(grid.dtype)
+    return filled
+
+## ===================================================================================
+def gridGround(paths, extent, cellSize=3.0, origin=(0.0, 0.0), classes=groundClasses, chunkPoints=1000000, maxGap=3, progress=None):
+    """ Grids the ground returns of LAS files into the cellSize grid anchored at origin
+        that covers an (xMin, yMin, xMax, yMax) extent.  progress(n, total, path) is
+        called for every file read.
+
+        Returns the float32 grid (north up, NaN as NoData), its lower left (x, y) and a
+        dict with the number of files read, points binned and cells filled. """
+
+    (xMin, yMin, xMax, yMax), rows, cols = HEL_Resample.alignedExtent(extent, cellSize, origin)
+    total = np.zeros(rows * cols, dtype=np.float64)
+    count = np.zeros(rows * cols, dtype=np.int32)
+    stats = {'files': 0, 'points': 0, 'filled': 0}
+
+    headers = [header for header in [readHeader(path) for path in paths] if header is not None]
+    headers = [h for h in headers if h['extent'][0] <= xMax and h['extent'][2] >= xMin and h['extent'][1] <= yMax and h['extent'][3] >= yMin]
+
+    for n, header in enumerate(headers):
+        if progress:
+            progress(n + 1, len(headers), header['path'])
+        stats['files'] += 1
+
+        for x, y, z in readGround(header, (xMin, yMin, xMax, yMax), classes, chunkPoints):
+            col = np.floor((x - xMin) / cellSize).astype(np.int64)
+            row = np.floor((yMax - y) / cellSize).astype(np.int64)
+            valid = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+            cells = row[valid] * cols + col[valid]
+            total += np.bincount(cells, weights=z[valid], minlength=rows * cols)
+            count += np.bincount(cells, minlength=rows * cols).astype(np.int32)
+            stats['points'] += int(cells.size)
+
+    grid = np.full(rows * cols, np.nan, dtype=np.float32)
+    binned = count > 0
+    grid[binned] = (total[binned] / count[binned]).astype(np.float32)
+    grid = grid.reshape(rows, cols)
+    del total, count
+
+    if maxGap > 0 and binned.any():
+        empty = int((~binned).sum())
+        grid = fillGaps(grid, maxGap)
+        stats['filled'] = empty - int(np.isnan(grid).sum())
+
+    return grid, (xMin, yMin), stats
+
+## ===================================================================================
+def writeLAS(path, x, y, z, classes, pointFormat=1, versionMinor=2, scale=0.01, withheld=None):
+    """ Writes an uncompressed LAS file of the points for the self test """
+
+    recordLength = {0: 20, 1: 28, 6: 30}[pointFormat]
+    headerSize = 375 if versionMinor >= 4 else 227
+    offset = (float(np.floor(x.min())), float(np.floor(y.min())), 0.0)
+
+    records = np.zeros(x.size, dtype=recordType({'pointFormat': pointFormat, 'recordLength': recordLength}))
+    records['X'] = np.round((x - offset[0]) / scale); records['Y'] = np.round((y - offset[1]) / scale); records['Z'] = np.round(z / scale)
+    if pointFormat >= 6:
+        records['classification'] = classes
+        if withheld is not None:
+            records['flags'] = np.where(withheld, 4, 0)
+    else:
+        records['classification'] = classes | np.where(withheld, 128, 0) if withheld is not None else classes
+
+    header = bytearray(headerSize)
+    header[0:4] = b'LASF'
+    header[24:26] = struct.pack('<BB', 1, versionMinor)
+    header[94:96] = struct.pack('<H', headerSize)
+    header[96:100] = struct.pack('<I', headerSize)
+    header[104:107] = struct.pack('<BH', pointFormat, recordLength)
+    header[107:111] = struct.pack('<I', 0 if versionMinor >= 4 else x.size)
+    header[131:179] = struct.pack('<6d', scale, scale, scale, offset[0], offset[1], offset[2])
+    header[179:227] = struct.pack('<6d', x.max(), x.min(), y.max(), y.min(), z.max(), z.min())
+    if versionMinor >= 4:
+        header[247:255] = struct.pack('<Q', x.size)
+
+    with open(path, 'wb') as f:
+        f.write(bytes(header))
+        records.tofile(f)
+
+## ===================================================================================
+def selfTest():
+    """ Grids two synthetic clouds (LAS 1.2 format 1 and LAS 1.4 format 6) of a plane
+        with vegetation returns, withheld returns and a small and a large void """
+
+    folder = tempfile.mkdtemp(prefix='HEL_LAS_')
+    try:
+        rng = np.random.RandomState(7)
+        plane = lambda px, py: 250.0 + 0.01 * (px - 500000.0) - 0.02 * (py - 4400000.0)
+
+        def cloud(xMin, n):
+            px = rng.uniform(xMin, xMin + 300.0, n); py = rng.uniform(4400000.0, 4400300.0, n)
+            pz = np.round(plane(px, py), 2)
+            cls = np.where(rng.uniform(size=n) < 0.3, 5, 2).astype(np.uint8)      # 30% vegetation
+            pz = np.where(cls == 5, pz + 12.0, pz)
+            withheld = rng.uniform(size=n) < 0.01
+            pz = np.where(withheld, pz - 50.0, pz)                                 # withheld noise
+            # 6 m wide and 60 m wide voids
+            void = ((px > 500090.0) & (px < 500096.0)) | ((px > 500400.0) & (px < 500460.0))
+            return px[~void], py[~void], pz[~void], cls[~void], withheld[~void]
+
+        x, y, z, cls, withheld = cloud(500000.0, 200000)
+        writeLAS(os.path.join(folder, 'west.las'), x, y, z, cls, 1, 2, withheld=withheld)
+        x, y, z, cls, withheld = cloud(500300.0, 200000)
+        writeLAS(os.path.join(folder, 'east.las'), x, y, z, cls, 6, 4, withheld=withheld)
+        with open(os.path.join(folder, 'far.las'), 'wb') as f:
+            f.write(b'LASF')                                                     # not a LAS file
+
+        extent = (500010.0, 4400010.0, 500590.0, 4400290.0)
+        grid, lowerLeft, stats = gridGround(findLAS(folder), extent, 3.0, chunkPoints=50000, maxGap=3)
+
+        # Cell centers of the plane; the mean of the returns in a cell is close to the center value
+        rows, cols = grid.shape
+        cx = lowerLeft[0] + (np.arange(cols) + 0.5) * 3.0
+        cy = lowerLeft[1] + rows * 3.0 - (np.arange(rows) + 0.5) * 3.0
+        expected = plane(cx[None, :], cy[:, None])
+        maxDiff = np.nanmax(np.abs(grid - expected))
+
+        smallVoid = grid[:, (cx > 500090.0) & (cx < 500096.0)]
+        largeVoid = grid[:, (cx > 500403.0) & (cx < 500457.0)]
+        print("Grid %d x %d at %s: %s" % (rows, cols, str(lowerLeft), str(stats)))
+        print("Max difference from the ground plane %.3f; small void filled: %s; large void NoData: %s"
+              % (maxDiff, np.isfinite(smallVoid).all(), np.isnan(largeVoid).all()))
+        return maxDiff < 0.1 and np.isfinite(smallVoid).all() and np.isnan(largeVoid).all() and stats['files'] == 2
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
@@ -0,0 +1,201 @@
+# ==========================================================================================
+# Name:   HEL Virtual Mosaic
+#
+# Virtual mosaic of local DEM tiles for the Merge Local DEMs by CLU and NRCS HEL Determination
+# tools.  Instead of clipping every tile into scratch.gdb with ExtractByMask and materializing
+# the clips with MosaicToNewRaster, Merge Local DEMs writes a small descriptor of the source
+# tiles and the mosaic rule.  The HEL Determination tool reads the descriptor lazily: only
+# the window it needs is read from the tiles that overlap it, and overlaps are resolved with
+# the mosaic rule (MEAN like MosaicToNewRaster) at read time.
+#
+# This module does not import arcpy:
+#  - The descriptor is a JSON file (*.vmosaic.json) with the spatial reference (WKT), linear
+#    units, cell size, mosaic rule and the path and extent of every tile.  All tiles share
+#    the spatial reference and cell size of the descriptor.
+#  - The window grid is anchored at the upper left corner of the first tile; tiles on the
+#    same cell grid are placed exactly.
+#  - Tiles are read through a reader function (HEL_DEM_Reader.py by default; see
+#    extractDEMfromMosaic in NRCS_HEL_Determination.py for the arcpy reader).
+#
+# Running this script directly mosaics overlapping synthetic GeoTIFF tiles and checks the
+# MEAN of the overlaps:
+#     python HEL_Mosaic.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial virtual mosaic descriptor and windowed MEAN reader.
+
+import os, sys, json, math, tempfile, shutil
+import numpy as np
+import HEL_DEM_Reader
+
+descriptorExtension = '.vmosaic.json'
+mosaicRules = ('MEAN', 'FIRST', 'LAST', 'MINIMUM', 'MAXIMUM')
+
+## ===================================================================================
+def writeDescriptor(path, tiles, spatialReference, linearUnits, cellSize, rule='MEAN'):
+    """ Writes a virtual mosaic descriptor.  tiles is a list of (path, (xMin, yMin, xMax,
+        yMax)) in mosaic order.  Returns the descriptor path. """
+
+    if rule not in mosaicRules:
+        raise ValueError("Unknown mosaic rule: " + str(rule))
+    if not path.lower().endswith(descriptorExtension):
+        path = os.path.splitext(path)[0] + descriptorExtension
+
+    descriptor = {'spatialReference': spatialReference, 'linearUnits': linearUnits,
+                  'cellSize': cellSize, 'rule': rule,
+                  'tiles': [{'path': os.path.abspath(tilePath), 'extent': list(extent)} for tilePath, extent in tiles]}
+
+    with open(path, 'w') as f:
+        json.dump(descriptor, f, indent=1)
+    return path
+
+## ===================================================================================
+def readDescriptor(path):
+    """ Reads a virtual mosaic descriptor """
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+## ===================================================================================
+def mosaicExtent(descriptor):
+    """ Returns the (xMin, yMin, xMax, yMax) extent of all tiles """
+
+    extents = np.array([tile['extent'] for tile in descriptor['tiles']], dtype=np.float64)
+    return (extents[:,0].min(), extents[:,1].min(), extents[:,2].max(), extents[:,3].max())
+
+## ===================================================================================
+def geoTiffReader(path, extent):
+    """ Default tile reader: returns (array, lowerLeft, cellSize, noData) or None """
+
+    window = HEL_DEM_Reader.readWindow(path, extent)
+    if window is None:
+        return None
+    array, lowerLeft, cellSize, noData, mode = window
+    return array, lowerLeft, cellSize[0], noData
+
+## ===================================================================================
+def readWindow(descriptor, extent, reader=geoTiffReader):
+    """ Reads the cells of the mosaic that overlap an (xMin, yMin, xMax, yMax) extent.
+        Only the tiles that intersect the extent are read; overlapping cells are resolved
+        with the mosaic rule.  reader(path, extent) returns (array, lowerLeft, cellSize,
+        noData) of a tile window or None.
+
+        Returns the float32 window (north up, NaN as NoData), its lower left (x, y) and
+        the number of tiles read.  Raises IOError when a tile cannot be read. """
+
+    cellSize = descriptor['cellSize']
+    rule = descriptor.get('rule', 'MEAN')
+    first = descriptor['tiles'][0]['extent']
+    origin = (first[0], first[3])
+
+    # Snap the window to the mosaic grid
+    xMin, yMin, xMax, yMax = extent
+    c0 = int(math.floor((xMin - origin[0]) / cellSize)); c1 = int(math.ceil((xMax - origin[0]) / cellSize))
+    r0 = int(math.floor((origin[1] - yMax) / cellSize)); r1 = int(math.ceil((origin[1] - yMin) / cellSize))
+    rows = r1 - r0; cols = c1 - c0
+    wxMin = origin[0] + c0 * cellSize; wyMax = origin[1] - r0 * cellSize
+
+    if rule == 'MEAN':
+        total = np.zeros((rows, cols), dtype=np.float64)
+        count = np.zeros((rows, cols), dtype=np.int32)
+    else:
+        out = np.full((rows, cols), np.nan, dtype=np.float32)
+
+    tilesRead = 0
+    for tile in descriptor['tiles']:
+        txMin, tyMin, txMax, tyMax = tile['extent']
+        overlap = (max(txMin, wxMin), max(tyMin, wyMax - rows * cellSize), min(txMax, wxMin + cols * cellSize), min(tyMax, wyMax))
+        if overlap[0] >= overlap[2] or overlap[1] >= overlap[3]:
+            continue
+
+        window = reader(tile['path'], overlap)
+        if window is None:
+            raise IOError("Could not read " + tile['path'])
+        array, lowerLeft, tileCell, noData = window
+        tilesRead += 1
+
+        values = np.asarray(array, dtype=np.float32)
+        valid = np.isfinite(values)
+        if noData is not None:
+            valid &= values != np.float32(noData)
+
+        # Place the tile window on the mosaic grid
+        colOff = int(round((lowerLeft[0] - wxMin) / cellSize))
+        rowOff = int(round((wyMax - (lowerLeft[1] + values.shape[0] * cellSize)) / cellSize))
+        wr0 = max(rowOff, 0); wr1 = min(rowOff + values.shape[0], rows)
+        wc0 = max(colOff, 0); wc1 = min(colOff + values.shape[1], cols)
+        if wr1 <= wr0 or wc1 <= wc0:
+            continue
+
+        v = values[wr0 - rowOff:wr1 - rowOff, wc0 - colOff:wc1 - colOff]
+        m = valid[wr0 - rowOff:wr1 - rowOff, wc0 - colOff:wc1 - colOff]
+
+        if rule == 'MEAN':
+            total[wr0:wr1, wc0:wc1] += np.where(m, v, 0.0)
+            count[wr0:wr1, wc0:wc1] += m
+        else:
+            target = out[wr0:wr1, wc0:wc1]
+            empty = np.isnan(target)
+            if rule == 'FIRST':
+                take = m & empty
+            elif rule == 'LAST':
+                take = m
+            elif rule == 'MINIMUM':
+                take = m & (empty | (v < target))
+            else:
+                take = m & (empty | (v > target))
+            target[take] = v[take]
+
+    if rule == 'MEAN':
+        out = np.full((rows, cols), np.nan, dtype=np.float32)
+        filled = count > 0
+        out[filled] = (total[filled] / count[filled]).astype(np.float32)
+
+    return out, (wxMin, wyMax - rows * cellSize), tilesRead
+
+## ===================================================================================
+def selfTest():
+    """ Mosaics four overlapping GeoTIFF tiles and checks the overlaps against MEAN """
+
+    folder = tempfile.mkdtemp(prefix='HEL_Mosaic_')
+    try:
+        cellSize = 1.0
+        size = 120; step = 100                      # tiles overlap by 20 cells
+        y, x = np.mgrid[0:220, 0:220]
+        truth = (300.0 + 0.1 * x - 0.05 * y).astype(np.float32)
+
+        tiles = list()
+        for i in range(2):
+            for j in range(2):
+                block = truth[i * step:i * step + size, j * step:j * step + size] + (i * 2 + j)   # offset per tile
+                xMin = 500000.0 + j * step; yMax = 4400000.0 - i * step
+                path = os.path.join(folder, "tile_%d_%d.tif" % (i, j))
+                HEL_DEM_Reader.writeTiff(path, block, (xMin, yMax), cellSize, noData=-9999.0)
+                tiles.append((path, (xMin, yMax - size, xMin + size, yMax)))
+
+        descriptorPath = writeDescriptor(os.path.join(folder, 'merged_dem'), tiles, 'stand-in', 'Meter', cellSize)
+        descriptor = readDescriptor(descriptorPath)
+
+        window, lowerLeft, tilesRead = readWindow(descriptor, (500090.0, 4399890.0, 500130.0, 4399930.0))
+
+        # Expected MEAN of the per tile offsets: rows/cols 100-119 are shared
+        offsets = np.zeros((220, 220)); counts = np.zeros((220, 220))
+        for i in range(2):
+            for j in range(2):
+                offsets[i * step:i * step + size, j * step:j * step + size] += i * 2 + j
+                counts[i * step:i * step + size, j * step:j * step + size] += 1
+        expected = (truth + offsets / counts)[70:110, 90:130]
+
+        maxDiff = np.abs(window - expected).max()
+        print("Descriptor: %s (%d bytes)" % (os.path.basename(descriptorPath), os.path.getsize(descriptorPath)))
+        print("Window %d x %d at %s from %d tiles; max difference from MEAN %g" % (window.shape[0], window.shape[1], str(lowerLeft), tilesRead, maxDiff))
+        return tilesRead == 4 and maxDiff < 1e-4 and lowerLeft == (500090.0, 4399890.0)
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
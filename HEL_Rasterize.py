@@ -0,0 +1,163 @@
+# ==========================================================================================
+# Name:   HEL Zone Rasterizer
+#
+# Single pass polygon rasterizer used by the NRCS HEL Determination tool.  The polygons of
+# the Final HEL Summary layer are burned once into a zone grid of polygon IDs that lines up
+# with the DEM grid.  The K, T, R and Og_HELcode bands are then derived from the zone grid by
+# array lookup against a per-polygon attribute table instead of running FeatureToRaster
+# once per attribute.
+#
+# This module does not import arcpy.  Polygons are handed in as lists of rings where each
+# ring is a list of (x, y) vertices in the coordinate system of the grid (see
+# rasterizeZones in NRCS_HEL_Determination.py).
+#
+# The following FeatureToRaster conventions are honored:
+#  - A cell belongs to a polygon when the center of the cell falls inside the polygon.
+#  - Rings are combined with the even-odd rule so interior rings (holes) are left out.
+#  - When polygons overlap, the polygon burned last wins.
+#
+# The same zone grid is used to tabulate the HEL and NHEL area of every polygon from the
+# classified LiDAR HEL array.
+#
+# Grid rows run from north to south the same as arcpy.RasterToNumPyArray.
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial scanline rasterizer for polygon zone IDs and attribute lookup bands.
+# - Added tabulateArea, a bincount replacement for TabulateArea on the zone grid.
+
+import numpy as np
+
+## ===================================================================================
+def ringEdges(rings):
+    """ Returns the x0, y0, x1, y1 arrays of every edge of a list of rings.  Rings are
+        closed if the last vertex does not repeat the first one. """
+
+    edges = list()
+    for ring in rings:
+        pts = np.asarray(ring, dtype=np.float64)
+        if pts.shape[0] < 3:
+            continue
+        if pts[0,0] != pts[-1,0] or pts[0,1] != pts[-1,1]:
+            pts = np.vstack((pts, pts[:1]))
+        edges.append(np.hstack((pts[:-1], pts[1:])))
+
+    if not edges:
+        return None
+    edges = np.vstack(edges)
+    return edges[:,0], edges[:,1], edges[:,2], edges[:,3]
+
+## ===================================================================================
+def polygonSpans(rings, xMin, yMax, cellSize, rows, cols):
+    """ Scanline fill of one polygon against the cell centers of the grid.  Returns the
+        row, start column and end column (exclusive) of every span inside the polygon. """
+
+    edges = ringEdges(rings)
+    if edges is None:
+        return None
+    x0, y0, x1, y1 = edges
+
+    # Horizontal edges never cross a scanline
+    keep = y0 != y1
+    x0 = x0[keep]; y0 = y0[keep]; x1 = x1[keep]; y1 = y1[keep]
+
+    yLow = np.minimum(y0, y1)
+    yHigh = np.maximum(y0, y1)
+
+    # Rows whose center y falls in [yLow, yHigh) of each edge.  Row r has its center
+    # at yMax - (r + 0.5) * cellSize.
+    rFirst = np.ceil((yMax - yHigh) / cellSize - 0.5).astype(np.int64)
+    rLast = np.ceil((yMax - yLow) / cellSize - 0.5).astype(np.int64) - 1
+    rFirst = np.maximum(rFirst, 0)
+    rLast = np.minimum(rLast, rows - 1)
+
+    counts = np.maximum(rLast - rFirst + 1, 0)
+    if not counts.sum():
+        return None
+
+    edgeIdx = np.repeat(np.arange(counts.size), counts)
+    rowIdx = rFirst[edgeIdx] + (np.arange(edgeIdx.size) - np.repeat(np.cumsum(counts) - counts, counts))
+    yc = yMax - (rowIdx + 0.5) * cellSize
+
+    # Scanline crossings
+    t = (yc - y0[edgeIdx]) / (y1[edgeIdx] - y0[edgeIdx])
+    xc = x0[edgeIdx] + t * (x1[edgeIdx] - x0[edgeIdx])
+
+    order = np.lexsort((xc, rowIdx))
+    rowIdx = rowIdx[order]; xc = xc[order]
+
+    # Even-odd rule: crossings pair up within every row
+    rowIdx = rowIdx[0::2]; xStart = xc[0::2]; xEnd = xc[1::2]
+
+    cStart = np.ceil((xStart - xMin) / cellSize - 0.5).astype(np.int64)
+    cEnd = np.ceil((xEnd - xMin) / cellSize - 0.5).astype(np.int64)
+    cStart = np.clip(cStart, 0, cols); cEnd = np.clip(cEnd, 0, cols)
+
+    inside = cEnd > cStart
+    return rowIdx[inside], cStart[inside], cEnd[inside]
+
+## ===================================================================================
+def burnZones(polygons, lowerLeft, cellSize, rows, cols, noData=0):
+    """ Burns a list of (zoneID, rings) polygons into a grid that starts at the lowerLeft
+        (x, y) corner.  Zone IDs must be positive integers.  Returns an int32 array with
+        noData where no polygon covers the cell center. """
+
+    xMin, yMin = lowerLeft
+    yMax = yMin + rows * cellSize
+
+    zones = np.full((rows, cols), noData, dtype=np.int32)
+    for zoneID, rings in polygons:
+        spans = polygonSpans(rings, xMin, yMax, cellSize, rows, cols)
+        if spans is None:
+            continue
+        for r, c0, c1 in zip(*spans):
+            zones[r, c0:c1] = zoneID
+
+    return zones
+
+## ===================================================================================
+def attributeBands(zones, attributes, noData=0):
+    """ Derives one float64 band per attribute from a zone grid.  attributes is a dict of
+        zoneID -> tuple of values; None values and cells outside every zone are NaN.
+        Returns a list of arrays in the order of the attribute tuples. """
+
+    if not attributes:
+        return list()
+
+    numBands = len(next(iter(attributes.values())))
+    size = max(max(attributes.keys()), int(zones.max()), 0) + 1
+
+    table = np.full((size, numBands), np.nan, dtype=np.float64)
+    for zoneID, values in attributes.items():
+        table[zoneID] = [np.nan if v is None else v for v in values]
+
+    outside = zones == noData
+    lookup = np.where(outside, 0, zones)
+
+    bands = list()
+    for k in range(numBands):
+        band = table[:,k][lookup]
+        band[outside] = np.nan
+        bands.append(band)
+    return bands
+
+## ===================================================================================
+def tabulateArea(zones, classes, cellSize, numClasses=2, noData=0):
+    """ Zonal tabulation of a classified array (TabulateArea).  Counts the cells of every
+        class value (1 to numClasses) within every zone in one bincount pass and converts
+        them to area with the cell size.  Class values outside 1 to numClasses and NaN are
+        ignored.  Returns a float64 array of shape (max zone + 1, numClasses + 1) where
+        [zoneID, classValue] is the area; column 0 is not used. """
+
+    zones = np.asarray(zones)
+    classes = np.asarray(classes)
+    if classes.dtype.kind == 'f':
+        classes = np.where(np.isfinite(classes), classes, 0)
+    classes = classes.astype(np.int64)
+
+    valid = (zones != noData) & (classes >= 1) & (classes <= numClasses)
+    numZones = int(zones.max()) + 1 if zones.size else 1
+
+    counts = np.bincount(zones[valid].astype(np.int64) * (numClasses + 1) + classes[valid],
+                         minlength=numZones * (numClasses + 1))
+    return counts.reshape(numZones, numClasses + 1) * (float(cellSize) ** 2)
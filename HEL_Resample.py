@@ -0,0 +1,136 @@
+# ==========================================================================================
+# Name:   HEL Resample
+#
+# Fused clip and bilinear resample kernel for the NRCS HEL Determination tool.  DEMs finer
+# than 3 meters used to be clipped into an intermediate raster and then resampled with
+# ProjectRaster even though the coordinate system did not change.  This kernel reads the
+# source window (see readDEMWindow in NRCS_HEL_Determination.py) and writes the 3 meter grid
+# in one pass without any intermediate raster or projection work.
+#
+# This module does not import arcpy.  It only handles the same coordinate system case;
+# the calling script keeps ProjectRaster for DEMs that need to be projected.
+#
+#  - The output grid is aligned to a fixed origin (0, 0 by default) so that every run and
+#    every tile of the same area produces the same cells.
+#  - Output cell centers are interpolated from the four nearest source cell centers.  NoData
+#    neighbors are dropped and the weights of the remaining ones renormalized; a cell is
+#    NoData only when all four neighbors are.  Samples past the edge of the source use the
+#    edge cells.
+#  - The interpolation is vectorized over blocks of output rows to bound the memory used by
+#    the index and weight arrays.
+#
+# Running this script directly resamples a 1 meter plane and surface and checks the result:
+#     python HEL_Resample.py
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial fixed origin bilinear resample of a source window.
+
+import sys, math, time
+import numpy as np
+
+## ===================================================================================
+def alignedExtent(extent, cellSize, origin=(0.0, 0.0)):
+    """ Snaps an (xMin, yMin, xMax, yMax) extent outward to a grid of cellSize cells
+        anchored at origin.  Returns the snapped extent and its rows and cols. """
+
+    xOrigin, yOrigin = origin
+    xMin, yMin, xMax, yMax = extent
+    c0 = int(math.floor((xMin - xOrigin) / cellSize)); c1 = int(math.ceil((xMax - xOrigin) / cellSize))
+    r0 = int(math.floor((yMin - yOrigin) / cellSize)); r1 = int(math.ceil((yMax - yOrigin) / cellSize))
+    snapped = (xOrigin + c0 * cellSize, yOrigin + r0 * cellSize, xOrigin + c1 * cellSize, yOrigin + r1 * cellSize)
+    return snapped, r1 - r0, c1 - c0
+
+## ===================================================================================
+def axisWeights(centers, srcStart, srcCell, srcCount):
+    """ Returns the lower source index, upper source index and upper weight of every
+        output cell center along one axis.  srcStart is the edge of the first source
+        cell; positions past the first or last source center are clamped to it. """
+
+    position = (centers - srcStart) / srcCell - 0.5
+    position = np.clip(position, 0, srcCount - 1)
+    lower = np.minimum(np.floor(position).astype(np.int64), srcCount - 1)
+    upper = np.minimum(lower + 1, srcCount - 1)
+    return lower, upper, (position - lower).astype(np.float64)
+
+## ===================================================================================
+def bilinearResample(src, lowerLeft, srcCell, extent, cellSize=3.0, origin=(0.0, 0.0), noData=None, blockRows=256):
+    """ Resamples a north up source window with its lower left (x, y) corner and srcCell
+        cells to the cellSize grid anchored at origin that covers an (xMin, yMin, xMax,
+        yMax) extent.  Source cells equal to noData or NaN are NoData.
+
+        Returns the float32 output array (NaN as NoData) and its lower left (x, y). """
+
+    (xMin, yMin, xMax, yMax), rows, cols = alignedExtent(extent, cellSize, origin)
+    srcRows, srcCols = src.shape
+    srcTop = lowerLeft[1] + srcRows * srcCell
+
+    # Columns are the same for every block; rows run north to south in both grids
+    xCenters = xMin + (np.arange(cols) + 0.5) * cellSize
+    c0, c1, wx = axisWeights(xCenters, lowerLeft[0], srcCell, srcCols)
+    yCenters = yMax - (np.arange(rows) + 0.5) * cellSize
+    r0, r1, wy = axisWeights(srcTop - yCenters, 0.0, srcCell, srcRows)
+
+    out = np.empty((rows, cols), dtype=np.float32)
+    for top in range(0, rows, blockRows):
+        bottom = min(top + blockRows, rows)
+        rowLow = r0[top:bottom]; rowHigh = r1[top:bottom]
+        wyBlock = wy[top:bottom, None]
+
+        total = np.zeros((bottom - top, cols), dtype=np.float64)
+        weight = np.zeros((bottom - top, cols), dtype=np.float64)
+        for rowIdx, rowWeight in ((rowLow, 1.0 - wyBlock), (rowHigh, wyBlock)):
+            rowsData = src[rowIdx]
+            for colIdx, colWeight in ((c0, 1.0 - wx), (c1, wx)):
+                values = rowsData[:, colIdx].astype(np.float64)
+                valid = np.isfinite(values)
+                if noData is not None:
+                    valid &= values != noData
+                w = np.where(valid, rowWeight * colWeight, 0.0)
+                total += np.where(valid, values, 0.0) * w
+                weight += w
+
+        block = np.full(total.shape, np.nan, dtype=np.float64)
+        np.divide(total, weight, out=block, where=weight > 0)
+        out[top:bottom] = block
+
+    return out, (xMin, yMin)
+
+## ===================================================================================
+def selfTest():
+    """ Resamples a 1 meter window of a plane (exact under bilinear) and a surface """
+
+    srcCell = 1.0
+    lowerLeft = (500001.0, 4399002.0)
+    rows, cols = 1500, 1800
+    y, x = np.mgrid[0:rows, 0:cols]
+    xs = lowerLeft[0] + (x + 0.5) * srcCell
+    ys = lowerLeft[1] + rows * srcCell - (y + 0.5) * srcCell
+    plane = (100.0 + 0.01 * (xs - 500000) + 0.03 * (ys - 4399000)).astype(np.float32)
+
+    extent = (500010.2, 4399011.7, 500001.0 + cols - 10.4, 4399002.0 + rows - 9.9)
+    start = time.time()
+    out, outLowerLeft = bilinearResample(plane, lowerLeft, srcCell, extent, 3.0, noData=-9999.0)
+    seconds = time.time() - start
+
+    oy, ox = np.mgrid[0:out.shape[0], 0:out.shape[1]]
+    cx = outLowerLeft[0] + (ox + 0.5) * 3.0
+    cy = outLowerLeft[1] + out.shape[0] * 3.0 - (oy + 0.5) * 3.0
+    expected = 100.0 + 0.01 * (cx - 500000) + 0.03 * (cy - 4399000)
+    planeError = np.abs(out - expected).max()
+
+    # NoData cells only remove their own weight
+    holes = plane.copy()
+    holes[700:720, 900:950] = -9999.0
+    outHoles = bilinearResample(holes, lowerLeft, srcCell, extent, 3.0, noData=-9999.0)[0]
+    holeError = np.nanmax(np.abs(outHoles - expected))
+
+    print("Output %d x %d cells at %s in %.3f seconds" % (out.shape[0], out.shape[1], str(outLowerLeft), seconds))
+    print("Aligned to 0,0: %s" % (outLowerLeft[0] % 3.0 == 0 and outLowerLeft[1] % 3.0 == 0))
+    print("Plane max error: %.2e  with NoData holes: %.2e  NoData cells: %d" % (planeError, holeError, np.isnan(outHoles).sum()))
+    return planeError < 1e-3 and holeError < 1e-3 and outLowerLeft[0] % 3.0 == 0
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    sys.exit(0 if selfTest() else 1)
@@ -0,0 +1,298 @@
+# ==========================================================================================
+# Name:   HEL Result Cache
+#
+# Content addressed cache of HEL determination results.  The NRCS HEL Determination tool
+# builds a key from everything that decides the result (the selected CLU geometries, the HEL
+# soil layer and DEM source with a fingerprint of their data, zUnits and use_runoff_ls) and
+# stores the Field Determination, Initial and Final HEL Summary and LiDAR HEL outputs of a run
+# under that key.  An identical re-request copies the stored outputs instead of running the
+# intersect, dissolve, DEM extraction and raster chain again.
+#
+# This module does not import arcpy; it only manages the cache folder:
+#  - Every entry is a folder (i.e. a file geodatabase written by the calling script) named
+#    after its key.  HEL_Cache_Index.json records the size, scope and last use of every entry.
+#  - The total size of the cache is bounded.  Least recently used entries are evicted first.
+#  - Every entry has a scope: the key of the same request without the data fingerprints.
+#    When the data behind a scope changes, the new key misses and every entry of the old
+#    key in that scope is invalidated right away instead of waiting to be evicted.
+#  - The index is protected by a lock file so that batch processes can share the cache.
+#    An entry is written to a temporary folder (tempEntryPath) and renamed into place while
+#    the lock is held (store), and the calling script copies an entry out under the same
+#    lock, so a lookup in another process never deletes an entry that is being written or
+#    restored.
+#  - Only sources stored in files on disk can be fingerprinted (isFileSource).  Layers in an
+#    enterprise geodatabase (.sde connection) are not cached.
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial result cache with size bounded LRU eviction and scope invalidation.
+# - Virtual mosaics are fingerprinted with their member tiles.
+# - Entries are renamed into place under the lock, sources that are not files on disk are
+#   reported by isFileSource and the index is replaced atomically.
+
+import os, json, time, shutil, hashlib
+import HEL_DEM_Index
+
+indexName = 'HEL_Cache_Index.json'
+lockName = 'HEL_Cache_Index.lock'
+
+# Extension of the virtual mosaic descriptors of HEL_Mosaic.py
+mosaicExtension = '.vmosaic.json'
+
+# Connection files of databases and servers; their data is not on disk
+connectionExtensions = ('.sde', '.ags', '.odc')
+
+# Temporary entry folders older than this were left by a process that died
+tempEntrySeconds = 86400
+
+## ===================================================================================
+def cacheKey(parts):
+    """ Returns the SHA-1 hex digest of a list of key parts.  Parts must be JSON
+        serializable (strings, numbers, booleans and lists of them). """
+
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+## ===================================================================================
+def diskPath(path):
+    """ Returns the part of a path that exists on disk (i.e. C:\data\soils.gdb\MUPOLYGON
+        -> C:\data\soils.gdb) or None """
+
+    diskPath = path
+    while diskPath and not os.path.exists(diskPath):
+        parent = os.path.dirname(diskPath)
+        if parent == diskPath:
+            break
+        diskPath = parent
+
+    if not diskPath or not os.path.exists(diskPath):
+        return None
+    return diskPath
+
+## ===================================================================================
+def isFileSource(path):
+    """ True when the data of a path is stored in files that pathFingerprint can see: the
+        path exists or is inside a file or personal geodatabase.  Datasets behind a
+        connection file (enterprise geodatabase, server) and paths that do not exist
+        return False. """
+
+    onDisk = diskPath(path)
+    if onDisk is None or onDisk.lower().endswith(connectionExtensions):
+        return False
+    return os.path.normcase(os.path.abspath(onDisk)) == os.path.normcase(os.path.abspath(path)) or onDisk.lower().endswith(('.gdb', '.mdb'))
+
+## ===================================================================================
+def pathFingerprint(path):
+    """ Returns a fingerprint of the data behind a path: the size and latest
+        modification time of the files that make up the dataset.  Folders (file
+        geodatabases, grids) are walked; files that share the base name of a file
+        (shapefile parts) are included.  A feature class or table inside a geodatabase
+        is fingerprinted by its geodatabase.  A virtual mosaic (*.vmosaic.json) is
+        fingerprinted with every member tile.  Paths that do not exist on disk (i.e.
+        image service URLs) return the path itself. """
+
+    # Walk up to the dataset on disk (i.e. C:\data\soils.gdb\MUPOLYGON -> C:\data\soils.gdb)
+    onDisk = diskPath(path)
+    if onDisk is None:
+        return str(path)
+
+    files = list()
+    if os.path.isdir(onDisk):
+        for root, dirs, names in os.walk(onDisk):
+            files.extend([os.path.join(root, name) for name in names if not name.lower().endswith('.lock')])
+    else:
+        folder = os.path.dirname(onDisk) or '.'
+        base = os.path.splitext(os.path.join(folder, os.path.basename(onDisk)))[0].lower()
+        for name in os.listdir(folder):
+            if os.path.splitext(os.path.join(folder, name))[0].lower() == base:
+                files.append(os.path.join(folder, name))
+
+    size = 0; modified = 0
+    for f in files:
+        try:
+            stat = os.stat(f)
+            size += stat.st_size
+            modified = max(modified, stat.st_mtime)
+        except OSError:
+            pass
+
+    fingerprint = "%s|%d|%d|%.0f" % (os.path.abspath(onDisk).lower(), len(files), size, modified)
+
+    # The descriptor of a virtual mosaic does not change when its member tiles are updated
+    if onDisk.lower().endswith(mosaicExtension) and os.path.isfile(onDisk):
+        try:
+            with open(onDisk, 'r') as f:
+                tiles = json.load(f).get('tiles', [])
+            fingerprint += "|" + cacheKey([pathFingerprint(tile['path']) for tile in tiles])
+        except (ValueError, KeyError, TypeError, EnvironmentError):
+            pass
+
+    return fingerprint
+
+## ===================================================================================
+def folderSize(path):
+    """ Returns the total size in bytes of the files in a folder """
+
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+## ===================================================================================
+class indexLock(object):
+    """ Context manager that holds the cache index lock file.  A lock older than
+        staleSeconds is assumed to be left over from a process that died. """
+
+    def __init__(self, cacheFolder, timeout=60, staleSeconds=300):
+        self.path = os.path.join(cacheFolder, lockName)
+        self.timeout = timeout
+        self.staleSeconds = staleSeconds
+
+    def __enter__(self):
+        start = time.time()
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except OSError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.staleSeconds:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    pass
+                if time.time() - start > self.timeout:
+                    raise RuntimeError("Timed out waiting for " + self.path)
+                time.sleep(0.1)
+
+    def __exit__(self, excType, excValue, tb):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+## ===================================================================================
+def loadIndex(cacheFolder):
+    """ Reads the cache index.  Returns a dict of key -> entry; entries whose folder
+        is gone are dropped. """
+
+    indexPath = os.path.join(cacheFolder, indexName)
+    if not os.path.isfile(indexPath):
+        return dict()
+    try:
+        with open(indexPath, 'r') as f:
+            index = json.load(f)
+    except ValueError:
+        return dict()
+
+    return dict([(key, entry) for key, entry in index.items() if os.path.exists(entryPath(cacheFolder, key))])
+
+## ===================================================================================
+def saveIndex(cacheFolder, index):
+    """ Writes the cache index through a temporary file that replaces the old index in
+        one step so a crash never leaves a partial index behind. """
+
+    indexPath = os.path.join(cacheFolder, indexName)
+    tempPath = indexPath + '.tmp'
+    with open(tempPath, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    HEL_DEM_Index.replaceFile(tempPath, indexPath)
+
+## ===================================================================================
+def entryPath(cacheFolder, key):
+    """ Returns the folder (file geodatabase) that holds the outputs of a key """
+
+    return os.path.join(cacheFolder, 'HEL_' + key + '.gdb')
+
+## ===================================================================================
+def tempEntryPath(cacheFolder, key):
+    """ Returns a temporary folder (file geodatabase) of this process to write the outputs
+        of a key into before store renames it into place """
+
+    return os.path.join(cacheFolder, 'tmp_%s_%d_%d.gdb' % (key, os.getpid(), int(time.time() * 1000)))
+
+## ===================================================================================
+def removeEntry(cacheFolder, index, key):
+    """ Deletes an entry folder and drops it from the index """
+
+    shutil.rmtree(entryPath(cacheFolder, key), ignore_errors=True)
+    index.pop(key, None)
+
+## ===================================================================================
+def lookup(cacheFolder, key, scope):
+    """ Looks up a key.  Returns the entry dict (with its 'path') on a hit or None on a
+        miss.  A hit becomes the most recently used entry.  On a miss every entry of
+        the same scope is invalidated since its inputs have changed. """
+
+    if not os.path.isdir(cacheFolder):
+        return None
+
+    with indexLock(cacheFolder):
+        index = loadIndex(cacheFolder)
+
+        entry = index.get(key)
+        if entry is not None:
+            entry['lastUsed'] = time.time()
+            saveIndex(cacheFolder, index)
+            entry = dict(entry)
+            entry['path'] = entryPath(cacheFolder, key)
+            return entry
+
+        stale = [k for k, e in index.items() if e.get('scope') == scope]
+        for k in stale:
+            removeEntry(cacheFolder, index, k)
+        if stale:
+            saveIndex(cacheFolder, index)
+        return None
+
+## ===================================================================================
+def store(cacheFolder, key, scope, maxBytes, meta=None, tempPath=None):
+    """ Registers the entry folder of a key once the calling script has written it and
+        evicts least recently used entries until the cache fits in maxBytes.  When
+        tempPath (tempEntryPath) is given it replaces the entry folder while the lock is
+        held.  An entry that is larger than maxBytes on its own is not kept.  Returns True
+        if the entry was kept. """
+
+    path = entryPath(cacheFolder, key)
+    if not os.path.exists(tempPath or path):
+        return False
+
+    with indexLock(cacheFolder):
+        if tempPath:
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.rename(tempPath, path)
+            except OSError:
+                shutil.rmtree(tempPath, ignore_errors=True)
+                return False
+
+        # Temporary entries left behind by processes that died
+        for name in os.listdir(cacheFolder):
+            leftover = os.path.join(cacheFolder, name)
+            try:
+                if name.startswith('tmp_') and time.time() - os.path.getmtime(leftover) > tempEntrySeconds:
+                    shutil.rmtree(leftover, ignore_errors=True)
+            except OSError:
+                pass
+
+        index = loadIndex(cacheFolder)
+        now = time.time()
+        index[key] = {'scope': scope, 'bytes': folderSize(path), 'created': now,
+                      'lastUsed': now, 'meta': meta or dict()}
+
+        total = sum([e['bytes'] for e in index.values()])
+        for k in sorted(index.keys(), key=lambda k: index[k]['lastUsed']):
+            if total <= maxBytes:
+                break
+            total -= index[k]['bytes']
+            removeEntry(cacheFolder, index, k)
+
+        saveIndex(cacheFolder, index)
+        return key in index
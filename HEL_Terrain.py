@@ -0,0 +1,138 @@
+# ==========================================================================================
+# Name:   HEL Terrain Engine
+#
+# NumPy implementation of the terrain chain used by the NRCS HEL Determination tool:
+#
+#     Fill(dem, zLimit) -> FocalStatistics(NbrRectangle(3,3),"MEAN","DATA") -> Slope("PERCENT_RISE",zFactor)
+#
+# plus the 3x3 FocalStatistics MAXIMUM that is run on flow length (see HEL_Flow.py).
+#
+# This module does not import arcpy so that the slope stage can be run on machines that
+# do not have ArcGIS installed.  All functions work on 2D NumPy arrays where NoData is
+# represented as NaN.  Conversion between arcpy rasters and arrays is done by the calling
+# script (see rasterToArray and arrayToRaster in NRCS_HEL_Determination.py).
+#
+# The following ArcGIS conventions are honored so that results line up with the
+# Spatial Analyst path:
+#  - Fill: sinks are filled up to their pour point.  A sink whose depth (pour point minus
+#    lowest cell) is greater than zLimit is left unfilled.  Cells on the edge of the grid or
+#    next to NoData are treated as outlets.
+#  - FocalStatistics MEAN with "DATA": NoData cells within the 3x3 window are ignored.  A
+#    NoData cell with at least one valid neighbor receives the mean of its neighbors.
+#  - Slope: Horn's 3rd order finite difference.  NoData cells stay NoData and any NoData
+#    (or off-grid) neighbor takes the value of the center cell.
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial NumPy backend for the Fill, FocalStatistics MEAN and Slope PERCENT_RISE tools.
+# - The sink fill was moved to the standalone priority-flood module HEL_Fill.py.
+# - Added focalMaximum for smoothing flow length (FocalStatistics MAXIMUM, "DATA").
+
+import numpy as np
+import HEL_Fill
+
+## ===================================================================================
+def validMask(array):
+    """ Returns a boolean array that is True where cells contain data """
+
+    return np.isfinite(array)
+
+## ===================================================================================
+def shiftedWindows(padded, rows, cols):
+    """ Generator that yields the 9 views of a padded array (1 cell pad on every side)
+        that line up with the 3x3 neighborhood of every cell.  Yields (rowOffset,
+        colOffset, view). """
+
+    for dr in (-1,0,1):
+        for dc in (-1,0,1):
+            yield dr, dc, padded[1+dr:1+dr+rows, 1+dc:1+dc+cols]
+
+## ===================================================================================
+def fillDEM(dem, zLimit=None):
+    """ Fills sinks in a DEM using the priority-flood in HEL_Fill.py.  Sinks whose
+        depth is greater than zLimit are left unfilled; if zLimit is None every sink
+        is filled.  Returns an array in the input precision with NaN as NoData. """
+
+    return HEL_Fill.priorityFlood(dem, zLimit)
+
+## ===================================================================================
+def focalMean(array):
+    """ 3x3 rectangular focal mean that ignores NoData (FocalStatistics MEAN, "DATA").
+        Returns a float64 array with NaN where the whole neighborhood is NoData. """
+
+    array = np.asarray(array, dtype=np.float64)
+    rows, cols = array.shape
+    valid = validMask(array)
+
+    padded = np.pad(np.where(valid, array, 0.0), 1, mode='constant', constant_values=0.0)
+    paddedValid = np.pad(valid, 1, mode='constant', constant_values=False)
+
+    total = np.zeros(array.shape, dtype=np.float64)
+    count = np.zeros(array.shape, dtype=np.float64)
+    for dr, dc, view in shiftedWindows(padded, rows, cols):
+        total += view
+    for dr, dc, view in shiftedWindows(paddedValid, rows, cols):
+        count += view
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    mean[count == 0] = np.nan
+    return mean
+
+## ===================================================================================
+def focalMaximum(array):
+    """ 3x3 rectangular focal maximum that ignores NoData (FocalStatistics MAXIMUM, "DATA").
+        Returns a float64 array with NaN where the whole neighborhood is NoData. """
+
+    array = np.asarray(array, dtype=np.float64)
+    rows, cols = array.shape
+
+    padded = np.pad(np.where(validMask(array), array, -np.inf), 1, mode='constant', constant_values=-np.inf)
+
+    maximum = np.full(array.shape, -np.inf, dtype=np.float64)
+    for dr, dc, view in shiftedWindows(padded, rows, cols):
+        np.maximum(maximum, view, out=maximum)
+
+    maximum[np.isinf(maximum)] = np.nan
+    return maximum
+
+## ===================================================================================
+def slopePercentRise(array, cellSize, zFactor=1.0):
+    """ Horn's method slope in percent rise (Slope "PERCENT_RISE").  Off-grid and NoData
+        neighbors take the value of the center cell.  NoData cells stay NoData. """
+
+    array = np.asarray(array, dtype=np.float64)
+    rows, cols = array.shape
+    valid = validMask(array)
+
+    padded = np.pad(array, 1, mode='constant', constant_values=np.nan)
+    win = dict()
+    for dr, dc, view in shiftedWindows(padded, rows, cols):
+        win[(dr,dc)] = np.where(np.isnan(view), array, view)
+
+    #  a b c
+    #  d e f
+    #  g h i
+    a = win[(-1,-1)]; b = win[(-1,0)]; c = win[(-1,1)]
+    d = win[(0,-1)];                   f = win[(0,1)]
+    g = win[(1,-1)];  h = win[(1,0)];  i = win[(1,1)]
+
+    dzdx = ((c + 2*f + i) - (a + 2*d + g)) / (8.0 * cellSize)
+    dzdy = ((g + 2*h + i) - (a + 2*b + c)) / (8.0 * cellSize)
+
+    slope = np.sqrt(dzdx**2 + dzdy**2) * zFactor * 100.0
+    slope[~valid] = np.nan
+    return slope
+
+## ===================================================================================
+def slopeFromDEM(dem, cellSize, zFactor, zLimit):
+    """ Runs the full Fill -> Focal Mean -> Slope chain on a DEM array.
+        Returns (preslope, slope) as float32 arrays.  preslope is the smoothed
+        and filled DEM which is also the input to flow direction. """
+
+    filled = fillDEM(dem, zLimit)
+    preslope = focalMean(filled)
+    del filled
+
+    slope = slopePercentRise(preslope, cellSize, zFactor)
+    return preslope.astype(np.float32), slope.astype(np.float32)
@@ -0,0 +1,145 @@
+# ==========================================================================================
+# Name:   HEL Tile Clip
+#
+# Process pool workers that clip DEM tiles for the Merge Local DEMs by CLU tool.  Instead of
+# clipping one tile at a time, the tiles are handed to a pool of worker processes (see
+# clipTiles in Merge_Local_DEMs_by_CLU.py):
+#
+#  - Every worker checks out Spatial Analyst once and writes its clips into its own file
+#    geodatabase (clip_<process id>.gdb) in the scratch folder so that workers never write
+#    to the same workspace.
+#  - A tile is clipped to the 410 meter buffer of the CLU fields without a buffer feature
+#    class: only the window of the buffered extent is read and the buffer is rasterized onto
+#    the tile grid (clipToBuffer, HEL_Buffer.py).  The CLU rings travel with every job so
+#    nothing has to be shared through in_memory.
+#  - Results come back in the order of the input tiles so the mosaic is the same as the
+#    serial loop.
+#  - The number of workers is bounded by the caller so that small VDI machines are not run
+#    out of memory.
+#
+# The workers live in this module so that they can be used by any tool script.  On Windows
+# every worker process still imports the main script of the parent process (as
+# __parents_main__), so a tool script that uses clipTiles must keep its main body under
+# if __name__ == '__main__'; otherwise every worker runs the whole tool again.
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial process pool clipping of DEM tiles with per worker scratch geodatabases.
+# - Clip to a rasterized buffer mask instead of ExtractByMask with a buffer feature class.
+
+import os, sys, multiprocessing
+import HEL_Buffer, HEL_DEM_Reader
+
+workerGDB = None
+
+## ===================================================================================
+def initWorker(scratchFolder, spatialReference):
+    """ Initializes a worker process: checks out Spatial Analyst, sets the environment of
+        the tool and creates the scratch geodatabase of the worker """
+
+    global workerGDB
+    import arcpy
+
+    arcpy.CheckOutExtension("Spatial")
+    sr = arcpy.SpatialReference()
+    sr.loadFromString(spatialReference)
+    arcpy.env.geographicTransformations = "WGS_1984_(ITRF00)_To_NAD_1983"
+    arcpy.env.resamplingMethod = "BILINEAR"
+    arcpy.env.pyramid = "NONE"
+    arcpy.env.outputCoordinateSystem = sr
+    arcpy.env.overwriteOutput = True
+
+    gdbName = "clip_" + str(os.getpid()) + ".gdb"
+    workerGDB = os.path.join(scratchFolder, gdbName)
+    if not arcpy.Exists(workerGDB):
+        arcpy.CreateFileGDB_management(scratchFolder, gdbName)
+    arcpy.env.scratchWorkspace = workerGDB
+    arcpy.env.workspace = workerGDB
+
+## ===================================================================================
+def clipToBuffer(dem, polygons, distance, outClip):
+    """ Clips a DEM to the round buffer of polygons (lists of rings of (x, y) vertices in
+        the coordinate system of the DEM) by distance in DEM units.  Only the window of the
+        buffered extent is read; cells outside the buffer are set to NoData.  Raises
+        ValueError when the buffer does not overlap the DEM. """
+
+    import arcpy
+
+    desc = arcpy.Describe(dem)
+    cellX = desc.meanCellWidth; cellY = desc.meanCellHeight
+    xs = [x for rings in polygons for ring in rings for x, y in ring]
+    ys = [y for rings in polygons for ring in rings for x, y in ring]
+    extent = HEL_Buffer.bufferedExtent(xs, ys, distance)
+
+    r0, r1, c0, c1 = HEL_DEM_Reader.snapWindow((desc.extent.XMin, desc.extent.YMax), (cellX, cellY), (desc.height, desc.width), extent)
+    if r1 <= r0 or c1 <= c0:
+        raise ValueError("The buffered CLU fields do not overlap " + dem)
+
+    lowerLeft = arcpy.Point(desc.extent.XMin + c0 * cellX, desc.extent.YMax - r1 * cellY)
+    noData = desc.noDataValue
+    if noData is not None:
+        demArray = arcpy.RasterToNumPyArray(dem, lowerLeft, c1 - c0, r1 - r0, noData)
+    else:
+        noData = -3.40282346639e+38
+        demArray = arcpy.RasterToNumPyArray(dem, lowerLeft, c1 - c0, r1 - r0).astype('float32')
+
+    mask = HEL_Buffer.bufferMask(polygons, distance, (lowerLeft.X, lowerLeft.Y), cellX, r1 - r0, c1 - c0)
+    if not mask.any():
+        raise ValueError("The buffered CLU fields do not overlap " + dem)
+    demArray[~mask] = noData
+
+    arcpy.NumPyArrayToRaster(demArray, lowerLeft, cellX, cellY, noData).save(outClip)
+    arcpy.DefineProjection_management(outClip, desc.spatialReference)
+    return outClip
+
+## ===================================================================================
+def clipTile(job):
+    """ Clips one DEM tile to the buffer.  job is (index, DEM path, polygons, distance);
+        see clipToBuffer.  Returns (index, clipped raster path or None, error message). """
+
+    index, dem, polygons, distance = job
+    try:
+        outClip = clipToBuffer(dem, polygons, distance, os.path.join(workerGDB, "temp_dem_" + str(index)))
+        return index, outClip, ""
+
+    except Exception as e:
+        return index, None, str(e)
+
+## ===================================================================================
+def pythonExecutable():
+    """ Returns the python interpreter for worker processes.  Inside ArcMap sys.executable
+        is ArcMap.exe, so the interpreter next to the ArcGIS python library is used. """
+
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+
+    for name in ('python.exe', 'pythonw.exe'):
+        candidate = os.path.join(sys.exec_prefix, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return sys.executable
+
+## ===================================================================================
+def clipTiles(dems, buffers, scratchFolder, spatialReference, workers, progress=None):
+    """ Clips every DEM to its buffer over a pool of at most workers processes.  buffers
+        holds the (polygons, distance) of every DEM in its coordinate system (see
+        clipToBuffer).  progress(n, total, dem) is called as results arrive.  Returns the list of
+        (clipped raster path or None, error message) in the order of dems and the list of
+        worker geodatabases to delete. """
+
+    multiprocessing.set_executable(pythonExecutable())
+    jobs = [(index, dem, polygons, distance) for index, (dem, (polygons, distance)) in enumerate(zip(dems, buffers))]
+    results = [None] * len(jobs)
+
+    pool = multiprocessing.Pool(max(1, min(workers, len(jobs))), initWorker, (scratchFolder, spatialReference))
+    try:
+        for n, (index, outClip, message) in enumerate(pool.imap(clipTile, jobs)):
+            results[index] = (outClip, message)
+            if progress:
+                progress(n + 1, len(jobs), dems[index])
+    finally:
+        pool.close()
+        pool.join()
+
+    workerGDBs = sorted(set([os.path.dirname(outClip) for outClip, message in results if outClip]))
+    return results, workerGDBs
@@ -0,0 +1,315 @@
+# ==========================================================================================
+# Name:   HEL Tiles
+#
+# Block tiled execution of the neighborhood stages of the NumPy engines used by the NRCS HEL
+# Determination tool.  Every stage used to run on the whole 410 meter buffer at once and its
+# temporaries (the nine shifted windows of Slope, the sums and counts of Focal Statistics,
+# the Sin, Cos and Power terms of the LS factor) grew with the tract.  Here the grid is split
+# into blocks that are processed one at a time and stitched back:
+#
+#  - Every block is read with a halo of rows and columns around it that covers the
+#    neighborhood of the stage: 2 cells for Focal Mean followed by Slope (3x3 each), 1 cell
+#    for the Focal Maximum of flow length and none for the cell by cell HEL factor.  Only the
+#    core of every block is written back, so the stitched result is the same, bit for bit,
+#    as running the stage on the whole grid.  Blocks on the edge of the grid are not padded;
+#    the stage sees the real grid edge.
+#  - The block size is derived from a peak memory budget (budgetMB) and the bytes every
+#    stage needs per cell, so the temporaries of a 5,000 acre tract take the same memory as
+#    those of a 50 acre one.  Only the input and output grids are held in full.
+#
+#  - Stages compute every window in float64 and store continuous results as float32
+#    (HEL_Compact.py).  Class grids packed 2 bits per cell (HEL_Compact.PackedClasses) are
+#    unpacked one window at a time.
+#
+#  - With workers > 1 the blocks are handed to a pool of worker processes.  The input and
+#    output grids are copied once into shared memory (multiprocessing.sharedctypes) and every
+#    worker reads its window and writes its core in place, so no block is pickled.  The
+#    blocks are the same computations as the serial path and results match it bit for bit.
+#    The budget is split between the workers.
+#
+# Fill and upstream Flow Length are not local (a sink or a flow path can cross any number of
+# blocks) and still run on the whole grid (HEL_Fill.py, HEL_Flow.py).  This module does not
+# import arcpy.
+#
+# Running this script directly compares tiled, parallel and whole grid results on a synthetic
+# DEM; with 'benchmark' it times the stages on 1, 2, 4 ... workers up to the number of cores:
+#     python HEL_Tiles.py
+#     python HEL_Tiles.py benchmark [cells]
+
+# ==========================================================================================
+# Created 10/18/2026
+# - Initial halo block execution of Focal Mean + Slope, Focal Maximum and HEL factor.
+# - Blocks run over a process pool on shared memory grids (workers) with a scaling benchmark.
+# - float32 preslope, slope and Focal Maximum outputs; packed class grids as inputs.
+# - Smaller HEL factor footprint per cell with the chunked LS and EI evaluator.
+
+import sys, math, time, multiprocessing
+from multiprocessing import sharedctypes
+import numpy as np
+import HEL_Terrain, HEL_Factors, HEL_Fill, HEL_Tile_Clip, HEL_Compact
+
+# Peak bytes per window cell of every stage (inputs, outputs and temporaries).  The HEL factor
+# only holds its output, the PHEL cell index and masks; its LS and EI chain runs in cache sized
+# chunks (HEL_Factors.evaluateChunk).
+slopeBytesPerCell = 200
+focalMaximumBytesPerCell = 48
+helFactorBytesPerCell = 32
+
+# Input and output grids of a worker process (views of shared memory)
+workerGrids = None
+
+## ===================================================================================
+def blockShape(rows, cols, halo, bytesPerCell, budgetMB):
+    """ Returns the (blockRows, blockCols) of the core blocks whose windows, halo
+        included, fit the memory budget.  Full width bands are used when a row fits. """
+
+    cells = max(int(budgetMB * 1048576) // bytesPerCell, (2 * halo + 1) ** 2)
+    if cells // (cols + 2 * halo) >= 2 * halo + 1:
+        blockCols = cols
+        blockRows = cells // (cols + 2 * halo) - 2 * halo
+    else:
+        blockCols = blockRows = max(int(math.sqrt(cells)) - 2 * halo, 1)
+    return max(min(blockRows, rows), 1), max(min(blockCols, cols), 1)
+
+## ===================================================================================
+def blockWindows(rows, cols, blockRows, blockCols, halo):
+    """ Yields the (r0, r1, c0, c1) core of every block and its window grown by halo and
+        clipped to the grid """
+
+    for r0 in range(0, rows, blockRows):
+        r1 = min(r0 + blockRows, rows)
+        for c0 in range(0, cols, blockCols):
+            c1 = min(c0 + blockCols, cols)
+            yield (r0, r1, c0, c1), (max(r0 - halo, 0), min(r1 + halo, rows), max(c0 - halo, 0), min(c1 + halo, cols))
+
+## ===================================================================================
+def runBlock(function, args, inputs, outputs, core, window):
+    """ Runs function(*(windows + args)) on the window of one block and writes the core
+        of its results into the output grids """
+
+    (r0, r1, c0, c1), (h0, h1, g0, g1) = core, window
+    results = function(*([grid[h0:h1, g0:g1] for grid in inputs] + list(args)))
+    if not isinstance(results, tuple):
+        results = (results,)
+    for output, result in zip(outputs, results):
+        output[r0:r1, c0:c1] = result[r0 - h0:r1 - h0, c0 - g0:c1 - g0]
+
+## ===================================================================================
+def sharedGrid(array=None, shape=None, dtype=None):
+    """ Returns a grid in shared memory as (raw array, shape, dtype name, packed shape)
+        and its NumPy view; the grid is a copy of array when one is given.  Only the packed
+        bytes of a PackedClasses grid are shared; packed shape is its grid shape. """
+
+    packedShape = None
+    if isinstance(array, HEL_Compact.PackedClasses):
+        packedShape = array.shape
+        array = array.packed
+    if array is not None:
+        shape, dtype = array.shape, array.dtype
+    dtype = np.dtype(dtype)
+    raw = sharedctypes.RawArray('b', max(int(np.prod(shape)) * dtype.itemsize, 1))
+    view = np.frombuffer(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    if array is not None:
+        view[...] = array
+    return (raw, shape, dtype.str, packedShape), view
+
+## ===================================================================================
+def sharedView(spec):
+    """ Returns the grid of a shared memory spec of sharedGrid """
+
+    raw, shape, dtype, packedShape = spec
+    view = np.frombuffer(raw, dtype=np.dtype(dtype), count=int(np.prod(shape))).reshape(shape)
+    if packedShape is not None:
+        return HEL_Compact.PackedClasses(packed=view, shape=packedShape)
+    return view
+
+## ===================================================================================
+def initBlockWorker(specs):
+    """ Initializes a worker process with the views of the shared input and output grids """
+
+    global workerGrids
+    workerGrids = [sharedView(spec) for spec in specs]
+
+## ===================================================================================
+def runSharedBlock(job):
+    """ Runs one block in a worker process.  job is (function, args, number of inputs,
+        core, window).  Returns the core. """
+
+    function, args, inputCount, core, window = job
+    runBlock(function, args, workerGrids[:inputCount], workerGrids[inputCount:], core, window)
+    return core
+
+## ===================================================================================
+def runBlocks(function, inputs, outputTypes, halo, bytesPerCell, budgetMB=256, progress=None, workers=1, args=()):
+    """ Runs function(*(windows + args)) over the blocks of the input grids.  function
+        returns an array (or a tuple of arrays) the shape of the windows; the cores are
+        stitched into output grids of outputTypes.  With workers > 1 the blocks run over a
+        process pool on shared memory; function must then be a module level function.
+        progress(n, total) is called after every block.  Returns the output grid or the
+        tuple of output grids. """
+
+    rows, cols = inputs[0].shape
+    workers = max(1, int(workers))
+    blockRows, blockCols = blockShape(rows, cols, halo, bytesPerCell, float(budgetMB) / workers)
+
+    # At least two bands per worker so that the pool stays busy
+    if workers > 1 and blockCols == cols:
+        blockRows = max(min(blockRows, -(-rows // (2 * workers))), 1)
+    windows = list(blockWindows(rows, cols, blockRows, blockCols, halo))
+
+    if workers == 1 or len(windows) == 1:
+        outputs = [np.empty((rows, cols), dtype=outputType) for outputType in outputTypes]
+        for n, (core, window) in enumerate(windows):
+            runBlock(function, args, inputs, outputs, core, window)
+            if progress:
+                progress(n + 1, len(windows))
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+    specs = list(); outputs = list()
+    for grid in inputs:
+        if not isinstance(grid, HEL_Compact.PackedClasses):
+            grid = np.ascontiguousarray(grid)
+        specs.append(sharedGrid(grid)[0])
+    for outputType in outputTypes:
+        spec, view = sharedGrid(shape=(rows, cols), dtype=outputType)
+        specs.append(spec); outputs.append(view)
+
+    # Inside ArcMap sys.executable is ArcMap.exe
+    if sys.platform == 'win32':
+        multiprocessing.set_executable(HEL_Tile_Clip.pythonExecutable())
+    jobs = [(function, args, len(inputs), core, window) for core, window in windows]
+    pool = multiprocessing.Pool(min(workers, len(jobs)), initBlockWorker, (specs,))
+    try:
+        for n, core in enumerate(pool.imap_unordered(runSharedBlock, jobs)):
+            if progress:
+                progress(n + 1, len(jobs))
+    finally:
+        pool.close()
+        pool.join()
+
+    return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+## ===================================================================================
+def preslopeSlopeBlock(window, cellSize, zFactor):
+    """ Focal Mean followed by Slope on one window """
+
+    preslope = HEL_Terrain.focalMean(window)
+    return preslope, HEL_Terrain.slopePercentRise(preslope, cellSize, zFactor)
+
+## ===================================================================================
+def preslopeSlope(filled, cellSize, zFactor, budgetMB=256, progress=None, workers=1):
+    """ Focal Mean (3x3, DATA) of the filled DEM followed by Slope PERCENT_RISE, block by
+        block with a 2 cell halo.  Returns the float32 preslope and slope grids. """
+
+    return runBlocks(preslopeSlopeBlock, [filled], [np.float32, np.float32], 2, slopeBytesPerCell, budgetMB, progress,
+                     workers, (cellSize, zFactor))
+
+## ===================================================================================
+def focalMaximum(array, budgetMB=256, progress=None, workers=1):
+    """ Focal Maximum (3x3, DATA) block by block with a 1 cell halo.  Returns a float32
+        grid. """
+
+    return runBlocks(HEL_Terrain.focalMaximum, [array], [np.float32], 1, focalMaximumBytesPerCell, budgetMB, progress, workers)
+
+## ===================================================================================
+def helFactor(slope, flowLengthFT, kFactor, rFactor, tFactor, helValue, useRunoffLS=False, budgetMB=256, progress=None, workers=1):
+    """ HEL factor (HEL_Factors.helFactor) block by block; it is cell by cell so no halo
+        is needed.  helValue may be a PackedClasses grid. """
+
+    return runBlocks(HEL_Factors.helFactor, [slope, flowLengthFT, kFactor, rFactor, tFactor, helValue], [np.float32], 0,
+                     helFactorBytesPerCell, budgetMB, progress, workers, (useRunoffLS,))
+
+## ===================================================================================
+def sameCells(a, b):
+    """ True when two grids hold the same values and the same NoData cells """
+
+    return a.shape == b.shape and bool(((a == b) | (np.isnan(a) & np.isnan(b))).all())
+
+## ===================================================================================
+def selfTest():
+    """ Runs every tiled stage with a small budget on a synthetic DEM with NoData holes
+        and compares it with the whole grid """
+
+    rows, cols = 613, 457
+    y, x = np.mgrid[0:rows, 0:cols]
+    rng = np.random.RandomState(3)
+    dem = 250.0 + 0.02 * x + 3.0 * np.sin(y / 29.0) * np.cos(x / 41.0) + rng.normal(0, 0.05, (rows, cols))
+    dem[100:130, 200:260] = np.nan
+    dem[:, :3] = np.nan
+    dem[rng.uniform(size=(rows, cols)) < 0.002] = np.nan
+    dem = HEL_Compact.floatGrid(dem)
+
+    flowLength = np.abs(rng.normal(300.0, 150.0, (rows, cols)))
+    flowLength[np.isnan(dem)] = np.nan
+    flowLength = HEL_Compact.floatGrid(flowLength)
+    helValue = rng.randint(0, 3, (rows, cols)).astype(np.float64)
+    packedHEL = HEL_Compact.PackedClasses(helValue)
+    k = np.full((rows, cols), 0.32, dtype=np.float32); r = np.full((rows, cols), 125.0, dtype=np.float32); t = np.full((rows, cols), 5.0, dtype=np.float32)
+
+    budgetMB = 2.0
+    blocks = len(list(blockWindows(rows, cols, *(blockShape(rows, cols, 2, slopeBytesPerCell, budgetMB) + (2,)))))
+
+    start = time.time()
+    preslope = HEL_Terrain.focalMean(dem)
+    slope = HEL_Terrain.slopePercentRise(preslope, 3.0, 1.0).astype(np.float32)
+    preslope = preslope.astype(np.float32)
+    maximum = HEL_Terrain.focalMaximum(flowLength).astype(np.float32)
+    factor = HEL_Factors.helFactor(slope, flowLength, k, r, t, helValue, False)
+    whole = time.time() - start
+
+    start = time.time()
+    tiledPreslope, tiledSlope = preslopeSlope(dem, 3.0, 1.0, budgetMB)
+    tiledMaximum = focalMaximum(flowLength, budgetMB)
+    tiledFactor = helFactor(tiledSlope, flowLength, k, r, t, packedHEL, False, budgetMB)
+    tiled = time.time() - start
+
+    # Square blocks when a band of full rows does not fit
+    squarePreslope, squareSlope = preslopeSlope(dem, 3.0, 1.0, 0.05)
+
+    # Process pool of 3 workers on shared memory
+    start = time.time()
+    poolPreslope, poolSlope = preslopeSlope(dem, 3.0, 1.0, budgetMB, workers=3)
+    poolMaximum = focalMaximum(flowLength, budgetMB, workers=3)
+    poolFactor = helFactor(poolSlope, flowLength, k, r, t, packedHEL, False, budgetMB, workers=3)
+    pooled = time.time() - start
+
+    checks = [sameCells(preslope, tiledPreslope), sameCells(slope, tiledSlope), sameCells(maximum, tiledMaximum), sameCells(factor, tiledFactor),
+              sameCells(preslope, squarePreslope), sameCells(slope, squareSlope),
+              sameCells(preslope, poolPreslope), sameCells(slope, poolSlope), sameCells(maximum, poolMaximum), sameCells(factor, poolFactor)]
+    print("Grid %d x %d; %d Focal Mean + Slope blocks within %.1f MB" % (rows, cols, blocks, budgetMB))
+    print("Whole grid %.2f s; tiled %.2f s; 3 workers %.2f s (pool start up included)" % (whole, tiled, pooled))
+    print("Identical to the whole grid (tiled, square blocks, 3 workers): %s" % str(checks))
+    return all(checks) and blocks > 1
+
+## ===================================================================================
+def benchmark(cells=16000000, workerCounts=None):
+    """ Times the Focal Mean + Slope and Focal Maximum stages on a synthetic DEM for a
+        range of worker counts and checks every run against the single worker result """
+
+    side = int(math.sqrt(cells))
+    dem = HEL_Fill.syntheticDEM(side, side, side * side // 2000).astype(np.float32)
+    if not workerCounts:
+        workerCounts = [1]
+        while workerCounts[-1] * 2 <= multiprocessing.cpu_count():
+            workerCounts.append(workerCounts[-1] * 2)
+
+    print("{:>12} {:>8} {:>10} {:>9} {:>10}".format("Cells", "Workers", "Seconds", "Speedup", "Identical"))
+    baseline = None
+    for workers in workerCounts:
+        start = time.time()
+        preslope, slope = preslopeSlope(dem, 3.0, 1.0, 256, workers=workers)
+        maximum = focalMaximum(slope, 256, workers=workers)
+        seconds = time.time() - start
+
+        if baseline is None:
+            baseline = (seconds, preslope, slope, maximum)
+        identical = sameCells(preslope, baseline[1]) and sameCells(slope, baseline[2]) and sameCells(maximum, baseline[3])
+        print("{:>12} {:>8} {:>10.2f} {:>9.2f} {:>10}".format(side * side, workers, seconds, baseline[0] / seconds, str(identical)))
+
+## =========================================================== Main Body ========================================================
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark(int(float(sys.argv[2])) if len(sys.argv) > 2 else 16000000)
+    else:
+        sys.exit(0 if selfTest() else 1)
@@ -20,6 +20,29 @@
 
 # Maintenance Point of Contact: T.B.D.
 
+# ==========================================================================================
+# Updated 10/18/2026
+# - Optional DEM library folder (4th parameter).  The DEM tiles of the library are indexed once in
+#   HEL_DEM_Index.json (HEL_DEM_Index.py) and only the tiles that intersect the 410 meter buffer
+#   are clipped and merged.  Tile properties come from the index instead of probing every file.
+# - Optional virtual mosaic output (5th parameter).  A *.vmosaic.json descriptor of the DEMs and the
+#   MEAN mosaic rule (HEL_Mosaic.py) is written instead of the ExtractByMask clips and MosaicToNewRaster.
+# - DEMs are clipped by a bounded pool of worker processes (HEL_Tile_Clip.py); the optional 6th parameter
+#   sets the maximum number of workers (default: number of cores up to 4).
+# - The 410 meter CLU buffer is no longer built with Buffer.  The DEM library is queried with the
+#   buffered extent of the CLU vertices and every DEM is clipped to the buffer rasterized onto its own
+#   grid (HEL_Buffer.py) instead of ExtractByMask.
+# - The main body runs under if __name__ == '__main__' so that the clip workers, which import this
+#   script as __parents_main__ on Windows, do not run the tool again.
+# - The DEM library folder, virtual mosaic and clip worker parameters are not part of the Merge Local DEM
+#   Data tool of "-- NRCS HEL Determination.tbx"; in ArcMap the tool still takes CLU, DEMs (required) and the
+#   output only.  They are command line only ("#" skips an optional parameter; DEMs may be "#" when a DEM
+#   library folder is given):
+#     python Merge_Local_DEMs_by_CLU.py <CLU> <DEMs> # [DEM library folder] [virtual mosaic] [clip workers]
+# - The index of a read only DEM library folder is kept in a per-user folder (%LOCALAPPDATA%\HEL_DEM_Index).
+#   An index that cannot be written or read stops the tool with an error instead of reporting that no DEM
+#   tiles intersect the CLU fields.
+
 
 ## ===================================================================================
 def AddMsgAndPrint(msg, severity=0):
@@ -244,182 +267,373 @@ def setScratchWorkspace():
             errorMsg()
             return False
 
-## =============================================== Main Body ====================================================
+## ===================================================================================
+def describeDEM(raster):
+    # This function describes the properties of a DEM that are needed to validate and mosaic it.
+    # It is also the describe function of the DEM library index (HEL_DEM_Index.py).
+    # returns a dictionary of properties or None if the raster cannot be described
 
-import arcpy, sys, os, traceback
-
-try:
-
-    source_clu = arcpy.GetParameter(0)
-    source_dems = arcpy.GetParameterAsText(1).split(";")
-
-    # Set environmental variables
-    arcpy.env.geographicTransformations = "WGS_1984_(ITRF00)_To_NAD_1983"
-    arcpy.env.resamplingMethod = "BILINEAR"
-    arcpy.env.pyramid = "PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP"
-    arcpy.env.outputCoordinateSystem = arcpy.Describe(source_clu).SpatialReference
-    arcpy.env.overwriteOutput = True
-
-    # Check out Spatial Analyst License
-    if arcpy.CheckExtension("Spatial") == "Available":
-        arcpy.CheckOutExtension("Spatial")
-    else:
-        arcpy.AddError("Spatial Analyst Extension not enabled. Please enable Spatial analyst from the Tools/Extensions menu... Exiting!\n")
-        sys.exit()
-
-    # Make sure at least 2 datasets to be merged were entered
-    datasets = len(source_dems)
-    if datasets < 2:
-        arcpy.AddError("\nOnly one input DEM layer selected. If you need multiple layers, please run again and select multiple DEM files... Exiting!\n")
-        sys.exit()
-
-    # define and set the scratch workspace
-    scratchWS = os.path.dirname(sys.argv[0]) + os.sep + r'scratch.gdb'
-    if not arcpy.Exists(scratchWS):
-       scratchWS = setScratchWorkspace()
-
-    if not scratchWS:
-        AddMsgAndPrint("\Could Not set scratchWorkspace!")
-        sys.exit()
-
-    arcpy.env.scratchWorkspace = scratchWS
-    arcpy.env.workspace = scratchWS
-
-    temp_dem = arcpy.CreateScratchName("temp_dem",data_type="RasterDataset",workspace=scratchWS)
-    merged_dem = arcpy.CreateScratchName("merged_dem",data_type="RasterDataset",workspace=scratchWS)
-    clu_selected = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("clu_selected",data_type="FeatureClass",workspace=scratchWS))
-    clu_buffer = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("clu_buffer",data_type="FeatureClass",workspace=scratchWS))
-
-    # Make sure CLU fields are selected
-    cluDesc = arcpy.Describe(source_clu)
-    if cluDesc.FIDset == '':
-        AddMsgAndPrint("\nPlease select fields from the CLU Layer. Exiting!",2)
-        sys.exit()
-    else:
-        source_clu = arcpy.CopyFeatures_management(source_clu,clu_selected)
-
-    AddMsgAndPrint("\nNumber of CLU fields selected: {}".format(len(cluDesc.FIDset.split(";"))))
-
-    # Dictionary for code values returned by the getRasterProperties tool (keys)
-    # Values represent the pixel_type inputs for the mosaic to new raster tool
-    pixelTypeDict = {0:'1_BIT',1:'2_BIT',2:'4_BIT',3:'8_BIT_UNSIGNED',4:'8_BIT_SIGNED',5:'16_BIT_UNSIGNED',
-                    6:'16_BIT_SIGNED',7:'32_BIT_UNSIGNED',8:'32_BIT_SIGNED',9:'32_BIT_FLOAT',10:'64_BIT'}
-
-    x = 0
-    numOfBands = ""
-    pixelType = ""
-
-    # --------------------------------------------------------------------------------------- Evaluate every input raster to be merged
-    AddMsgAndPrint("\nChecking " + str(datasets) + " input raster layers")
-    while x < datasets:
-        raster = source_dems[x].replace("'", "")
+    try:
         desc = arcpy.Describe(raster)
         sr = desc.SpatialReference
-        units = sr.LinearUnitName
-        bandCount = desc.bandCount
 
-        # Check for Projected Coordinate System
-        if sr.Type != "Projected":
-            arcpy.addError("\nThe " + str(raster) + " input must have a projected coordinate system... Exiting!\n")
-            sys.exit()
+        # This is the 'VALUETYPE' code returned by the getRasterProperty tool
+        cellValueCode = int(arcpy.GetRasterProperties_management(raster,"VALUETYPE").getOutput(0))
+
+        return {'extent':[desc.extent.XMin,desc.extent.YMin,desc.extent.XMax,desc.extent.YMax],
+                'spatialReference':sr.exportToString(),'srType':sr.Type,'linearUnits':sr.LinearUnitName,
+                'cellSize':desc.MeanCellWidth,'pixelType':pixelTypeDict[cellValueCode],'bandCount':desc.bandCount}
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def cluBuffer(aoi,srString,distance=410):
+    # This function returns the AOI polygons projected to a spatial reference along with the buffer
+    # distance (meters) in the units of that spatial reference.  This is the buffer that DEMs are
+    # clipped to (clipToBuffer in HEL_Tile_Clip.py); the buffer polygon itself is never built.
+    # returns a list of polygons (lists of rings of (x,y) vertices) and the buffer distance
+
+    try:
+        sr = arcpy.SpatialReference()
+        sr.loadFromString(srString)
+        aoiSR = arcpy.Describe(aoi).spatialReference
+
+        polygons = list()
+        with arcpy.da.SearchCursor(aoi,["SHAPE@"]) as cursor:
+            for row in cursor:
+                shape = row[0]
+                if shape is None:
+                    continue
+                if sr.name != aoiSR.name:
+                    if sr.GCS.name != aoiSR.GCS.name:
+                        shape = shape.projectAs(sr,"WGS_1984_(ITRF00)_To_NAD_1983")
+                    else:
+                        shape = shape.projectAs(sr)
+
+                # Interior rings are separated by a None point
+                rings = list()
+                for part in shape:
+                    ring = list()
+                    for pnt in part:
+                        if pnt is None:
+                            rings.append(ring)
+                            ring = list()
+                        else:
+                            ring.append((pnt.X,pnt.Y))
+                    rings.append(ring)
+                polygons.append(rings)
+
+        return polygons,distance / sr.metersPerUnit
+
+    except:
+        errorMsg()
+        return None,None
+
+## ===================================================================================
+def queryDEMLibrary(demLibrary,aoi):
+    # This function brings the index of a DEM library folder up to date (HEL_DEM_Index.py) and
+    # returns the DEM tiles that intersect the 410 meter buffer of the AOI.  The buffered extent
+    # of the AOI vertices is computed in the spatial reference of every group of tiles in the
+    # library before querying.
+    # returns a list of (DEM path, DEM properties) or None if the library could not be indexed
+
+    try:
+        AddMsgAndPrint("\nUpdating DEM library index: " + demLibrary)
+
+        def progress(n,total,path):
+            arcpy.SetProgressorLabel("Indexing " + os.path.basename(path) + " " + str(n) + " of " + str(total))
+
+        try:
+            tiles,described,removed = HEL_DEM_Index.updateIndex(demLibrary,describeDEM,progress)
+        except EnvironmentError as e:
+            AddMsgAndPrint("\n\tThe DEM library index could not be updated: " + str(e),2)
+            return None
+
+        AddMsgAndPrint("\t" + str(len(tiles)) + " DEM tiles indexed; " + str(described) + " new or changed, " + str(removed) + " removed")
+        AddMsgAndPrint("\tIndex: " + str(HEL_DEM_Index.indexLocation(demLibrary)))
+
+        grid = HEL_DEM_Index.GridIndex(tiles)
+
+        demTiles = list()
+        for srString in grid.spatialReferences():
+            polygons,distance = cluBuffer(aoi,srString)
+            xs = [x for rings in polygons for ring in rings for x,y in ring]
+            ys = [y for rings in polygons for ring in rings for x,y in ring]
+
+            for relPath in grid.query(srString,HEL_Buffer.bufferedExtent(xs,ys,distance)):
+                demTiles.append((os.path.join(demLibrary,relPath),tiles[relPath]))
+
+        AddMsgAndPrint("\t" + str(len(demTiles)) + " DEM tiles intersect the buffered CLU fields")
+        return demTiles
+
+    except:
+        errorMsg()
+        return None
+
+## ===================================================================================
+def validateDEMs(demProperties):
+    # This function checks that every DEM to be merged is in a projected coordinate system in
+    # feet or meters, has a cell size of 3 meters or less and that all of them share the same
+    # pixel type and band count.
+    # returns the pixel type and number of bands or False,False
+
+    try:
+        numOfBands = ""
+        pixelType = ""
+
+        for raster,properties in demProperties:
+            if properties is None:
+                AddMsgAndPrint("\nCould not describe " + str(raster) + "... Exiting!\n",2)
+                return False,False
+
+            units = properties['linearUnits']
+
+            # Check for Projected Coordinate System
+            if properties['srType'] != "Projected":
+                AddMsgAndPrint("\nThe " + str(raster) + " input must have a projected coordinate system... Exiting!\n",2)
+                return False,False
+
+            # Check for linear Units
+            if units == "Meter":
+                tolerance = 3
+            elif units == "Foot":
+                tolerance = 9.84252
+            elif units == "Foot_US":
+                tolerance = 9.84252
+            else:
+                AddMsgAndPrint("\nHorizontal units of " + os.path.basename(str(raster)) + " must be in feet or meters... Exiting!\n",2)
+                return False,False
 
-        # Check for linear Units
-        if units == "Meter":
-            tolerance = 3
-        elif units == "Foot":
-            tolerance = 9.84252
-        elif units == "Foot_US":
-            tolerance = 9.84252
+            # Check for cell size; Reject if greater than 3m
+            if properties['cellSize'] > tolerance:
+                AddMsgAndPrint("\nThe cell size of the " + str(raster) + " input exceeds 3 meters or 9.84252 feet which cannot be used in the NRCS HEL Determination Tool... Exiting!\n",2)
+                return False,False
+
+            # Check for consistent bit depth
+            bitDepth = properties['pixelType']
+
+            if pixelType == "":
+                pixelType = bitDepth
+            else:
+                if pixelType != bitDepth:
+                    AddMsgAndPrint("\nCannot Mosaic different pixel types: " + bitDepth + " & " + pixelType,2)
+                    AddMsgAndPrint("Pixel Types must be the same for all input rasters",2)
+                    AddMsgAndPrint("Contact your state GIS Coordinator to resolve this issue",2)
+                    return False,False
+
+            # Check for consistent band count --- highly unlikely more than 1 band is input
+            bandCount = properties['bandCount']
+            if numOfBands == "":
+               numOfBands = bandCount
+            else:
+                if numOfBands != bandCount:
+                    AddMsgAndPrint("\nCannot mosaic rasters with multiple raster bands: " + str(numOfBands) + " & " + str(bandCount),2)
+                    AddMsgAndPrint("Number of bands must be the same for all input rasters",2)
+                    AddMsgAndPrint("Contact your state GIS Coordinator to resolve this issue",2)
+                    return False,False
+
+        return pixelType,numOfBands
+
+    except:
+        errorMsg()
+        return False,False
+
+## =============================================== Main Body ====================================================
+
+import arcpy, sys, os, traceback, multiprocessing
+import HEL_DEM_Index, HEL_Mosaic, HEL_Tile_Clip, HEL_Buffer
+
+if __name__ == '__main__':
+
+    try:
+
+        source_clu = arcpy.GetParameter(0)
+        source_dems = [dem for dem in arcpy.GetParameterAsText(1).split(";") if dem and dem != "#"]
+
+        # Optional DEM library folder; replaces the hand picked DEMs
+        demLibrary = arcpy.GetParameterAsText(3) if len(sys.argv) > 4 else ""
+        demLibrary = "" if demLibrary == "#" else demLibrary
+
+        # Optional virtual mosaic descriptor (HEL_Mosaic.py) written instead of clipping and merging the DEMs
+        virtualMosaic = arcpy.GetParameterAsText(4) if len(sys.argv) > 5 else ""
+        virtualMosaic = "" if virtualMosaic == "#" else virtualMosaic
+
+        # Maximum number of processes that clip DEMs at the same time (HEL_Tile_Clip.py).  Every worker
+        # holds one DEM clip in memory; lower this on small VDI machines.  1 clips the DEMs one at a time.
+        clipWorkers = int(arcpy.GetParameterAsText(5)) if len(sys.argv) > 6 and arcpy.GetParameterAsText(5) not in ("","#") else min(multiprocessing.cpu_count(),4)
+
+        # Set environmental variables
+        arcpy.env.geographicTransformations = "WGS_1984_(ITRF00)_To_NAD_1983"
+        arcpy.env.resamplingMethod = "BILINEAR"
+        arcpy.env.pyramid = "PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP"
+        arcpy.env.outputCoordinateSystem = arcpy.Describe(source_clu).SpatialReference
+        arcpy.env.overwriteOutput = True
+
+        # Check out Spatial Analyst License
+        if arcpy.CheckExtension("Spatial") == "Available":
+            arcpy.CheckOutExtension("Spatial")
         else:
-            AddMsgAndPrint("\nHorizontal units of " + str(desc.baseName) + " must be in feet or meters... Exiting!\n")
+            arcpy.AddError("Spatial Analyst Extension not enabled. Please enable Spatial analyst from the Tools/Extensions menu... Exiting!\n")
             sys.exit()
 
-        # Check for cell size; Reject if greater than 3m
-        if desc.MeanCellWidth > tolerance:
-            arcpy.AddError("\nThe cell size of the " + str(raster) + " input exceeds 3 meters or 9.84252 feet which cannot be used in the NRCS HEL Determination Tool... Exiting!\n")
+        # Make sure at least 2 datasets to be merged were entered
+        datasets = len(source_dems)
+        if not demLibrary and datasets < 2:
+            arcpy.AddError("\nOnly one input DEM layer selected. If you need multiple layers, please run again and select multiple DEM files... Exiting!\n")
             sys.exit()
 
-        # Check for consistent bit depth
-        cellValueCode =  int(arcpy.GetRasterProperties_management(raster,"VALUETYPE").getOutput(0))  # This is the 'VALUETYPE' code returned by the getRasterProperty tool
-        bitDepth = pixelTypeDict[cellValueCode]  # Convert the code to pixel depth using dictionary
+        # define and set the scratch workspace
+        scratchWS = os.path.dirname(sys.argv[0]) + os.sep + r'scratch.gdb'
+        if not arcpy.Exists(scratchWS):
+           scratchWS = setScratchWorkspace()
 
-        if pixelType == "":
-            pixelType = bitDepth
-        else:
-            if pixelType != bitDepth:
-                AddMsgAndPrint("\nCannot Mosaic different pixel types: " + bitDepth + " & " + pixelType,2)
-                AddMsgAndPrint("Pixel Types must be the same for all input rasters",2)
-                AddMsgAndPrint("Contact your state GIS Coordinator to resolve this issue",2)
-                sys.exit()
+        if not scratchWS:
+            AddMsgAndPrint("\Could Not set scratchWorkspace!")
+            sys.exit()
 
-        # Check for consistent band count --- highly unlikely more than 1 band is input
-        if numOfBands == "":
-           numOfBands = bandCount
-        else:
-            if numOfBands != bandCount:
-                AddMsgAndPrint("\nCannot mosaic rasters with multiple raster bands: " + str(numOfBands) + " & " + str(bandCount),2)
-                AddMsgAndPrint("Number of bands must be the same for all input rasters",2)
-                AddMsgAndPrint("Contact your state GIS Coordinator to resolve this issue",2)
-                sys.exit()
-        x += 1
+        arcpy.env.scratchWorkspace = scratchWS
+        arcpy.env.workspace = scratchWS
 
-    # --------------------------------------------------------------------------------------------------------- Buffer the selected CLUs by 400m
-    arcpy.AddMessage("\nBuffering input CLU fields")
-    # Use 410 meter radius so that you have a bit of extra area for the HEL Determination tool to clip against
-    # This distance is designed to minimize problems of no data crashes if the HEL Determiation tool's resampled 3-meter DEM doesn't perfectly snap with results from this tool.
-    arcpy.Buffer_analysis(source_clu, clu_buffer, "410 Meters", "FULL", "", "ALL", "")
+        temp_dem = arcpy.CreateScratchName("temp_dem",data_type="RasterDataset",workspace=scratchWS)
+        merged_dem = arcpy.CreateScratchName("merged_dem",data_type="RasterDataset",workspace=scratchWS)
+        clu_selected = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("clu_selected",data_type="FeatureClass",workspace=scratchWS))
 
-    # --------------------------------------------------------------------------------------------------------- Clip out the DEMs that were entered
-    arcpy.AddMessage("\nClipping Raster Layers...")
-    x = 0
-    del_list = [] # Start an empty list that will be used to clean up the temporary clips after merge is done
-    mergeRasters = ""
+        # Make sure CLU fields are selected
+        cluDesc = arcpy.Describe(source_clu)
+        if cluDesc.FIDset == '':
+            AddMsgAndPrint("\nPlease select fields from the CLU Layer. Exiting!",2)
+            sys.exit()
+        else:
+            source_clu = arcpy.CopyFeatures_management(source_clu,clu_selected)
 
+        AddMsgAndPrint("\nNumber of CLU fields selected: {}".format(len(cluDesc.FIDset.split(";"))))
 
-    while x < datasets:
-        current_dem = source_dems[x].replace("'", "")
-        out_clip = temp_dem + "_" + str(x)
+        # Dictionary for code values returned by the getRasterProperties tool (keys)
+        # Values represent the pixel_type inputs for the mosaic to new raster tool
+        pixelTypeDict = {0:'1_BIT',1:'2_BIT',2:'4_BIT',3:'8_BIT_UNSIGNED',4:'8_BIT_SIGNED',5:'16_BIT_UNSIGNED',
+                        6:'16_BIT_SIGNED',7:'32_BIT_UNSIGNED',8:'32_BIT_SIGNED',9:'32_BIT_FLOAT',10:'64_BIT'}
 
-        arcpy.SetProgressorLabel("Clipping " + current_dem + " " + str(x+1) + " of " + str(datasets))
+        # The DEMs are clipped to the selected CLUs buffered by 410 meters (cluBuffer)
+        # Use 410 meter radius so that you have a bit of extra area for the HEL Determination tool to clip against
+        # This distance is designed to minimize problems of no data crashes if the HEL Determiation tool's resampled 3-meter DEM doesn't perfectly snap with results from this tool.
 
-        try:
-            AddMsgAndPrint("\tClipping " + current_dem + " " + str(x+1) + " of " + str(datasets))
-            extractedDEM = arcpy.sa.ExtractByMask(current_dem, clu_buffer)
-            extractedDEM.save(out_clip)
-        except:
-            arcpy.AddError("\nThe input CLU fields may not cover the input DEM files. Clip & Merge failed...Exiting!\n")
+        # --------------------------------------------------------------------------------------- Evaluate every input raster to be merged
+        if demLibrary:
+            demProperties = queryDEMLibrary(demLibrary,clu_selected)
+            if demProperties is None:
+                sys.exit()
+            if not demProperties:
+                AddMsgAndPrint("\nNo DEM tiles from " + demLibrary + " intersect the selected CLU fields... Exiting!\n",2)
+                sys.exit()
+            source_dems = [dem for dem,properties in demProperties]
+            datasets = len(source_dems)
+        else:
+            AddMsgAndPrint("\nChecking " + str(datasets) + " input raster layers")
+            demProperties = [(raster,describeDEM(raster.replace("'", ""))) for raster in source_dems]
+
+        pixelType,numOfBands = validateDEMs(demProperties)
+        if not pixelType:
             sys.exit()
 
-        # Create merge statement
-        if x == 0:
-            # Start list of layers to merge
-            mergeRasters = "" + str(out_clip) + ""
+        # --------------------------------------------------------------------------------------------------------- Write a virtual mosaic of the DEMs
+        if virtualMosaic:
+            srStrings = set([properties['spatialReference'] for dem,properties in demProperties])
+            cellSizes = set([round(properties['cellSize'],6) for dem,properties in demProperties])
+            if len(srStrings) > 1 or len(cellSizes) > 1:
+                AddMsgAndPrint("\nA virtual mosaic requires all DEMs to share the same coordinate system and cell size",2)
+                AddMsgAndPrint("Run the tool without a virtual mosaic output to resample and merge them... Exiting!\n",2)
+                sys.exit()
+
+            arcpy.AddMessage("\nWriting virtual mosaic of " + str(datasets) + " DEMs...")
+            properties = demProperties[0][1]
+            descriptorPath = HEL_Mosaic.writeDescriptor(virtualMosaic,[(dem.replace("'", ""),properties['extent']) for dem,properties in demProperties],
+                                                        properties['spatialReference'],properties['linearUnits'],properties['cellSize'],"MEAN")
+
+            AddMsgAndPrint("\tVirtual mosaic: " + descriptorPath)
+            AddMsgAndPrint("\tUse it as the DEM of the NRCS HEL Determination tool; overlaps are resolved with MEAN when it is read\n")
+
         else:
-            # Append to list
-            mergeRasters = mergeRasters + ";" + str(out_clip)
+            # --------------------------------------------------------------------------------------------------------- Clip out the DEMs that were entered
+            arcpy.AddMessage("\nClipping Raster Layers...")
+            x = 0
+            del_list = [] # Start an empty list that will be used to clean up the temporary clips after merge is done
+            mergeRasters = ""
+
+            # CLU polygons and buffer distance in the coordinate system of every DEM
+            cluBuffers = dict()
+            for dem,properties in demProperties:
+                if properties['spatialReference'] not in cluBuffers:
+                    cluBuffers[properties['spatialReference']] = cluBuffer(clu_selected,properties['spatialReference'])
+            demBuffers = [cluBuffers[properties['spatialReference']] for dem,properties in demProperties]
+
+            # Clip the tiles over a pool of worker processes; every worker writes to its own scratch geodatabase
+            if clipWorkers > 1 and datasets > 1:
+                workers = min(clipWorkers,datasets)
+                AddMsgAndPrint("\tClipping " + str(datasets) + " DEMs with " + str(workers) + " worker processes")
+
+                def progress(n,total,dem):
+                    arcpy.SetProgressorLabel("Clipped " + str(n) + " of " + str(total) + " DEMs")
+                    AddMsgAndPrint("\tClipped " + dem + " " + str(n) + " of " + str(total))
+
+                clipResults,workerGDBs = HEL_Tile_Clip.clipTiles([dem.replace("'", "") for dem in source_dems],demBuffers,os.path.dirname(scratchWS),
+                                                                 arcpy.env.outputCoordinateSystem.exportToString(),workers,progress)
+
+                # Results are in input order for the mosaic
+                for out_clip,message in clipResults:
+                    if not out_clip:
+                        AddMsgAndPrint("\n" + message,2)
+                        arcpy.AddError("\nThe input CLU fields may not cover the input DEM files. Clip & Merge failed...Exiting!\n")
+                        sys.exit()
+
+                mergeRasters = ";".join([out_clip for out_clip,message in clipResults])
+                del_list.extend(workerGDBs)
+                x = datasets
+
+            while x < datasets:
+                current_dem = source_dems[x].replace("'", "")
+                out_clip = temp_dem + "_" + str(x)
+
+                arcpy.SetProgressorLabel("Clipping " + current_dem + " " + str(x+1) + " of " + str(datasets))
+
+                try:
+                    AddMsgAndPrint("\tClipping " + current_dem + " " + str(x+1) + " of " + str(datasets))
+                    polygons,distance = demBuffers[x]
+                    HEL_Tile_Clip.clipToBuffer(current_dem,polygons,distance,out_clip)
+                except:
+                    arcpy.AddError("\nThe input CLU fields may not cover the input DEM files. Clip & Merge failed...Exiting!\n")
+                    sys.exit()
+
+                # Create merge statement
+                if x == 0:
+                    # Start list of layers to merge
+                    mergeRasters = "" + str(out_clip) + ""
+                else:
+                    # Append to list
+                    mergeRasters = mergeRasters + ";" + str(out_clip)
 
-        # Append name of temporary output to the list of temp soil layers to be deleted
-        del_list.append(str(out_clip))
-        x += 1
+                # Append name of temporary output to the list of temp soil layers to be deleted
+                del_list.append(str(out_clip))
+                x += 1
 
-    # --------------------------------------------------------------------------------------------------------- Merge Clipped Datasets
-    arcpy.AddMessage("\nMerging inputs...")
+            # --------------------------------------------------------------------------------------------------------- Merge Clipped Datasets
+            arcpy.AddMessage("\nMerging inputs...")
 
-    if arcpy.Exists(merged_dem):
-        arcpy.Delete_management(merged_dem)
+            if arcpy.Exists(merged_dem):
+                arcpy.Delete_management(merged_dem)
 
-    cellsize = 3
-    arcpy.MosaicToNewRaster_management(mergeRasters, scratchWS, os.path.basename(merged_dem), "#", pixelType, cellsize, numOfBands, "MEAN", "#")
+            cellsize = 3
+            arcpy.MosaicToNewRaster_management(mergeRasters, scratchWS, os.path.basename(merged_dem), "#", pixelType, cellsize, numOfBands, "MEAN", "#")
 
-    # Clean-up
-    #arcpy.AddMessage("\nCleaning up...")
-    for lyr in del_list:
-        arcpy.Delete_management(lyr)
-    arcpy.Delete_management(clu_buffer)
+            # Clean-up
+            #arcpy.AddMessage("\nCleaning up...")
+            for lyr in del_list:
+                arcpy.Delete_management(lyr)
 
-    # Add resulting data to map
-    arcpy.AddMessage("\nAdding " + os.path.basename(merged_dem) + " to ArcMap session\n")
-    arcpy.SetParameterAsText(2, merged_dem)
+            # Add resulting data to map
+            arcpy.AddMessage("\nAdding " + os.path.basename(merged_dem) + " to ArcMap session\n")
+            arcpy.SetParameterAsText(2, merged_dem)
 
-except:
-    errorMsg()
+    except:
+        errorMsg()
@@ -291,6 +291,89 @@
 # -Fixed a crash in the extractDEMfromImageService function related to variables and returns.
 #  The direct use of NRCS Web Service DEMs is working again without need for the download utility.
 
+# Updated 10/18/2026
+# - Added an optional NumPy terrain engine (HEL_Terrain.py) for the Fill -> Focal Statistics MEAN
+#   -> Slope PERCENT_RISE chain.  Set bNumpyEngine to True to use it.  The DEM is converted to an
+#   array once and the results stay arrays.  The same zLimit
+#   and zFactor rules are used.
+# - The NumPy engine also replaces FlowDirection (FORCE), FlowLength (UPSTREAM) and the 3x3 MAXIMUM
+#   on flow length (HEL_Flow.py).
+# - The LS, EI and HEL factors are only evaluated on PHEL cells.  The K, T, R and HEL Value rasters
+#   are created first and used as a PHEL mask (arcpy.env.mask for Spatial Analyst, HEL_Factors.py
+#   for the NumPy engine).  With the NumPy engine slope and flow length stay arrays and only the
+#   LiDAR HEL raster is written out.
+# - The 4 FeatureToRaster calls for K, T, R and HEL Value were replaced by rasterizeZones.  The Final
+#   HEL Summary polygons are burned once into a zone grid of ObjectIDs aligned to the DEM and the
+#   attribute bands are derived by lookup (HEL_Rasterize.py).
+# - TabulateArea, JoinField and the VALUE_1/VALUE_2 CalculateField workaround were replaced by a
+#   bincount of the LiDAR HEL values over the zone grid.  HEL areas are written straight into the
+#   Final HEL Summary update cursor.
+# - bSkipGeoprocessing is no longer all or nothing.  The fields that are neither HEL >= 33.33% or
+#   NHEL > 66.67% are tracked in lidarCLUs and only those fields are buffered for the DEM extraction
+#   (demAOI) and rasterized.  The other fields keep their original rating from ogCLUinfoDict.
+# - Added a batch mode for HEL_Batch.py.  Two optional command line parameters (CLU where clause
+#   and output folder) select the CLU fields by attribute and write the outputs and text file to a
+#   copy of HEL.mdb in the output folder.  No map document is used, Microsoft Access is not closed
+#   and the 026 form is not opened in batch mode.
+# - Batch mode uses its own scratch.gdb in the output folder so that HEL_Batch.py can run
+#   several tracts at the same time.
+# - Added a content addressed result cache (HEL_Result_Cache.py).  The key is a hash of the selected
+#   CLU geometries, the HEL soil layer and DEM source with a fingerprint of their data, zUnits and
+#   use_runoff_ls.  A hit copies the cached outputs into HEL.mdb and only repopulates the 026 form.
+#   The cache is bounded by cacheMaxMB with LRU eviction and entries are invalidated when the soil or
+#   DEM data behind a request changes.
+# - DEMs from a WGS84 image service are assembled from a persistent on-disk tile cache
+#   (HEL_DEM_Tile_Cache.py).  Tiles are 3 meter cells in the CLU coordinate system; only missing tiles
+#   are clipped and projected from the service.  Set bDEMTileCache to False to clip the whole area.
+# - Image services reached by URL are downloaded in tiles by a pool of concurrent connections with retry
+#   and backoff (HEL_DEM_Service.py) and stitched in memory instead of one blocking Clip request.
+# - The buffered window of a local DEM is read straight from the file (HEL_DEM_Reader.py): a memory mapped
+#   view of uncompressed GeoTIFFs, block reads otherwise, instead of a Clip copy into in_memory.
+# - DEMs finer than 3 meters in the CLU coordinate system are resampled from the source window straight to a
+#   3 meter bilinear grid aligned to 0,0 (HEL_Resample.py) instead of Clip followed by ProjectRaster.
+# - The DEM can be a virtual mosaic (*.vmosaic.json) written by Merge Local DEMs by CLU (HEL_Mosaic.py).  The
+#   buffered window is read from the overlapping tiles and overlaps are resolved with MEAN at read time.
+# - The 410 meter buffered extent used to extract the DEM is computed from the CLU vertices (HEL_Buffer.py)
+#   instead of running Buffer (and Project for image services) just to read the extent of the buffer.
+# - The DEM can be the pre-resampled 3 meter DEM store of a county (HEL_DEM_Store.vmosaic.json written by
+#   HEL_Build_DEM_Store.py).  Its tiles are on the same 3 meter grid so the DEM is read without resampling.
+# - The DEM can be a folder of classified LAS files (HEL_LAS.py).  The ground returns inside the 410 meter
+#   buffer are streamed in chunks and binned into the 3 meter DEM; small gaps are filled.
+# - The Focal Mean + Slope, Focal Maximum and HEL factor stages of the NumPy engine run block by block with
+#   a halo (HEL_Tiles.py) so their temporaries stay within tileMemoryMB regardless of the tract size.
+# - The blocks of those stages run over tileWorkers processes on shared memory; results are the same as
+#   one process.  Run 'python HEL_Tiles.py benchmark' to see how they scale on a machine.
+# - Compact storage of the intermediates (HEL_Compact.py): the NumPy engine keeps the DEM, slope, flow length and
+#   K, R, T grids as float32, flow direction as uint8 and the Og_HELcode classes packed 2 bits per cell.  Every
+#   intermediate, array or Spatial Analyst raster, is freed as soon as its last consumer has run
+#   (freeScratchLayers) instead of at the end of the tool.
+# - The S, L, LS, EI and HEL factor chain of the NumPy engine is evaluated in one pass over cache sized chunks of
+#   PHEL cells (HEL_Factors.evaluateChunk) for both the AH537 and the runoff LS equations; the results are the same.
+# - The S factor and the slope term of the runoff LS equation of the NumPy engine are interpolated from lookup tables
+#   over percent slope instead of evaluating ATan, Sin, Cos and Power on every cell; the relative error of S is below
+#   1e-6 and the absolute error of the runoff term below 5e-6 (python HEL_Factors.py checks both).
+# - The result cache key includes every CLU attribute copied into the outputs, the member tiles of a virtual
+#   mosaic and the version of an image service (demServiceVersion and its service description).
+# - A virtual mosaic (*.vmosaic.json), the 3 meter DEM store (HEL_DEM_Store.vmosaic.json) and a folder of LAS files
+#   are batch only DEM inputs (HEL_Batch.py or the command line).  The Input DEM parameter of the tool dialog in
+#   "-- NRCS HEL Determination.tbx" is a raster layer and does not accept a file or a folder.
+# - The Spatial Analyst chain is snapped to the DEM and limited to its extent and cell size.  The LiDAR HEL raster is
+#   checked against the DEM grid of the zone grid before the tabulation and read on the DEM grid if it differs.
+# - Final HEL Summary polygons of fields that did not need LiDAR are rated HEL (100%) or NHEL (0%) from their initial
+#   HEL value, the same way as Final_HEL_Acres, instead of copying PHEL or NA into Final_HEL_Value.
+# - DEM tiles are keyed by the version of the image service, tiles with NoData are not cached and the DEM tile
+#   cache is evicted periodically instead of after every extraction (HEL_DEM_Tile_Cache.py).
+# - GeoTIFF DEMs read by HEL_DEM_Reader.py without the GDAL_NODATA tag take their NoData value from Describe and
+#   the DEM window is always written with a NoData value.
+# - The windowed read of other local DEMs reads integer DEMs with their own NoData value (as rasterToArray does)
+#   and returns no window without an error when the extent misses the DEM.
+# - The local DEM window reader is HEL_DEM_Reader.readRasterWindow, shared with HEL_Build_DEM_Store.py.  A DEM store
+#   in a foot coordinate system is on the 3 unit grid extractDEM resamples to and is read without resampling.
+# - The result cache key includes the engine settings (bNumpyEngine, bWindowedDEMRead, bServiceTiles, bDEMTileCache,
+#   lasMaxGap) and soil or DEM layers that are not stored in files on disk (enterprise geodatabase) are not cached.
+#   Cache entries are written to a temporary geodatabase and renamed into place under the cache lock, and they are
+#   restored under the same lock.
+
 #-------------------------------------------------------------------------------
 
 ## ===================================================================================
@@ -377,8 +460,11 @@ def createTextFile(Tract,Farm,cluList):
         text file.  The function will return the full path to the text file."""
 
     try:
-        # Set log file
-        helTextNotesDir = os.path.dirname(sys.argv[0]) + os.sep + 'HEL_Text_Files'
+        # Set log file; batch mode logs to the output folder
+        if bBatchMode and outputFolder:
+            helTextNotesDir = outputFolder
+        else:
+            helTextNotesDir = os.path.dirname(sys.argv[0]) + os.sep + 'HEL_Text_Files'
         if not os.path.isdir(helTextNotesDir):
            os.makedirs(helTextNotesDir)
 
@@ -687,10 +773,75 @@ def getDatum(layer):
         errorMsg()
         return False
 
+## ================================================================================================================
+def bufferedAOIExtent(aoi,distance=410,outputSR=None):
+    # This function returns the extent of the AOI polygons buffered by distance (meters) without
+    # running Buffer.  The extent of a round buffer is the extent of the polygon vertices grown by
+    # the buffer distance (HEL_Buffer.py).  When outputSR is given, a densified outline of the
+    # buffered extent is projected to it (i.e. WGS84 to clip an image service).
+    # returns arcpy extent
+
+    try:
+        aoiSR = arcpy.Describe(aoi).spatialReference
+        vertices = arcpy.da.FeatureClassToNumPyArray(aoi,["SHAPE@X","SHAPE@Y"],explode_to_points=True)
+        extent = HEL_Buffer.bufferedExtent(vertices["SHAPE@X"],vertices["SHAPE@Y"],distance / aoiSR.metersPerUnit)
+
+        if outputSR is None or outputSR.name == aoiSR.name:
+            return arcpy.Extent(*extent)
+
+        outline = arcpy.Polygon(arcpy.Array([arcpy.Point(x,y) for x,y in HEL_Buffer.densifyExtent(extent)]),aoiSR)
+        if outputSR.GCS.name != aoiSR.GCS.name:
+            return outline.projectAs(outputSR,"WGS_1984_(ITRF00)_To_NAD_1983").extent
+        return outline.projectAs(outputSR).extent
+
+    except:
+        errorMsg()
+        return None
+
+## ================================================================================================================
+def clipImageService(demSource,clipExtent,scratchName):
+    # This function clips a WGS84 (xMin, yMin, xMax, yMax) extent from the elevation image service.
+    # Services that are reached by URL are downloaded in tiles over a pool of connections by
+    # HEL_DEM_Service.py and the tiles are stitched into the clip in memory; per tile latency and
+    # bytes transferred are reported.  Any other service, or a failed download, falls back to
+    # Clip_management.
+    # Returns the clipped DEM in WGS84
+
+    try:
+        demClip = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName(scratchName,data_type="RasterDataset",workspace=scratchWS))
+        desc = arcpy.Describe(demSource)
+        serviceURL = desc.catalogPath
+
+        if bServiceTiles and serviceURL.lower().startswith('http'):
+            try:
+                cellSize = (desc.meanCellWidth,desc.meanCellHeight)
+                origin = (desc.extent.XMin,desc.extent.YMax)
+                demArray,window,stats = HEL_DEM_Service.fetchExtent(serviceURL,clipExtent,cellSize,origin,4326,
+                                                                    serviceTileCells,serviceWorkers,serviceRetries)
+
+                latency = [tile['seconds'] for tile in stats['tiles']]
+                AddMsgAndPrint("\t\tDownloaded " + str(len(latency)) + " tiles (" + str(round(stats['bytes'] / 1048576.0,2)) + " MB) in " + str(round(stats['seconds'],1)) + " seconds over " + str(stats['connections']) + " connections")
+                AddMsgAndPrint("\t\tTile latency: mean " + str(round(sum(latency) / len(latency),2)) + " max " + str(round(max(latency),2)) + " seconds; " + str(sum([tile['attempts'] for tile in stats['tiles']]) - len(latency)) + " retries")
+
+                demRaster = arcpy.NumPyArrayToRaster(np.where(np.isnan(demArray),numpyNoData,demArray),arcpy.Point(window[0],window[1]),cellSize[0],cellSize[1],numpyNoData)
+                demRaster.save(demClip)
+                arcpy.DefineProjection_management(demClip,arcpy.SpatialReference(4326))
+                return demClip
+
+            except RuntimeError as e:
+                AddMsgAndPrint("\t\tTiled download failed (" + str(e) + "); clipping the service instead",1)
+
+        extentString = " ".join([str(v) for v in clipExtent])
+        arcpy.Clip_management(demSource, extentString, demClip, "", "", "", "NO_MAINTAIN_EXTENT")
+        return demClip
+
+    except:
+        errorMsg()
+
 ## ================================================================================================================
 def extractDEMfromImageService(demSource,zUnits):
     # This function will extract a DEM from a Web Image Service that is in WGS.  The
-    # CLU will be buffered to 410 meters and set to WGS84 GCS in order to clip the DEM.
+    # CLU fields that need LiDAR processing (demAOI) will be buffered to 410 meters and set to WGS84 GCS in order to clip the DEM.
     # The clipped DEM will then be projected to the same coordinate system as the CLU.
     # -- Eventually code will be added to determine the approximate cell size  of the
     #    image service using y-distances from the center of the cells.  Cell size from
@@ -701,6 +852,10 @@ def extractDEMfromImageService(demSource,zUnits):
     # Returns a clipped DEM and new Z-Factor
 
     try:
+        # Use the DEM tile cache instead of clipping the whole area from the service
+        if bDEMTileCache:
+            return extractDEMfromTileCache(demSource,zUnits)
+
         #startTime = tic()
         desc = arcpy.Describe(demSource)
         sr = desc.SpatialReference
@@ -715,19 +870,15 @@ def extractDEMfromImageService(demSource,zUnits):
         arcpy.env.geographicTransformations = "WGS_1984_(ITRF00)_To_NAD_1983"
         arcpy.env.outputCoordinateSystem = arcpy.SpatialReference(4326)
 
-        # Buffer CLU by 410 Meters. Output buffer will be in GCS
-        cluBuffer = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("cluBuffer_GCS",data_type="FeatureClass",workspace=scratchWS))
-        arcpy.Buffer_analysis(fieldDetermination, cluBuffer, "410 Meters", "FULL", "", "ALL", "")
-
+        # Extent of the CLU buffered by 410 Meters in GCS
         # Use the WGS 1984 AOI to clip/extract the DEM from the service
-        cluExtent = arcpy.Describe(cluBuffer).extent
-        clipExtent = str(cluExtent.XMin) + " " + str(cluExtent.YMin) + " " + str(cluExtent.XMax) + " " + str(cluExtent.YMax)
+        cluExtent = bufferedAOIExtent(demAOI,410,arcpy.SpatialReference(4326))
+        clipExtent = (cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax)
 
         arcpy.SetProgressorLabel("Downloading DEM from " + desc.baseName + " Image Service")
         AddMsgAndPrint("\n\tDownloading DEM from " + desc.baseName + " Image Service")
 
-        demClip = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demClipIS",data_type="RasterDataset",workspace=scratchWS))
-        arcpy.Clip_management(demSource, clipExtent, demClip, "", "", "", "NO_MAINTAIN_EXTENT")
+        demClip = clipImageService(demSource,clipExtent,"demClipIS")
 
         # Project DEM subset from WGS84 to CLU coord system
         outputCS = arcpy.Describe(cluLayer).SpatialReference
@@ -761,10 +912,284 @@ def extractDEMfromImageService(demSource,zUnits):
     except:
         errorMsg()
 
+## ================================================================================================================
+def fetchServiceTiles(demSource,requests):
+    # This function is the tile fetcher for the DEM tile cache (HEL_DEM_Tile_Cache.py).  The
+    # union of the missing tiles is clipped from the WGS84 image service and projected once to
+    # the CLU coordinate system at the tile resolution.  The projected raster is registered to
+    # 0,0 so that its cells line up with the tiles.
+    # returns a dictionary of tile -> float32 array with NaN as NoData
+
+    try:
+        outputCS = arcpy.Describe(cluLayer).SpatialReference
+        cellSize = requests[0]['cellSize']
+
+        # Union of the tiles padded by 2 cells for the bilinear resampling
+        pad = cellSize * 2
+        xMin = min([r['extent'][0] for r in requests]) - pad
+        yMin = min([r['extent'][1] for r in requests]) - pad
+        xMax = max([r['extent'][2] for r in requests]) + pad
+        yMax = max([r['extent'][3] for r in requests]) + pad
+
+        outline = arcpy.Array([arcpy.Point(x,y) for x,y in HEL_Buffer.densifyExtent((xMin,yMin,xMax,yMax))])
+        wgsExtent = arcpy.Polygon(outline,outputCS).projectAs(arcpy.SpatialReference(4326),"WGS_1984_(ITRF00)_To_NAD_1983").extent
+        demClip = clipImageService(demSource,(wgsExtent.XMin,wgsExtent.YMin,wgsExtent.XMax,wgsExtent.YMax),"demClipTiles")
+
+        demProject = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demProjectTiles",data_type="RasterDataset",workspace=scratchWS))
+        arcpy.ProjectRaster_management(demClip, demProject, outputCS, "BILINEAR", cellSize, "WGS_1984_(ITRF00)_To_NAD_1983", "0 0")
+        arcpy.Delete_management(demClip)
+
+        tiles = dict()
+        for request in requests:
+            lowerLeft = arcpy.Point(request['extent'][0],request['extent'][1])
+            tile = arcpy.RasterToNumPyArray(demProject,lowerLeft,request['cols'],request['rows'],numpyNoData).astype(np.float32)
+            tile[tile == np.float32(numpyNoData)] = np.nan
+            tiles[request['tile']] = tile
+
+        arcpy.Delete_management(demProject)
+        return tiles
+
+    except:
+        errorMsg()
+        return dict()
+
+## ================================================================================================================
+def extractDEMfromTileCache(demSource,zUnits):
+    # This function assembles the DEM of the CLU fields buffered to 410 meters from the DEM tile
+    # cache (HEL_DEM_Tile_Cache.py).  Only the tiles that are not cached yet are downloaded from the
+    # image service (fetchServiceTiles).  Tiles are 3 meter cells in the CLU coordinate system and
+    # are keyed by the version of the service (demServiceVersion and HEL_DEM_Service.serviceVersion).
+    # Returns linear units, Z-Factor and the DEM
+
+    try:
+        desc = arcpy.Describe(demSource)
+        outputCS = arcpy.Describe(cluLayer).SpatialReference
+        outputCellsize = 3
+
+        AddMsgAndPrint("\nInput DEM Image Service: " + desc.baseName)
+        AddMsgAndPrint("\tGeographic Coordinate System: " + desc.SpatialReference.Name)
+
+        # Extent of the CLU buffered by 410 Meters in the CLU coordinate system
+        arcpy.env.geographicTransformations = "WGS_1984_(ITRF00)_To_NAD_1983"
+        arcpy.env.outputCoordinateSystem = outputCS
+        cluExtent = bufferedAOIExtent(demAOI,410)
+
+        arcpy.SetProgressorLabel("Assembling DEM from the DEM tile cache")
+        AddMsgAndPrint("\n\tAssembling DEM from the DEM tile cache")
+
+        serviceVersion = demServiceVersion
+        if desc.catalogPath.lower().startswith('http'):
+            version = HEL_DEM_Service.serviceVersion(desc.catalogPath)
+            if version is None:
+                AddMsgAndPrint("\t\tThe version of the DEM image service could not be read; tiles are keyed by demServiceVersion only",1)
+            else:
+                serviceVersion = demServiceVersion + "|" + version
+
+        demArray,lowerLeft,stats = HEL_DEM_Tile_Cache.extractWindow(demCacheFolder,desc.catalogPath,outputCS.factoryCode or outputCS.name,
+                                                                    (cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax),
+                                                                    lambda requests: fetchServiceTiles(demSource,requests),
+                                                                    outputCellsize,maxBytes=demCacheMaxMB * 1048576,version=serviceVersion)
+
+        AddMsgAndPrint("\t\t" + str(stats['hits']) + " of " + str(stats['tiles']) + " tiles from the cache; " + str(stats['fetched']) + " downloaded")
+        if not np.isfinite(demArray).any():
+            AddMsgAndPrint("\n\tThe DEM tiles for this area do not have any data. Exiting!",2)
+            return False,False,False
+
+        demProject = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demProjectIS",data_type="RasterDataset",workspace=scratchWS))
+        arrayToRaster(demArray,arcpy.Point(lowerLeft[0],lowerLeft[1]),outputCellsize).save(demProject)
+        arcpy.DefineProjection_management(demProject,outputCS)
+        del demArray
+
+        # ------------------------------------------------------------------------------------ Report new DEM properties
+        newLinearUnits = outputCS.LinearUnitName
+
+        # if zUnits not populated assume it is the same as linearUnits
+        if not zUnits: zUnits = newLinearUnits
+        newZfactor = zFactorList[unitLookUpDict.get(newLinearUnits)][unitLookUpDict.get(zUnits)]
+
+        AddMsgAndPrint("\t\tNew Projection Name: " + outputCS.Name,0)
+        AddMsgAndPrint("\t\tLinear Units (XY): " + newLinearUnits)
+        AddMsgAndPrint("\t\tElevation Units (Z): " + zUnits)
+        AddMsgAndPrint("\t\tCell Size: " + str(outputCellsize) + " " + newLinearUnits )
+        AddMsgAndPrint("\t\tZ-Factor: " + str(newZfactor))
+
+        return newLinearUnits,newZfactor,demProject
+
+    except:
+        errorMsg()
+        return False,False,False
+
+## ================================================================================================================
+def readDEMWindow(inputDEM,clipExtent):
+    # This function reads the cells of a local DEM that overlap an (xMin, yMin, xMax, yMax) extent
+    # in the coordinate system of the DEM without copying the DEM with Clip (HEL_DEM_Reader.readRasterWindow,
+    # shared with HEL_Build_DEM_Store.py).  GeoTIFFs are read as a memory mapped view (uncompressed strips)
+    # or block by block (tiles, Deflate); every other format with a windowed RasterToNumPyArray.  Integer
+    # DEMs are read with their own NoData value (numpyNoData does not fit the pixel type) and returned as
+    # float32 with NaN as NoData.
+    # returns the window array, its lower left corner, cell size and NoData value (None when the
+    # NoData cells are NaN); None when the extent misses the DEM
+
+    try:
+        demPath = arcpy.Describe(inputDEM).catalogPath
+        window = HEL_DEM_Reader.readRasterWindow(demPath,clipExtent,numpyNoData)
+        if window is None:
+            return None,None,None,None
+
+        demArray,lowerLeft,cellSize,noData,mode = window
+        readModes = {'view':"from a memory mapped view",'blocks':"from file blocks",'arcpy':"with a windowed block read"}
+        AddMsgAndPrint("\t\tRead " + str(demArray.shape[0]) + " x " + str(demArray.shape[1]) + " cells " + readModes[mode])
+        return demArray,arcpy.Point(lowerLeft[0],lowerLeft[1]),cellSize[0],noData
+
+    except:
+        errorMsg()
+        return None,None,None,None
+
+## ================================================================================================================
+def extractDEMfromMosaic(mosaicPath,zUnits):
+    # This function reads the DEM of the CLU fields that need LiDAR processing (demAOI) buffered to
+    # 410 meters from a virtual mosaic written by Merge Local DEMs by CLU (HEL_Mosaic.py).  Only the
+    # tiles that overlap the buffer are read and overlapping cells are resolved with the mosaic rule.
+    # DEMs finer than 3 meters are resampled to a 3 meter grid aligned to 0,0 (HEL_Resample.py).
+    # The 3 meter DEM store (HEL_DEM_Store.py) is a virtual mosaic already on that grid, so its
+    # window is used as is.  The mosaic must share the coordinate system of the CLU.
+    # returns linear units, Z-Factor and the DEM
+
+    try:
+        mosaic = HEL_Mosaic.readDescriptor(mosaicPath)
+        sr = arcpy.SpatialReference()
+        sr.loadFromString(mosaic['spatialReference'])
+        outputCS = arcpy.Describe(cluLayer).SpatialReference
+
+        linearUnits = mosaic['linearUnits']
+        cellSize = mosaic['cellSize']
+        outputCellSize = 3
+
+        AddMsgAndPrint("\nInput DEM Virtual Mosaic: " + os.path.basename(mosaicPath))
+        AddMsgAndPrint("\tProjection Name: " + sr.Name)
+        AddMsgAndPrint("\tTiles: " + str(len(mosaic['tiles'])) + "; Mosaic Rule: " + mosaic.get('rule','MEAN'))
+        bStore = 'tileCells' in mosaic and cellSize == outputCellSize
+        if bStore:
+            AddMsgAndPrint("\tPre-resampled 3 meter DEM store; no resampling is needed")
+
+        if sr.Name != outputCS.Name:
+            AddMsgAndPrint("\n\tThe virtual mosaic must be in the same coordinate system as the CLU layer (" + outputCS.Name + ")... Exiting!",2)
+            return False,False,False
+
+        toleranceDict = {"Meter":3,"Foot":9.84252,"Foot_US":9.84252}
+        if not linearUnits in toleranceDict:
+            AddMsgAndPrint("\n\tHorizontal units of the virtual mosaic must be in feet or meters... Exiting!",2)
+            return False,False,False
+
+        if cellSize > toleranceDict[linearUnits]:
+            AddMsgAndPrint("\n\tThe cell size of the input DEM must be 3 Meters (9.84252 FT) or less to continue... Exiting!",2)
+            return False,False,False
+        bResample = cellSize < toleranceDict[linearUnits] and not bStore
+
+        # if zUnits not populated assume it is the same as linearUnits
+        if not zUnits: zUnits = linearUnits
+        zFactor = zFactorList[unitLookUpDict.get(linearUnits)][unitLookUpDict.get(zUnits)]
+
+        # Extent of the CLU buffered by 410 Meters
+        cluExtent = bufferedAOIExtent(demAOI,410)
+
+        def tileReader(path,extent):
+            demArray,lowerLeft,tileCellSize,noData = readDEMWindow(path,extent)
+            if demArray is None:
+                return None
+            return demArray,(lowerLeft.X,lowerLeft.Y),tileCellSize,noData
+
+        arcpy.SetProgressorLabel("Reading DEM from virtual mosaic")
+        AddMsgAndPrint("\n\tReading DEM from virtual mosaic")
+
+        pad = outputCellSize + cellSize if bResample else 0
+        demArray,lowerLeft,tilesRead = HEL_Mosaic.readWindow(mosaic,(cluExtent.XMin - pad,cluExtent.YMin - pad,cluExtent.XMax + pad,cluExtent.YMax + pad),tileReader)
+        AddMsgAndPrint("\t\t" + str(tilesRead) + " of " + str(len(mosaic['tiles'])) + " tiles overlap the buffered CLU fields")
+
+        if bResample:
+            AddMsgAndPrint("\n\tChanging resolution from " + str(cellSize) + " " + linearUnits + " to 3 Meters")
+            demArray,lowerLeft = HEL_Resample.bilinearResample(demArray,lowerLeft,cellSize,(cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax),
+                                                               outputCellSize,(0.0,0.0))
+            cellSize = outputCellSize
+
+        demExtract = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demMosaic",data_type="RasterDataset",workspace=scratchWS))
+        arrayToRaster(demArray,arcpy.Point(lowerLeft[0],lowerLeft[1]),cellSize).save(demExtract)
+        arcpy.DefineProjection_management(demExtract,sr)
+        del demArray
+
+        AddMsgAndPrint("\t\tLinear Units (XY): " + linearUnits)
+        AddMsgAndPrint("\t\tElevation Units (Z): " + zUnits)
+        AddMsgAndPrint("\t\tCell Size: " + str(cellSize) + " " + linearUnits)
+        AddMsgAndPrint("\t\tZ-Factor: " + str(zFactor))
+
+        return linearUnits,zFactor,demExtract
+
+    except:
+        errorMsg()
+        return False,False,False
+
+## ================================================================================================================
+def extractDEMfromLAS(lasFolder,zUnits):
+    # This function grids the ground returns (class 2) of a folder of LAS files inside the CLU
+    # fields that need LiDAR processing (demAOI) buffered to 410 meters into a 3 meter DEM aligned
+    # to 0,0 (HEL_LAS.py).  Points are read lasChunkPoints at a time and runs of up to lasMaxGap
+    # empty cells are filled.  The LAS files must be in the coordinate system of the CLU.
+    # returns linear units, Z-Factor and the DEM
+
+    try:
+        outputCS = arcpy.Describe(cluLayer).SpatialReference
+        linearUnits = outputCS.LinearUnitName
+        lasFiles = HEL_LAS.findLAS(lasFolder)
+
+        AddMsgAndPrint("\nInput DEM LAS Folder: " + os.path.basename(lasFolder))
+        AddMsgAndPrint("\tLAS Files: " + str(len(lasFiles)) + "; assumed to be in " + outputCS.Name)
+
+        toleranceDict = {"Meter":3,"Foot":9.84252,"Foot_US":9.84252}
+        if outputCS.Type != 'Projected' or not linearUnits in toleranceDict:
+            AddMsgAndPrint("\n\tThe CLU layer must be in a projected coordinate system in feet or meters to grid LAS files... Exiting!",2)
+            return False,False,False
+        cellSize = toleranceDict[linearUnits]
+
+        # if zUnits not populated assume it is the same as linearUnits
+        if not zUnits: zUnits = linearUnits
+        zFactor = zFactorList[unitLookUpDict.get(linearUnits)][unitLookUpDict.get(zUnits)]
+
+        # Extent of the CLU buffered by 410 Meters
+        cluExtent = bufferedAOIExtent(demAOI,410)
+
+        def progress(n,total,path):
+            arcpy.SetProgressorLabel("Gridding ground returns of " + os.path.basename(path) + " (" + str(n) + " of " + str(total) + ")")
+
+        AddMsgAndPrint("\n\tGridding ground returns to " + str(cellSize) + " " + linearUnits)
+        demArray,lowerLeft,stats = HEL_LAS.gridGround(lasFiles,(cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax),
+                                                      cellSize,(0.0,0.0),HEL_LAS.groundClasses,lasChunkPoints,lasMaxGap,progress)
+        AddMsgAndPrint("\t\t" + str(stats['points']) + " ground returns from " + str(stats['files']) + " LAS file(s); " + str(stats['filled']) + " gap cells filled")
+
+        if not stats['points']:
+            AddMsgAndPrint("\n\tNo ground returns of " + lasFolder + " overlap the buffered CLU fields",2)
+            AddMsgAndPrint("\tThe LAS files must be classified and in the coordinate system of the CLU layer... Exiting!",2)
+            return False,False,False
+
+        demExtract = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demLAS",data_type="RasterDataset",workspace=scratchWS))
+        arrayToRaster(demArray,arcpy.Point(lowerLeft[0],lowerLeft[1]),cellSize).save(demExtract)
+        arcpy.DefineProjection_management(demExtract,outputCS)
+        del demArray
+
+        AddMsgAndPrint("\t\tLinear Units (XY): " + linearUnits)
+        AddMsgAndPrint("\t\tElevation Units (Z): " + zUnits)
+        AddMsgAndPrint("\t\tCell Size: " + str(cellSize) + " " + linearUnits)
+        AddMsgAndPrint("\t\tZ-Factor: " + str(zFactor))
+
+        return linearUnits,zFactor,demExtract
+
+    except:
+        errorMsg()
+        return False,False,False
+
 ## ================================================================================================================
 def extractDEM(inputDEM,zUnits):
     # This function will return a DEM that has the same extent as the CLU selected fields
-    # buffered to 410 Meters.  The DEM can be a local raster layer or a web image server. Datum
+    # that need LiDAR processing (demAOI) buffered to 410 Meters.  The DEM can be a local raster layer or a web image server. Datum
     # must be in WGS84 or NAD83 and linear units must be in Meters or Feet otherwise it
     # will exit.  If the cell size is finer than 3M then the DEM will be resampled.
     # The resampling will happen using the Project Raster tool regardless of an actual
@@ -781,6 +1206,14 @@ def extractDEM(inputDEM,zUnits):
         arcpy.env.resamplingMethod = "BILINEAR"
         arcpy.env.outputCoordinateSystem = arcpy.Describe(cluLayer).SpatialReference
 
+        # Virtual mosaic written by Merge Local DEMs by CLU
+        if str(inputDEM).lower().endswith(HEL_Mosaic.descriptorExtension):
+            return extractDEMfromMosaic(str(inputDEM),zUnits)
+
+        # Folder of classified LAS files
+        if os.path.isdir(str(inputDEM)) and HEL_LAS.findLAS(str(inputDEM)):
+            return extractDEMfromLAS(str(inputDEM),zUnits)
+
         bImageService = False
         bResample = False
         outputCellSize = 3
@@ -855,18 +1288,50 @@ def extractDEM(inputDEM,zUnits):
         AddMsgAndPrint("\tZ-Factor: " + str(zFactor))
 
         # ------------------------------------------------------------------------------------ Extract DEM
-        arcpy.SetProgressorLabel("Buffering AOI by 410 Meters")
-        cluBuffer = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("cluBuffer",data_type="FeatureClass",workspace=scratchWS))
-        #cluBuffer = arcpy.CreateScratchName("cluBuffer",data_type="FeatureClass",workspace=scratchWS)
-        arcpy.Buffer_analysis(fieldDetermination,cluBuffer,"410 Meters","FULL","ROUND")
-        arcpy.env.extent = cluBuffer
-
-        # CLU clip extents
-        cluExtent = arcpy.Describe(cluBuffer).extent
+        # CLU clip extents; extent of the CLU buffered by 410 Meters
+        cluExtent = bufferedAOIExtent(demAOI,410)
+        arcpy.env.extent = cluExtent
         clipExtent = str(cluExtent.XMin) + " " + str(cluExtent.YMin) + " " + str(cluExtent.XMax) + " " + str(cluExtent.YMax)
 
+        # Read the window straight from a local DEM that shares the CLU coordinate system
+        bWindowRead = bWindowedDEMRead and not bImageService and sr.name == arcpy.env.outputCoordinateSystem.name
+        demWindow = None
+        demResampled = None
+        if bWindowRead and bResample:
+            # Pad the window so that every 3 meter cell center has its 4 source neighbors
+            pad = outputCellSize + cellSize
+            demArray,lowerLeft,windowCellSize,noData = readDEMWindow(inputDEM,(cluExtent.XMin - pad,cluExtent.YMin - pad,cluExtent.XMax + pad,cluExtent.YMax + pad))
+            if demArray is not None:
+                arcpy.SetProgressorLabel("Changing resolution from " + str(cellSize) + " " + linearUnits + " to 3 Meters")
+                AddMsgAndPrint("\n\tChanging resolution from " + str(cellSize) + " " + linearUnits + " to 3 Meters")
+
+                outArray,outLowerLeft = HEL_Resample.bilinearResample(demArray,(lowerLeft.X,lowerLeft.Y),windowCellSize,
+                                                                       (cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax),
+                                                                       outputCellSize,(0.0,0.0),noData)
+                del demArray
+                demResampled = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demClip_project",data_type="RasterDataset",workspace=scratchWS))
+                arrayToRaster(outArray,arcpy.Point(outLowerLeft[0],outLowerLeft[1]),outputCellSize).save(demResampled)
+                arcpy.DefineProjection_management(demResampled,sr)
+                del outArray
+
+        elif bWindowRead:
+            demArray,lowerLeft,windowCellSize,noData = readDEMWindow(inputDEM,(cluExtent.XMin,cluExtent.YMin,cluExtent.XMax,cluExtent.YMax))
+            if demArray is not None:
+                # The DEM has no NoData value; NaN cells (if any) become numpyNoData
+                if noData is None:
+                    demArray = np.where(np.isnan(demArray),numpyNoData,demArray.astype(np.float32))
+                    noData = numpyNoData
+                demWindow = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demWindow",data_type="RasterDataset",workspace=scratchWS))
+                arcpy.NumPyArrayToRaster(demArray,lowerLeft,windowCellSize,windowCellSize,noData).save(demWindow)
+                arcpy.DefineProjection_management(demWindow,sr)
+                del demArray
+
+        # Cell Resolution changed by the fused clip and resample kernel
+        if demResampled:
+            demExtract = demResampled
+
         # Cell Resolution needs to change; Clip and Project
-        if bResample:
+        elif bResample:
             arcpy.SetProgressorLabel("Changing resolution from " + str(cellSize) + " " + linearUnits + " to 3 Meters")
             AddMsgAndPrint("\n\tChanging resolution from " + str(cellSize) + " " + linearUnits + " to 3 Meters")
 
@@ -885,9 +1350,12 @@ def extractDEM(inputDEM,zUnits):
             arcpy.SetProgressorLabel("Clipping DEM using buffered CLU")
             AddMsgAndPrint("\n\tClipping DEM using buffered CLU")
 
-            #demExtract = arcpy.CreateScratchName("demClip",data_type="RasterDataset",workspace=scratchWS)
-            demExtract = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demClip",data_type="RasterDataset",workspace=scratchWS))
-            arcpy.Clip_management(inputDEM, clipExtent, demExtract, "", "", "", "NO_MAINTAIN_EXTENT")
+            if demWindow:
+                demExtract = demWindow
+            else:
+                #demExtract = arcpy.CreateScratchName("demClip",data_type="RasterDataset",workspace=scratchWS)
+                demExtract = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("demClip",data_type="RasterDataset",workspace=scratchWS))
+                arcpy.Clip_management(inputDEM, clipExtent, demExtract, "", "", "", "NO_MAINTAIN_EXTENT")
 
         # ------------------------------------------------------------------------------------ Report any new DEM properties
         desc = arcpy.Describe(demExtract)
@@ -904,13 +1372,203 @@ def extractDEM(inputDEM,zUnits):
         if newZfactor != zFactor:
             AddMsgAndPrint("\t\tNew Z-Factor: " + str(newZfactor))
 
-        arcpy.Delete_management(cluBuffer)
         return newLinearUnits,newZfactor,demExtract
 
     except:
         errorMsg()
         return False,False,False
 
+## ================================================================================================================
+def rasterToArray(raster,dtype="float64"):
+    # This function converts a raster into a float64 (or dtype) NumPy array with NaN as NoData
+    # so that it can be handed to the NumPy engines (HEL_Terrain.py).  The lower left corner and
+    # cell size are returned so that the array can be converted back with arrayToRaster.
+    # returns array, lowerLeft point, cellSize
+
+    try:
+        desc = arcpy.Describe(raster)
+        lowerLeft = arcpy.Point(desc.extent.XMin,desc.extent.YMin)
+        cellSize = desc.MeanCellWidth
+
+        # Integer rasters (i.e. T Factor, HEL Value) keep their own NoData value since
+        # numpyNoData does not fit the pixel type.
+        if desc.isInteger:
+            array = arcpy.RasterToNumPyArray(raster).astype(dtype)
+            if desc.noDataValue is not None:
+                array[array == desc.noDataValue] = np.nan
+        else:
+            array = arcpy.RasterToNumPyArray(raster,nodata_to_value=numpyNoData).astype(dtype)
+            array[array == numpyNoData] = np.nan
+
+        return array,lowerLeft,cellSize
+
+    except:
+        errorMsg()
+        return None,None,None
+
+## ================================================================================================================
+def arrayToRaster(array,lowerLeft,cellSize):
+    # This function converts a NumPy array with NaN as NoData back into a raster object
+    # using the lower left corner and cell size returned by rasterToArray.
+    # returns a Raster object
+
+    try:
+        outArray = np.where(np.isnan(array),numpyNoData,array).astype(np.float32)
+        return arcpy.NumPyArrayToRaster(outArray,lowerLeft,cellSize,cellSize,numpyNoData)
+
+    except:
+        errorMsg()
+        return None
+
+## ================================================================================================================
+def rasterizeZones(polygonLayer,attributeFlds,templateRaster,valueLookups=None,whereClause=""):
+    # This function burns the polygons of a feature class into a single zone grid of ObjectIDs
+    # that lines up with the template raster (DEM) and derives one band per attribute field
+    # by array lookup (HEL_Rasterize.py).  This replaces one FeatureToRaster per attribute.
+    # valueLookups is an optional dictionary of field name -> {field value:band value} for
+    # text fields, i.e. {'HEL':0,'NHEL':1,'PHEL':2}.  Only polygons that satisfy the
+    # whereClause are burned.
+    # returns zone array, list of float64 attribute arrays with NaN as NoData
+
+    try:
+        desc = arcpy.Describe(templateRaster)
+        lowerLeft = (desc.extent.XMin,desc.extent.YMin)
+        gridSR = desc.SpatialReference
+
+        # Polygons should already be in the DEM coordinate system
+        bProject = arcpy.Describe(polygonLayer).SpatialReference.name != gridSR.name
+        if not valueLookups:
+            valueLookups = dict()
+
+        polygons = list()
+        attributes = dict()
+        with arcpy.da.SearchCursor(polygonLayer,["OID@","SHAPE@"] + attributeFlds,whereClause) as cursor:
+            for row in cursor:
+                shape = row[1]
+                if shape is None:
+                    continue
+                if bProject:
+                    shape = shape.projectAs(gridSR)
+
+                # Interior rings are separated by a None point
+                rings = list()
+                for part in shape:
+                    ring = list()
+                    for pnt in part:
+                        if pnt is None:
+                            rings.append(ring)
+                            ring = list()
+                        else:
+                            ring.append((pnt.X,pnt.Y))
+                    rings.append(ring)
+
+                polygons.append((row[0],rings))
+                attributes[row[0]] = tuple([valueLookups[fld].get(val) if fld in valueLookups else val for fld,val in zip(attributeFlds,row[2:])])
+
+        zones = HEL_Rasterize.burnZones(polygons,lowerLeft,desc.MeanCellWidth,desc.height,desc.width)
+        return zones,HEL_Rasterize.attributeBands(zones,attributes)
+
+    except:
+        errorMsg()
+        return None,None
+
+## ================================================================================================================
+def resultCacheKey():
+    # This function builds the result cache key of the current request from the selected CLU
+    # geometries and every CLU attribute copied into the outputs (TRACTNBR, FARMNBR, COUNTYCD...),
+    # the HEL soil layer and DEM source (path and data fingerprint), zUnits, use_runoff_ls and the
+    # engine settings that change the outputs (bNumpyEngine, bWindowedDEMRead, bServiceTiles,
+    # bDEMTileCache, lasMaxGap).
+    # The scope is the same key without the data fingerprints; it is used to invalidate cached
+    # results when the soil or DEM data changes (HEL_Result_Cache.py).  The data fingerprint of an
+    # image service is its version (demServiceVersion and HEL_DEM_Service.serviceVersion); no key
+    # is returned when the version of the service cannot be read or when the soil layer or DEM is not
+    # stored in files on disk (i.e. an enterprise geodatabase) since its changes cannot be seen.
+    # returns key, scope
+
+    try:
+        cluFields = [fld.name for fld in arcpy.ListFields(fieldDetermination) if not fld.type in ('OID','Geometry','Blob','Raster')]
+        cluFields = [fld for fld in cluFields if not fld.lower() in ('shape_length','shape_area')]
+        cluHashes = sorted([(str(row[0]),hashlib.sha1(bytes(row[1].WKB)).hexdigest(),[unicode(value) for value in row[2:]])
+                            for row in arcpy.da.SearchCursor(fieldDetermination,["CLUNBR","SHAPE@"] + cluFields)])
+
+        helPath = arcpy.Describe(helLayer).catalogPath
+        demPath = arcpy.Describe(inputDEM).catalogPath if inputDEM else ""
+        helCount = int(arcpy.GetCount_management(helPath).getOutput(0))
+
+        for sourcePath in [helPath] + ([demPath] if demPath and not demPath.lower().startswith('http') else []):
+            if not HEL_Result_Cache.isFileSource(sourcePath):
+                AddMsgAndPrint("\n" + sourcePath + " is not stored in files on disk; the result cache is not used",1)
+                return None,None
+
+        demFingerprint = HEL_Result_Cache.pathFingerprint(demPath) if demPath else ""
+        if demPath.lower().startswith('http'):
+            version = HEL_DEM_Service.serviceVersion(demPath)
+            if version is None:
+                AddMsgAndPrint("\nThe version of the DEM image service could not be read; the result cache is not used",1)
+                return None,None
+            demFingerprint = [demServiceVersion,version]
+
+        engine = [bool(bNumpyEngine),bool(bWindowedDEMRead),bool(bServiceTiles),bool(bDEMTileCache),lasMaxGap]
+        scope = HEL_Result_Cache.cacheKey([resultCacheVersion,cluFields,cluHashes,helPath,demPath,zUnits,bool(use_runoff_ls),engine])
+        key = HEL_Result_Cache.cacheKey([scope,HEL_Result_Cache.pathFingerprint(helPath),helCount,demFingerprint])
+        return key,scope
+
+    except:
+        errorMsg()
+        return None,None
+
+## ================================================================================================================
+def restoreCachedResult(cacheEntry):
+    # This function copies the outputs of a cached determination into the HEL access database.
+    # The LiDAR HEL raster only exists if LiDAR processing was done.  The copy holds the cache
+    # lock so that no other process replaces or invalidates the entry while it is read.
+    # returns True if all outputs were copied
+
+    try:
+        with HEL_Result_Cache.indexLock(cacheFolder):
+            for layer in accessLayers:
+                cachedLayer = os.path.join(cacheEntry['path'],os.path.basename(layer))
+                if arcpy.Exists(cachedLayer):
+                    arcpy.Copy_management(cachedLayer,layer)
+                elif layer != lidarHEL or cacheEntry['meta'].get('lidar'):
+                    return False
+        return True
+
+    except:
+        errorMsg()
+        return False
+
+## ================================================================================================================
+def storeCachedResult(bLidar):
+    # This function copies the outputs of this determination into a new result cache entry.  The
+    # outputs are copied into a temporary geodatabase of this process that HEL_Result_Cache.store
+    # renames into place under the cache lock, so parallel batch workers never write the same entry.
+    # bLidar indicates that a LiDAR HEL raster was created.
+    # returns True if the entry was kept
+
+    try:
+        if not cacheKey:
+            return False
+
+        if not os.path.isdir(cacheFolder):
+            os.makedirs(cacheFolder)
+
+        tempEntry = HEL_Result_Cache.tempEntryPath(cacheFolder,cacheKey)
+        arcpy.CreateFileGDB_management(cacheFolder,os.path.basename(tempEntry))
+
+        for layer in accessLayers:
+            if arcpy.Exists(layer):
+                arcpy.Copy_management(layer,os.path.join(tempEntry,os.path.basename(layer)))
+
+        # Release the schema locks of the copies before the geodatabase is renamed
+        arcpy.ClearWorkspaceCache_management(tempEntry)
+        return HEL_Result_Cache.store(cacheFolder,cacheKey,cacheScope,cacheMaxMB * 1048576,{'lidar':bLidar},tempEntry)
+
+    except:
+        errorMsg()
+        return False
+
 ## ================================================================================================================
 def removeScratchLayers():
     # This function is the last task that is executed or gets invoked in
@@ -933,6 +1591,21 @@ def removeScratchLayers():
     except:
         pass
 
+## ================================================================================================================
+def freeScratchLayers(*layers):
+    # This function deletes intermediate rasters as soon as their last consumer has run so that
+    # the scratch workspace does not hold every intermediate of the LiDAR section until
+    # removeScratchLayers.  The layers are taken off the scratchLayers list.
+
+    for lyr in layers:
+        try:
+            while lyr in scratchLayers:
+                scratchLayers.remove(lyr)
+            arcpy.Delete_management(lyr)
+        except:
+            arcpy.AddMessage("Deleting Layer: " + str(lyr) + " failed.")
+            continue
+
 ## ================================================================================================================
 def AddLayersToArcMap():
     # This Function will add necessary layers to ArcMap.  Nothing is returned
@@ -946,7 +1619,7 @@ def AddLayersToArcMap():
         # Add 3 fields to the field determination layer and populate them
         # from ogCLUinfoDict and 4 fields to the Final HEL Summary layer that
         # otherwise would've been added after geoprocessing was successful.
-        if bNoPHELvalues or bSkipGeoprocessing:
+        if (bNoPHELvalues or bSkipGeoprocessing) and not bCacheHit:
 
             # Add 3 fields to fieldDetermination layer
             fieldList = ["HEL_YES","HEL_Acres","HEL_Pct"]
@@ -1005,6 +1678,10 @@ def AddLayersToArcMap():
                     cursor.updateRow(row)
             del cursor
 
+        # There is no map document in batch mode
+        if bBatchMode:
+            return
+
         # Put this section in a try-except. It will fail if run from ArcCatalog
         mxd = arcpy.mapping.MapDocument("CURRENT")
         df = arcpy.mapping.ListDataFrames(mxd)[0]
@@ -1149,7 +1826,10 @@ def populateForm():
                 expression = "\"" + params[1] + "\""
                 arcpy.CalculateField_management(fieldDetermination,field,expression,"VB")
 
-        if bAccess:
+        if bBatchMode:
+            AddMsgAndPrint("\tNRCS-CPA-026e Form values were written to " + helDatabase,0)
+
+        elif bAccess:
             AddMsgAndPrint("\tOpening NRCS-CPA-026e Form",0)
             try:
                 subprocess.Popen([msAccessPath,helDatabase])
@@ -1253,9 +1933,11 @@ def configLayout():
     
 ## =========================================================== Main Body ========================================================
 import sys, string, os, traceback, re
-import arcpy, subprocess, getpass, time
+import arcpy, subprocess, getpass, time, shutil, hashlib, multiprocessing
+import numpy as np
 from arcpy import env
 from arcpy.sa import *
+import HEL_Terrain, HEL_Flow, HEL_Factors, HEL_Rasterize, HEL_Result_Cache, HEL_DEM_Tile_Cache, HEL_DEM_Service, HEL_DEM_Reader, HEL_Resample, HEL_Mosaic, HEL_Buffer, HEL_LAS, HEL_Tiles, HEL_Compact
 
 if __name__ == '__main__':
 
@@ -1268,6 +1950,17 @@ if __name__ == '__main__':
         input_cust = arcpy.GetParameterAsText(5)
         use_runoff_ls = arcpy.GetParameter(6)
         #use_runoff_ls = False      ## Used for testing when not set as a parameter
+
+        # Optional batch parameters.  These are not part of the toolbox and are only passed on
+        # the command line by HEL_Batch.py.  When a CLU where clause is given the CLUs are selected
+        # by attribute, no map document is used and the outputs are written to the output folder.
+        cluWhereClause = arcpy.GetParameterAsText(7) if len(sys.argv) > 8 else ""
+        outputFolder = arcpy.GetParameterAsText(8) if len(sys.argv) > 9 else ""
+        bBatchMode = len(cluWhereClause) > 0
+
+        # Command line booleans are passed as text
+        if bBatchMode:
+            use_runoff_ls = str(use_runoff_ls).lower() == 'true'
         
         ## 8/20/2019 - Observation: stateThreshold is not used anywhere in the code. Was intended as a PHEL predominance % paramter.
         ##Commenting it out for now.
@@ -1278,6 +1971,57 @@ if __name__ == '__main__':
         rFactorFld = "R"
         helFld = "MUHELCL"
 
+        # Use the NumPy terrain engine (HEL_Terrain.py) for the Fill, Focal Statistics and
+        # Slope steps instead of the Spatial Analyst tools.
+        bNumpyEngine = False
+        numpyNoData = -3.40282346639e+38
+
+        # Peak memory (MB) of the temporaries of the neighborhood stages of the NumPy engine.  The
+        # grid is processed in blocks with a halo that fit this budget (HEL_Tiles.py).
+        tileMemoryMB = 256
+
+        # Number of processes that run the blocks (HEL_Tiles.py).  The budget above is shared by
+        # all of them.  Batch runs already run one tract per core so they use a single process.
+        tileWorkers = 1 if bBatchMode else min(multiprocessing.cpu_count(),4)
+
+        # Result cache for identical re-requests (HEL_Result_Cache.py).  Cached outputs are kept in
+        # the HEL_Cache folder up to cacheMaxMB.  Change resultCacheVersion to invalidate every entry
+        # when the determination logic changes.
+        bResultCache = True
+        cacheFolder = os.path.dirname(sys.argv[0]) + os.sep + r'HEL_Cache'
+        cacheMaxMB = 2048
+        resultCacheVersion = "10/18/2026"
+        cacheKey = None
+        bCacheHit = False
+
+        # DEM tile cache for the elevation image service (HEL_DEM_Tile_Cache.py).  Downloaded tiles
+        # are kept in the HEL_DEM_Cache folder up to demCacheMaxMB and reused by neighboring tracts.
+        bDEMTileCache = True
+        demCacheFolder = os.path.dirname(sys.argv[0]) + os.sep + r'HEL_DEM_Cache'
+        demCacheMaxMB = 4096
+
+        # Tiled download of image services reached by URL (HEL_DEM_Service.py).  Tiles of
+        # serviceTileCells x serviceTileCells cells are fetched by serviceWorkers pooled connections
+        # and retried serviceRetries times with backoff.  Set bServiceTiles to False to use Clip.
+        bServiceTiles = True
+        serviceWorkers = 4
+        serviceTileCells = 1024
+        serviceRetries = 3
+
+        # Version of the data of the elevation image service.  The DEM tile cache and the result cache
+        # also follow the service description (HEL_DEM_Service.serviceVersion); change demServiceVersion
+        # (i.e. to the date new LiDAR was published) to invalidate them when the description did not change.
+        demServiceVersion = "10/18/2026"
+
+        # Read the buffered window of local DEMs straight from the file (HEL_DEM_Reader.py) instead
+        # of copying it with Clip.  Set bWindowedDEMRead to False to use Clip.
+        bWindowedDEMRead = True
+
+        # Gridding of a folder of LAS files used as the DEM (HEL_LAS.py).  Points are read lasChunkPoints
+        # records at a time; runs of up to lasMaxGap empty 3 meter cells between ground cells are filled.
+        lasChunkPoints = 1000000
+        lasMaxGap = 3
+
         bLog = False # boolean to begin logging to text file.
         arcpy.SetProgressorLabel("Checking input values and environments")
         AddMsgAndPrint("\nChecking input values and environments")
@@ -1288,6 +2032,14 @@ if __name__ == '__main__':
         if not arcpy.Exists(helDatabase):
             AddMsgAndPrint("\nHEL Access Database does not exist in the same path as HEL Tools",2)
             sys.exit()
+
+        # Batch mode writes to a copy of the HEL access database in the output folder
+        if bBatchMode and outputFolder:
+            if not os.path.isdir(outputFolder):
+                os.makedirs(outputFolder)
+            if not arcpy.Exists(os.path.join(outputFolder,r'HEL.mdb')):
+                shutil.copyfile(helDatabase,os.path.join(outputFolder,r'HEL.mdb'))
+            helDatabase = os.path.join(outputFolder,r'HEL.mdb')
         # Also define the lu_table, but it's still ok to continue if it's not present
         lu_table = os.path.dirname(sys.argv[0]) + os.sep + r'census_fips_lut.dbf'
 
@@ -1304,18 +2056,20 @@ if __name__ == '__main__':
 ##                break
         # forcibly kill image name msaccess if open.
         # remove access record-locking information
-        try:
-            killAccess = os.system("TASKKILL /F /IM msaccess.exe")
-            if killAccess == 0:
-                AddMsgAndPrint("\tMicrosoft Access was closed in order to continue")
-
-            accessLockFile = os.path.dirname(sys.argv[0]) + os.sep + r'HEL.ldb'
-            if os.path.exists(accessLockFile):
-               os.remove(accessLockFile)
-            time.sleep(2)
-        except:
-            time.sleep(2)
-            pass
+        # Not needed in batch mode since every tract has its own copy of the database.
+        if not bBatchMode:
+            try:
+                killAccess = os.system("TASKKILL /F /IM msaccess.exe")
+                if killAccess == 0:
+                    AddMsgAndPrint("\tMicrosoft Access was closed in order to continue")
+
+                accessLockFile = os.path.dirname(sys.argv[0]) + os.sep + r'HEL.ldb'
+                if os.path.exists(accessLockFile):
+                   os.remove(accessLockFile)
+                time.sleep(2)
+            except:
+                time.sleep(2)
+                pass
 
         # ---------------------------------------------------------------------- establish path to access database layers
         fieldDetermination = os.path.join(helDatabase, r'Field_Determination')
@@ -1351,6 +2105,10 @@ if __name__ == '__main__':
         if bAccess and not os.path.isfile(msAccessPath):
             bAccess = False
 
+        # The 026 form is not opened in batch mode
+        if bBatchMode:
+            bAccess = False
+
         ## ------------------------------------------------------------------------------------ Checkout Spatial Analyst Extension and set scratch workspace """
         # Check Availability of Spatial Analyst Extension
         try:
@@ -1371,7 +2129,15 @@ if __name__ == '__main__':
         arcpy.env.overwriteOutput = True
 
         # define and set the scratch workspace
-        scratchWS = os.path.dirname(sys.argv[0]) + os.sep + r'scratch.gdb'
+        # Batch mode uses a scratch.gdb in the output folder so that several tracts can be
+        # processed at the same time without sharing scratch data.
+        if bBatchMode and outputFolder:
+            scratchWS = os.path.join(outputFolder,r'scratch.gdb')
+            if not arcpy.Exists(scratchWS):
+                arcpy.CreateFileGDB_management(outputFolder,r'scratch.gdb')
+        else:
+            scratchWS = os.path.dirname(sys.argv[0]) + os.sep + r'scratch.gdb'
+
         if not arcpy.Exists(scratchWS):
             scratchWS = setScratchWorkspace()
         #else:
@@ -1387,11 +2153,22 @@ if __name__ == '__main__':
         ## -------------------------------------------------------------------------------------------------------- Stamp CLU into field determination fc.
         # ------------------------------------------------------------------ Exit if no CLU fields selected
         cluDesc = arcpy.Describe(cluLayer)
-        if cluDesc.FIDset == '':
+
+        # Batch mode: select the CLU fields by attribute
+        if bBatchMode:
+            cluLayer = arcpy.MakeFeatureLayer_management(cluDesc.catalogPath,"cluBatch",cluWhereClause).getOutput(0)
+            numOfCLUs = int(arcpy.GetCount_management(cluLayer).getOutput(0))
+            if not numOfCLUs:
+                AddMsgAndPrint("\nThere are no CLU fields that match: " + cluWhereClause + ". Exiting!",2)
+                sys.exit()
+            fieldDetermination = arcpy.CopyFeatures_management(cluLayer,fieldDetermination)
+
+        elif cluDesc.FIDset == '':
             AddMsgAndPrint("\nPlease select fields from the CLU Layer. Exiting!",2)
             sys.exit()
         else:
             fieldDetermination = arcpy.CopyFeatures_management(cluLayer,fieldDetermination)
+            numOfCLUs = len(cluDesc.FIDset.split(";"))
 
         # -------------------------------------------- Make sure TRACTNBR and FARMNBR  are uniqe; exit otherwise
         uniqueTracts = list(set([row[0] for row in arcpy.da.SearchCursor(fieldDetermination,("TRACTNBR"))]))
@@ -1417,9 +2194,10 @@ if __name__ == '__main__':
         bLog = True
 
         # Update the map layout for the current site being run
-        configLayout()
+        if not bBatchMode:
+            configLayout()
 
-        AddMsgAndPrint("\nNumber of CLU fields selected: {}".format(len(cluDesc.FIDset.split(";"))))
+        AddMsgAndPrint("\nNumber of CLU fields selected: {}".format(numOfCLUs))
 
         # Add Calcacre field if it doesn't exist. Should be part of the CLU layer.
         calcAcreFld = "CALCACRES"
@@ -1456,6 +2234,28 @@ if __name__ == '__main__':
                        [100,30.48,1,2.54],
                        [39.3701,12,0.393701,1]]
 
+        ### ------------------------------------------------------------------------------------------------------------- Check Result Cache
+        # An identical request (same CLU geometries, soil and DEM data and options) returns the
+        # cached outputs.  The 026 form fields are populated again for this request.
+        if bResultCache:
+            cacheKey,cacheScope = resultCacheKey()
+            cacheEntry = HEL_Result_Cache.lookup(cacheFolder,cacheKey,cacheScope) if cacheKey else None
+
+            if cacheEntry and restoreCachedResult(cacheEntry):
+                AddMsgAndPrint("\nThis determination was found in the result cache. No Geoprocessing is required.",1)
+                bCacheHit = True
+                bNoPHELvalues = False
+                bSkipGeoprocessing = not cacheEntry['meta'].get('lidar')
+
+                AddLayersToArcMap()
+
+                if not populateForm():
+                    AddMsgAndPrint("\nFailed to correclty populate NRCS-CPA-026e form",2)
+
+                arcpy.SetProgressorLabel("")
+                AddMsgAndPrint("\n")
+                sys.exit()
+
         ### ------------------------------------------------------------------------------------------------------------- Compute Summary of original HEL values"""
         # -------------------------------------------------------------------------- Intersect fieldDetermination (CLU & AOI) with soils (helLayer) -> finalHELSummary
         AddMsgAndPrint("\nComputing summary of original HEL Values")
@@ -1595,6 +2395,7 @@ if __name__ == '__main__':
         numOfhelValues = len(pivotFields)                                                 # Number of Pivot table fields; Min 2 fields
         maxAcreLength.sort(reverse=True)
         bSkipGeoprocessing = True             # Skip processing until a field is neither HEL >= 33.33% or NHEL > 66.67%
+        lidarCLUs = list()                    # CLUNBRs that are neither HEL >= 33.33% or NHEL > 66.67% and need LiDAR
 
         # This dictionary will only be used if FINAL results are all HEL or all NHEL to reference original
         # acres and not use tabulate area acres.  It will also be used when there are no PHEL Values.
@@ -1661,10 +2462,10 @@ if __name__ == '__main__':
                     #AddMsgAndPrint("\t\t\t" + pivotFields[i] + firstSpace + " -- " + str(acres) + secondSpace + " .ac -- " + str(pct) + " %")
                     del acres,pct,firstSpace,secondSpace
 
-                # Skip geoprocessing if HEL >=33.33% or NHEL > 66.67%
-                if bSkipGeoprocessing:
-                   if not bHELgreaterthan33 and not bNHELgreaterthan66:
-                      bSkipGeoprocessing = False
+                # Skip geoprocessing for this field if HEL >=33.33% or NHEL > 66.67%
+                if not bHELgreaterthan33 and not bNHELgreaterthan66:
+                   lidarCLUs.append(row[0])
+                   bSkipGeoprocessing = False
 
                 # Report messages to user; og CLU HEL rating will be reported if bNoPHELvalues is true.
                 if bNoPHELvalues:
@@ -1697,6 +2498,9 @@ if __name__ == '__main__':
 
             AddLayersToArcMap()
 
+            if bResultCache:
+                storeCachedResult(False)
+
             if not populateForm():
                 AddMsgAndPrint("\nFailed to correclty populate NRCS-CPA-026e form",2)
 
@@ -1706,6 +2510,26 @@ if __name__ == '__main__':
             arcpy.RefreshCatalog(scratchWS)
             sys.exit()
 
+        ### ---------------------------------------------------------------------------------------------- Select fields that need LiDAR processing
+        # Only the fields that are neither HEL >= 33.33% or NHEL > 66.67% go through DEM extraction
+        # and the raster analysis.  The rest of the fields keep their original rating (ogCLUinfoDict).
+        if len(lidarCLUs) < len(ogCLUinfoDict):
+            AddMsgAndPrint("\n\tLiDAR processing is only required for CLU #: " + ", ".join([str(clu) for clu in sorted(lidarCLUs)]),1)
+
+            if arcpy.ListFields(fieldDetermination,cluNumberFld)[0].type == "String":
+                cluValues = ",".join(["'" + str(clu) + "'" for clu in lidarCLUs])
+            else:
+                cluValues = ",".join([str(clu) for clu in lidarCLUs])
+
+            lidarWhereClause = arcpy.AddFieldDelimiters(fieldDetermination,cluNumberFld) + " IN (" + cluValues + ")"
+            demAOI = arcpy.MakeFeatureLayer_management(fieldDetermination,"lidarCLUs",lidarWhereClause).getOutput(0)
+            scratchLayers.append(demAOI)
+            del cluValues
+
+        else:
+            lidarWhereClause = ""
+            demAOI = fieldDetermination
+
         ### ---------------------------------------------------------------------------------------------- Check and create DEM clip from buffered CLU
         # Exit if a DEM is not present; At this point PHEL mapunits are present
         # and requires a DEM to process them.
@@ -1724,7 +2548,14 @@ if __name__ == '__main__':
         ### ----------------------------------------------------------------------------------------------------------------------------- Set Snap Raster 
         # Disabled for now due to shifting soils results.
         # Investigating change so that soil derived rasters exist first and are the snap rasters (9/16/2019)
-        #arcpy.env.snapRaster = dem
+        # Soil derived rasters are now burned directly on the DEM grid (see rasterizeZones).  The
+        # Spatial Analyst chain is snapped to the DEM and limited to its extent so that the LiDAR HEL
+        # raster lines up with the zone grid that is tabulated against it.
+        demGridDesc = arcpy.Describe(dem)
+        arcpy.env.snapRaster = dem
+        arcpy.env.extent = demGridDesc.extent
+        arcpy.env.cellSize = demGridDesc.MeanCellWidth
+        del demGridDesc
 
         ### -------------------------------------------------------------------------------------------------------------------------- Create Slope Layer
         # Perform a minor fill to reduce LiDAR data noise and minor irregularities.
@@ -1743,23 +2574,42 @@ if __name__ == '__main__':
             # Assume worst case z units of Meters
             zLimit = 0.3048
 
-        # Perform the fill using the zLimit as the max fill amount
-        filled = Fill(dem, zLimit)
-        scratchLayers.append(filled)
+        # NumPy terrain engine: Fill, Focal Mean and Slope are computed on the DEM array.
+        # The smoothed DEM and slope stay arrays for the flow and HEL factor stages.
+        if bNumpyEngine:
+            demArray,lowerLeft,demCellSize = rasterToArray(dem,"float32")
+
+            filledArray = HEL_Terrain.fillDEM(demArray, zLimit)
+            del demArray
 
-        # Run a FocalMean to smooth the DEM of LiDAR data noise. This should be run prior to creating derivative products.
-        # This replaces running FocalMean on the slope layer itself.
-        arcpy.SetProgressorLabel("Running Focal Statistics on DEM")
-        AddMsgAndPrint("Running Focal Statistics on DEM")
-        #slope = arcpy.CreateScratchName("focStatsMean_Slope",data_type="RasterDataset",workspace=scratchWS)
-        preslope = FocalStatistics(filled, NbrRectangle(3,3,"CELL"),"MEAN","DATA")
-        #outFocalStatistics.save(slope)
+            # Focal Mean and Slope are run together block by block within tileMemoryMB
+            def tileProgress(n,total):
+                arcpy.SetProgressorLabel("Running Focal Statistics and Slope on block " + str(n) + " of " + str(total))
 
-        arcpy.SetProgressorLabel("Creating Slope Derivative")
-        AddMsgAndPrint("\nCreating Slope Derivative")
-        #preslope = arcpy.CreateScratchName("preslope",data_type="RasterDataset",workspace=scratchWS)
-        slope = Slope(preslope,"PERCENT_RISE",zFactor)
-        #outSlope.save(preslope)
+            AddMsgAndPrint("Running Focal Statistics on DEM")
+            AddMsgAndPrint("\nCreating Slope Derivative")
+            preslopeArray,slopeArray = HEL_Tiles.preslopeSlope(filledArray, demCellSize, zFactor, tileMemoryMB, tileProgress, tileWorkers)
+            del filledArray
+
+        else:
+            # Perform the fill using the zLimit as the max fill amount
+            filled = Fill(dem, zLimit)
+            scratchLayers.append(filled)
+
+            # Run a FocalMean to smooth the DEM of LiDAR data noise. This should be run prior to creating derivative products.
+            # This replaces running FocalMean on the slope layer itself.
+            arcpy.SetProgressorLabel("Running Focal Statistics on DEM")
+            AddMsgAndPrint("Running Focal Statistics on DEM")
+            #slope = arcpy.CreateScratchName("focStatsMean_Slope",data_type="RasterDataset",workspace=scratchWS)
+            preslope = FocalStatistics(filled, NbrRectangle(3,3,"CELL"),"MEAN","DATA")
+            #outFocalStatistics.save(slope)
+
+            arcpy.SetProgressorLabel("Creating Slope Derivative")
+            AddMsgAndPrint("\nCreating Slope Derivative")
+            #preslope = arcpy.CreateScratchName("preslope",data_type="RasterDataset",workspace=scratchWS)
+            slope = Slope(preslope,"PERCENT_RISE",zFactor)
+            #outSlope.save(preslope)
+            freeScratchLayers(filled)
 
 ###### REMOVED IN FAVOR OF FOCAL MEAN ON DEM PRIOR TO RUNNING SLOPE ######
 ##        # Run a FocalMean statistics on slope output
@@ -1771,178 +2621,250 @@ if __name__ == '__main__':
 ###### REMOVED IN FAVOR OF FOCAL MEAN ON DEM PRIOR TO RUNNING SLOPE ######
         
         ### ------------------------------------------------------------------------------------------------------------ Create Flow Direction and Flow Length
-        arcpy.SetProgressorLabel("Calculating Flow Direction")
-        AddMsgAndPrint("Calculating Flow Direction")
-        #flowDirection = arcpy.CreateScratchName("flowDirection",data_type="RasterDataset",workspace=scratchWS)
-        #flowDirection = FlowDirection(dem, "FORCE")
-        flowDirection = FlowDirection(preslope, "FORCE")
-        #outFlowDirection.save(flowDirection)
-        scratchLayers.append(flowDirection)
-
-        arcpy.SetProgressorLabel("Calculating Flow Length")
-        AddMsgAndPrint("Calculating Flow Length")
-        #preflowLength = arcpy.CreateScratchName("flowLength",data_type="RasterDataset",workspace=scratchWS)
-        preflowLength = FlowLength(flowDirection,"UPSTREAM", "")
-        scratchLayers.append(preflowLength)
-        #outpreFlowLength.save(preflowLength)
-
-        # Run a focal statistics on flow length
-        arcpy.SetProgressorLabel("Running Focal Statistics on Flow Length")
-        AddMsgAndPrint("Running Focal Statistics on Flow Length")
-        #flowLength = arcpy.CreateScratchName("focStatsMax_FlowLength",data_type="RasterDataset",workspace=scratchWS)
-        flowLength = FocalStatistics(preflowLength, NbrRectangle(3,3,"CELL"),"MAXIMUM","DATA")
-        #outFocalStatistics.save(flowLength)
-        scratchLayers.append(flowLength)
-
-        # convert Flow Length distance units to feet if original DEM LINEAR UNITS ARE not in feet.
-        # Change this zUnits reference!
-        #if not zUnits in ('Feet','Foot','Foot_US'):
-        if not units in ('Feet','Foot','Foot_US'):
-            AddMsgAndPrint("Converting Flow Length Distance units to Feet")
-            #flowLengthFT = arcpy.CreateScratchName("flowLength_FT",data_type="RasterDataset",workspace=scratchWS)
-            #outflowLengthFT = Raster(flowLength) * 3.280839896
-            flowLengthFT = flowLength * 3.280839896
-            #outflowLengthFT.save(flowLengthFT)
-            scratchLayers.append(flowLengthFT)
+        # NumPy flow engine: D8 flow direction (FORCE) and upstream flow length are computed
+        # in one topological pass over the smoothed DEM array (HEL_Flow.py).
+        if bNumpyEngine:
+            arcpy.SetProgressorLabel("Calculating Flow Direction and Flow Length")
+            AddMsgAndPrint("Calculating Flow Direction and Flow Length")
+            flowDirArray,flowLengthArray = HEL_Flow.upstreamFlowLength(preslopeArray, demCellSize)
+            del preslopeArray,flowDirArray
+
+            # Run a focal statistics on flow length
+            arcpy.SetProgressorLabel("Running Focal Statistics on Flow Length")
+            AddMsgAndPrint("Running Focal Statistics on Flow Length")
+            flowLengthArray = HEL_Tiles.focalMaximum(flowLengthArray, tileMemoryMB, None, tileWorkers)
+
+            # convert Flow Length distance units to feet if original DEM LINEAR UNITS ARE not in feet.
+            if not units in ('Feet','Foot','Foot_US'):
+                AddMsgAndPrint("Converting Flow Length Distance units to Feet")
+                flowLengthArray *= 3.280839896
 
         else:
-            flowLengthFT = flowLength
-            scratchLayers.append(flowLengthFT)
+            arcpy.SetProgressorLabel("Calculating Flow Direction")
+            AddMsgAndPrint("Calculating Flow Direction")
+            #flowDirection = arcpy.CreateScratchName("flowDirection",data_type="RasterDataset",workspace=scratchWS)
+            #flowDirection = FlowDirection(dem, "FORCE")
+            flowDirection = FlowDirection(preslope, "FORCE")
+            #outFlowDirection.save(flowDirection)
+            scratchLayers.append(flowDirection)
+            freeScratchLayers(preslope)
+
+            arcpy.SetProgressorLabel("Calculating Flow Length")
+            AddMsgAndPrint("Calculating Flow Length")
+            #preflowLength = arcpy.CreateScratchName("flowLength",data_type="RasterDataset",workspace=scratchWS)
+            preflowLength = FlowLength(flowDirection,"UPSTREAM", "")
+            scratchLayers.append(preflowLength)
+            #outpreFlowLength.save(preflowLength)
+            freeScratchLayers(flowDirection)
+
+            # Run a focal statistics on flow length
+            arcpy.SetProgressorLabel("Running Focal Statistics on Flow Length")
+            AddMsgAndPrint("Running Focal Statistics on Flow Length")
+            #flowLength = arcpy.CreateScratchName("focStatsMax_FlowLength",data_type="RasterDataset",workspace=scratchWS)
+            flowLength = FocalStatistics(preflowLength, NbrRectangle(3,3,"CELL"),"MAXIMUM","DATA")
+            #outFocalStatistics.save(flowLength)
+            scratchLayers.append(flowLength)
+            freeScratchLayers(preflowLength)
+
+            # convert Flow Length distance units to feet if original DEM LINEAR UNITS ARE not in feet.
+            # Change this zUnits reference!
+            #if not zUnits in ('Feet','Foot','Foot_US'):
+            if not units in ('Feet','Foot','Foot_US'):
+                AddMsgAndPrint("Converting Flow Length Distance units to Feet")
+                #flowLengthFT = arcpy.CreateScratchName("flowLength_FT",data_type="RasterDataset",workspace=scratchWS)
+                #outflowLengthFT = Raster(flowLength) * 3.280839896
+                flowLengthFT = flowLength * 3.280839896
+                #outflowLengthFT.save(flowLengthFT)
+                scratchLayers.append(flowLengthFT)
+                freeScratchLayers(flowLength)
 
-        ### --------------------------------------------------------------------------------------------------------------- Calculate LS Factor
-        
-        # Convert slope percent to radians for use in various LS equations
-        radians = ATan(Times(slope,0.01))
-
-        # ----------------------------------------------------------------------------- Compute LS Factor
-        # If Northwest US 'Use Runoff LS Equation' flag was active, use the following equation
-        if use_runoff_ls:
-            arcpy.SetProgressorLabel("Calculating LS Factor")
-            AddMsgAndPrint("Calculating LS Factor")
-            lsFactor = (Power((flowLengthFT/72.6)*Cos(radians),0.5))*(Power(Sin((radians))/(Sin(5.143*((math.pi)/180))),0.7))
-
-        # Otherwise, use the standard AH537 LS computation
-        else:
-            # ------------------------------------------------------------------------------- Calculate S Factor
-            arcpy.SetProgressorLabel("Calculating S Factor")
-            AddMsgAndPrint("\nCalculating S Factor")
-            # Compute S factor using formula in AH537, pg 12
-            sFactor = ((Power(Sin(radians),2)*65.41)+(Sin(radians)*4.56)+(0.065))
-            scratchLayers.append(sFactor)
-
-            # ------------------------------------------------------------------------------ Calculate L Factor
-            arcpy.SetProgressorLabel("Calculating L Factor")
-            AddMsgAndPrint("Calculating L Factor")
-            #lFactor = arcpy.CreateScratchName("lFactor",data_type="RasterDataset",workspace=scratchWS)
-
-            # Original outlFactor lines
-            """outlFactor = Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.2),
-                               Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.3),
-                               Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.4),
-                               Power(Raster(flowLengthFT) / 72.6,0.5),"VALUE >= 3 AND VALUE < 5"),"VALUE >= 1 AND VALUE < 3"),"VALUE<1")"""
-
-            # Remove 'Raster' function from above
-            lFactor = Con(slope,Power(flowLengthFT / 72.6,0.2),
-                            Con(slope,Power(flowLengthFT / 72.6,0.3),
-                            Con(slope,Power(flowLengthFT / 72.6,0.4),
-                            Power(flowLengthFT / 72.6,0.5),"VALUE >= 3 AND VALUE < 5"),"VALUE >= 1 AND VALUE < 3"),"VALUE<1")
-
-            #outlFactor.save(lFactor)
-            scratchLayers.append(lFactor)
-
-            # ----------------------------------------------------------------------------- Calculate LS Factor
-            # "%l_factor%" * "%s_factor%"
-            arcpy.SetProgressorLabel("Calculating LS Factor")
-            AddMsgAndPrint("Calculating LS Factor")
-            #lsFactor = arcpy.CreateScratchName("lsFactor",data_type="RasterDataset",workspace=scratchWS)
-            #outlsFactor = Raster(lFactor) * Raster(sFactor)  ## Original Line
-            lsFactor = lFactor * sFactor
-            #outlsFactor.save(lsFactor)            
-
-        scratchLayers.append(radians)
-        scratchLayers.append(lsFactor)
+            else:
+                flowLengthFT = flowLength
+                scratchLayers.append(flowLengthFT)
 
         ### ------------------------------------------------------------------------------------------------------------- Convert K,T & R Factor and HEL Value to Rasters
+        # The Final HEL Summary polygons are burned once into a zone grid of ObjectIDs on the DEM
+        # grid and the K, T, R and HEL Value bands are looked up from the zone grid.  This replaces
+        # 4 FeatureToRaster calls into the scratch.gdb and the bands line up with the DEM cells.
+        # Og_HELcode is derived from the HEL field the same way as the HEL Summary layer.
         AddMsgAndPrint("\nConverting Vector to Raster for Spatial Analysis Purpose")
-        cellSize = arcpy.Describe(dem).MeanCellWidth
-
-        # (Works in 10.5 and under, but not 10.6 and up) All raster datasets will be created in memory
-##        kFactor =  "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("kFactor",data_type="RasterDataset",workspace=scratchWS))
-##        tFactor =  "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("tFactor",data_type="RasterDataset",workspace=scratchWS))
-##        rFactor =  "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("rFactor",data_type="RasterDataset",workspace=scratchWS))
-##        helValue = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("helValue",data_type="RasterDataset",workspace=scratchWS))
-
-        # This works in 10.5 AND works in 10.6.1 and 10.7 but slows processing
-        kFactor = arcpy.CreateScratchName("kFactor",data_type="RasterDataset",workspace=scratchWS)
-        tFactor = arcpy.CreateScratchName("tFactor",data_type="RasterDataset",workspace=scratchWS)
-        rFactor = arcpy.CreateScratchName("rFactor",data_type="RasterDataset",workspace=scratchWS)
-        helValue = arcpy.CreateScratchName("helValue",data_type="RasterDataset",workspace=scratchWS)
-
-        arcpy.SetProgressorLabel("Converting K Factor field to a raster")
-        AddMsgAndPrint("\tConverting K Factor field to a raster")
-        arcpy.FeatureToRaster_conversion(finalHELSummary,kFactorFld,kFactor,cellSize)
-
-        arcpy.SetProgressorLabel("Converting T Factor field to a raster")
-        AddMsgAndPrint("\tConverting T Factor field to a raster")
-        arcpy.FeatureToRaster_conversion(finalHELSummary,tFactorFld,tFactor,cellSize)
-
-        arcpy.SetProgressorLabel("Converting R Factor field to a raster")
-        AddMsgAndPrint("\tConverting R Factor field to a raster")
-        arcpy.FeatureToRaster_conversion(finalHELSummary,rFactorFld,rFactor,cellSize)
-
-        arcpy.SetProgressorLabel("Converting HEL Value field to a raster")
-        AddMsgAndPrint("\tConverting HEL Value field to a raster")
-        arcpy.FeatureToRaster_conversion(helSummary,HELrasterCode,helValue,cellSize)
-
-        #scratchLayers.append((kFactor,tFactor,rFactor,helValue))
-        scratchLayers.append(kFactor)
-        scratchLayers.append(tFactor)
-        scratchLayers.append(rFactor)
-        scratchLayers.append(helValue)
-
-        ### ------------------------------------------------------------------------------------------------------------- Calculate EI Factor
-        arcpy.SetProgressorLabel("Calculating EI Factor")
-        AddMsgAndPrint("\nCalculating EI Factor")
-        #eiFactor = arcpy.CreateScratchName("eiFactor", data_type="RasterDataset", workspace=scratchWS)
-        #outEIfactor = Divide((Raster(lsFactor) * Raster(kFactor) * Raster(rFactor)),Raster(tFactor))  # Original Lines
-        eiFactor = Divide((lsFactor * kFactor * rFactor),tFactor)
-        #outEIfactor.save(eiFactor)
-        scratchLayers.append(eiFactor)
-
-        ### ------------------------------------------------------------------------------------------------------------- Calculate Final HEL Factor
-        # Create Conditional statement to reflect the following:
-        # 1) PHEL Value = 0 -- Take EI factor -- Depends     2
-        # 2) HEL Value  = 1 -- Assign 9                      0
-        # 3) NHEL Value = 2 -- Assign 2 (No action needed)   1
-        # Anything above 8 is HEL
-
-        arcpy.SetProgressorLabel("Calculating HEL Factor")
-        AddMsgAndPrint("Calculating HEL Factor")
-        #helFactor = arcpy.CreateScratchName("helFactor",data_type="RasterDataset",workspace=scratchWS)
-        #outHELfactor = Con(Raster(helValue),Raster(eiFactor),Con(Raster(helValue),9,Raster(helValue),"VALUE=0"),"VALUE=2")  ## Original Line
-        helFactor = Con(helValue,eiFactor,Con(helValue,9,helValue,"VALUE=0"),"VALUE=2")
-        scratchLayers.append(helFactor)
-        #outHELfactor.save(helFactor)
-
-        #lidarHEL = arcpy.CreateScratchName("lidarHEL",data_type="RasterDataset",workspace=scratchWS)
-        # Reclassify values:
-        #       < 8 = Value_1 = NHEL
-        #       > 8 = Value_2 = HEL
-        remapString = "0 8 1;8 100000000 2"
-        arcpy.Reclassify_3d(helFactor, "VALUE", remapString, lidarHEL,'NODATA')
+        arcpy.SetProgressorLabel("Converting K, T, R Factor and HEL Value fields to rasters")
+        AddMsgAndPrint("\tConverting K, T, R Factor and HEL Value fields to rasters")
+
+        demDesc = arcpy.Describe(dem)
+        cellSize = demDesc.MeanCellWidth
+        helCodeDict = {"HEL":0,"NHEL":1,"PHEL":2,"NA":1}
+
+        zoneArray,factorArrays = rasterizeZones(finalHELSummary,[kFactorFld,tFactorFld,rFactorFld,helFld],dem,{helFld:helCodeDict},lidarWhereClause)
+        if zoneArray is None:
+            AddMsgAndPrint("\n\tFailed to convert the Final HEL Summary layer to rasters. Exiting!",2)
+            removeScratchLayers()
+            sys.exit()
+        kArray,tArray,rArray,helArray = factorArrays
+        del factorArrays,helCodeDict
+
+        # The NumPy engine keeps the factors as float32 and the Og_HELcode classes packed 2 bits per cell
+        if bNumpyEngine:
+            kArray,tArray,rArray = [HEL_Compact.floatGrid(factorArray) for factorArray in (kArray,tArray,rArray)]
+            helArray = HEL_Compact.PackedClasses(helArray)
+
+        # Spatial Analyst needs the bands as rasters
+        if not bNumpyEngine:
+            demLowerLeft = arcpy.Point(demDesc.extent.XMin,demDesc.extent.YMin)
+            kFactor = arrayToRaster(kArray,demLowerLeft,cellSize)
+            tFactor = arrayToRaster(tArray,demLowerLeft,cellSize)
+            rFactor = arrayToRaster(rArray,demLowerLeft,cellSize)
+            helValue = arrayToRaster(helArray,demLowerLeft,cellSize)
+            del kArray,tArray,rArray,helArray,demLowerLeft
+
+            scratchLayers.append(kFactor)
+            scratchLayers.append(tFactor)
+            scratchLayers.append(rFactor)
+            scratchLayers.append(helValue)
+
+        ### ------------------------------------------------------------------------------------------------------------- Create PHEL Mask
+        # The LS and EI factors are only needed where the original HEL value is PHEL
+        # (Og_HELcode = 2).  HEL and NHEL cells get their constant codes in the HEL Factor
+        # step so the S, L, LS and EI factors are only evaluated on PHEL cells.
+        if bNumpyEngine:
+            arcpy.SetProgressorLabel("Calculating LS, EI and HEL Factors for PHEL cells")
+            AddMsgAndPrint("\nCalculating LS, EI and HEL Factors for PHEL cells")
+
+            helFactorArray = HEL_Tiles.helFactor(slopeArray,flowLengthArray,kArray,rArray,tArray,helArray,use_runoff_ls,tileMemoryMB,None,tileWorkers)
+            del kArray,tArray,rArray,helArray,slopeArray,flowLengthArray
+
+            # Reclassify values:
+            #       < 8 = Value_1 = NHEL
+            #       > 8 = Value_2 = HEL
+            lidarArray = HEL_Factors.classifyHEL(helFactorArray)
+            del helFactorArray
+            lidarRaster = arcpy.NumPyArrayToRaster(lidarArray,lowerLeft,demCellSize,demCellSize,0)
+            arcpy.CopyRaster_management(lidarRaster,lidarHEL,"","","0","","","8_BIT_UNSIGNED")
+            freeScratchLayers(lidarRaster)
+
+        else:
+            phelMask = SetNull(helValue,1,"VALUE <> 2")
+            scratchLayers.append(phelMask)
+            arcpy.env.mask = phelMask
+
+            ### --------------------------------------------------------------------------------------------------------------- Calculate LS Factor
+            # Convert slope percent to radians for use in various LS equations
+            radians = ATan(Times(slope,0.01))
+
+            # ----------------------------------------------------------------------------- Compute LS Factor
+            # If Northwest US 'Use Runoff LS Equation' flag was active, use the following equation
+            if use_runoff_ls:
+                arcpy.SetProgressorLabel("Calculating LS Factor")
+                AddMsgAndPrint("Calculating LS Factor")
+                lsFactor = (Power((flowLengthFT/72.6)*Cos(radians),0.5))*(Power(Sin((radians))/(Sin(5.143*((math.pi)/180))),0.7))
+
+            # Otherwise, use the standard AH537 LS computation
+            else:
+                # ------------------------------------------------------------------------------- Calculate S Factor
+                arcpy.SetProgressorLabel("Calculating S Factor")
+                AddMsgAndPrint("\nCalculating S Factor")
+                # Compute S factor using formula in AH537, pg 12
+                sFactor = ((Power(Sin(radians),2)*65.41)+(Sin(radians)*4.56)+(0.065))
+                scratchLayers.append(sFactor)
+
+                # ------------------------------------------------------------------------------ Calculate L Factor
+                arcpy.SetProgressorLabel("Calculating L Factor")
+                AddMsgAndPrint("Calculating L Factor")
+                #lFactor = arcpy.CreateScratchName("lFactor",data_type="RasterDataset",workspace=scratchWS)
+
+                # Original outlFactor lines
+                """outlFactor = Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.2),
+                                   Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.3),
+                                   Con(Raster(slope),Power(Raster(flowLengthFT) / 72.6,0.4),
+                                   Power(Raster(flowLengthFT) / 72.6,0.5),"VALUE >= 3 AND VALUE < 5"),"VALUE >= 1 AND VALUE < 3"),"VALUE<1")"""
+
+                # Remove 'Raster' function from above
+                lFactor = Con(slope,Power(flowLengthFT / 72.6,0.2),
+                                Con(slope,Power(flowLengthFT / 72.6,0.3),
+                                Con(slope,Power(flowLengthFT / 72.6,0.4),
+                                Power(flowLengthFT / 72.6,0.5),"VALUE >= 3 AND VALUE < 5"),"VALUE >= 1 AND VALUE < 3"),"VALUE<1")
+
+                #outlFactor.save(lFactor)
+                scratchLayers.append(lFactor)
+
+                # ----------------------------------------------------------------------------- Calculate LS Factor
+                # "%l_factor%" * "%s_factor%"
+                arcpy.SetProgressorLabel("Calculating LS Factor")
+                AddMsgAndPrint("Calculating LS Factor")
+                #lsFactor = arcpy.CreateScratchName("lsFactor",data_type="RasterDataset",workspace=scratchWS)
+                #outlsFactor = Raster(lFactor) * Raster(sFactor)  ## Original Line
+                lsFactor = lFactor * sFactor
+                #outlsFactor.save(lsFactor)            
+                freeScratchLayers(sFactor,lFactor)
+
+            scratchLayers.append(lsFactor)
+            freeScratchLayers(radians,slope,flowLengthFT)
+
+            ### ------------------------------------------------------------------------------------------------------------- Calculate EI Factor
+            arcpy.SetProgressorLabel("Calculating EI Factor")
+            AddMsgAndPrint("\nCalculating EI Factor")
+            #eiFactor = arcpy.CreateScratchName("eiFactor", data_type="RasterDataset", workspace=scratchWS)
+            #outEIfactor = Divide((Raster(lsFactor) * Raster(kFactor) * Raster(rFactor)),Raster(tFactor))  # Original Lines
+            eiFactor = Divide((lsFactor * kFactor * rFactor),tFactor)
+            #outEIfactor.save(eiFactor)
+            scratchLayers.append(eiFactor)
+            freeScratchLayers(lsFactor,kFactor,rFactor,tFactor)
+
+            # HEL and NHEL cells are outside of the PHEL mask
+            arcpy.env.mask = ""
+            freeScratchLayers(phelMask)
+
+            ### ------------------------------------------------------------------------------------------------------------- Calculate Final HEL Factor
+            # Create Conditional statement to reflect the following:
+            # 1) PHEL Value = 0 -- Take EI factor -- Depends     2
+            # 2) HEL Value  = 1 -- Assign 9                      0
+            # 3) NHEL Value = 2 -- Assign 2 (No action needed)   1
+            # Anything above 8 is HEL
+
+            arcpy.SetProgressorLabel("Calculating HEL Factor")
+            AddMsgAndPrint("Calculating HEL Factor")
+            #helFactor = arcpy.CreateScratchName("helFactor",data_type="RasterDataset",workspace=scratchWS)
+            #outHELfactor = Con(Raster(helValue),Raster(eiFactor),Con(Raster(helValue),9,Raster(helValue),"VALUE=0"),"VALUE=2")  ## Original Line
+            helFactor = Con(helValue,eiFactor,Con(helValue,9,helValue,"VALUE=0"),"VALUE=2")
+            scratchLayers.append(helFactor)
+            #outHELfactor.save(helFactor)
+            freeScratchLayers(eiFactor,helValue)
+
+            #lidarHEL = arcpy.CreateScratchName("lidarHEL",data_type="RasterDataset",workspace=scratchWS)
+            # Reclassify values:
+            #       < 8 = Value_1 = NHEL
+            #       > 8 = Value_2 = HEL
+            remapString = "0 8 1;8 100000000 2"
+            arcpy.Reclassify_3d(helFactor, "VALUE", remapString, lidarHEL,'NODATA')
+            freeScratchLayers(helFactor)
 
         ### ------------------------------------------------------------------------------------- Determine if individual PHEL delineations are HEL/NHEL"""
         arcpy.SetProgressorLabel("Computing summary of LiDAR HEL Values:")
         AddMsgAndPrint("\nComputing summary of LiDAR HEL Values:\n")
 
-        # Summarize new values between HEL soil polygon and lidarHEL raster
-        outPolyTabulate = "in_memory" + os.sep + os.path.basename(arcpy.CreateScratchName("HEL_Polygon_Tabulate",data_type="ArcInfoTable",workspace=scratchWS))
-        #outPolyTabulate = arcpy.CreateScratchName("HEL_Polygon_Tabulate",data_type="ArcInfoTable",workspace=scratchWS)
-
+        # Summarize new values between HEL soil polygon and lidarHEL raster.  The HEL and NHEL
+        # cells of every polygon are counted on the zone grid that was used for the K, T & R
+        # factors so no TabulateArea table or join is needed.
         zoneFld = arcpy.Describe(finalHELSummary).OIDFieldName
-        TabulateArea(finalHELSummary,zoneFld,lidarHEL,"VALUE",outPolyTabulate,cellSize)
-        tabulateFields = [fld.name for fld in arcpy.ListFields(outPolyTabulate)][2:]
-        scratchLayers.append(outPolyTabulate)
+        if not bNumpyEngine:
+            lidarArray,lidarLowerLeft,lidarCellSize = rasterToArray(lidarHEL)
+
+            # The zone grid is on the DEM grid; read the LiDAR HEL window of the DEM grid when the
+            # raster does not start at the DEM lower left corner or has a different number of cells.
+            demLowerLeft = (demDesc.extent.XMin,demDesc.extent.YMin)
+            if abs(lidarCellSize - cellSize) > cellSize * 1e-6:
+                AddMsgAndPrint("\n\tThe LiDAR HEL raster cell size (" + str(lidarCellSize) + ") does not match the DEM (" + str(cellSize) + "). Exiting!",2)
+                removeScratchLayers()
+                sys.exit()
+
+            if lidarArray.shape != zoneArray.shape or abs(lidarLowerLeft.X - demLowerLeft[0]) > cellSize / 2 or abs(lidarLowerLeft.Y - demLowerLeft[1]) > cellSize / 2:
+                AddMsgAndPrint("\tLiDAR HEL raster is not on the DEM grid; reading it on the DEM grid",1)
+                lidarArray = arcpy.RasterToNumPyArray(lidarHEL,arcpy.Point(demLowerLeft[0],demLowerLeft[1]),zoneArray.shape[1],zoneArray.shape[0],0)
+            del lidarLowerLeft,lidarCellSize,demLowerLeft
+
+        # [zoneID,1] = NHEL area; [zoneID,2] = HEL area in square linear units
+        polyTabulate = HEL_Rasterize.tabulateArea(zoneArray,lidarArray,cellSize)
+        del lidarArray,zoneArray
 
         # Add 4 fields to Final HEL Summary layer
         newFields = ['Polygon_Acres','Final_HEL_Value','Final_HEL_Acres','Final_HEL_Percent']
@@ -1954,58 +2876,59 @@ if __name__ == '__main__':
                else:
                     arcpy.AddField_management(finalHELSummary,fld,"DOUBLE")
 
-        # In some cases, the finalHELSummary layer's OID field name was "OBJECTID_1" which
-        # conflicted with the output of the tabulate area table.
-        if zoneFld.find("_") > -1:
-            outputJoinFld = zoneFld
-        else:
-            outputJoinFld = zoneFld + "_1"
-        arcpy.JoinField_management(finalHELSummary,zoneFld,outPolyTabulate,outputJoinFld,tabulateFields)
-
         # Booleans to indicate if only HEL or only NHEL is present
         bOnlyHEL = False; bOnlyNHEL = False
 
-        # Check if VALUE_1(NHEL) or VALUE_2(HEL) are missing from outPolyTabulate table
-        finalHELSummaryFlds = [fld.name for fld in arcpy.ListFields(finalHELSummary)][2:]
-        if len(finalHELSummaryFlds):
-
-            # NHEL is not Present - so All is HEL; All is VALUE2
-            if not "VALUE_1" in tabulateFields:
-                AddMsgAndPrint("\tWARNING: Entire Area is HEL",1)
-                arcpy.AddField_management(finalHELSummary,"VALUE_1","DOUBLE")
-                arcpy.CalculateField_management(finalHELSummary,"VALUE_1",0)
-                bOnlyHEL = True
-
-            # HEL is not Present - All is NHEL; All is VALUE1
-            if not "VALUE_2" in tabulateFields:
-                AddMsgAndPrint("\tWARNING: Entire Area is NHEL",1)
-                arcpy.AddField_management(finalHELSummary,"VALUE_2","DOUBLE")
-                arcpy.CalculateField_management(finalHELSummary,"VALUE_2",0)
-                bOnlyNHEL = True
-        else:
+        if not polyTabulate[:,1:].sum():
             AddMsgAndPrint("\n\tReclassifying helFactor Failed",2)
             sys.exit()
 
-        newFields.append("VALUE_2")
+        # NHEL is not Present - so All is HEL
+        if not polyTabulate[:,1].sum():
+            AddMsgAndPrint("\tWARNING: Entire Area is HEL",1)
+            bOnlyHEL = True
+
+        # HEL is not Present - All is NHEL
+        if not polyTabulate[:,2].sum():
+            AddMsgAndPrint("\tWARNING: Entire Area is NHEL",1)
+            bOnlyNHEL = True
+
+        newFields.append("OID@")
         newFields.append("SHAPE@AREA")
         newFields.append(cluNumberFld)
+        newFields.append(helFld)
 
         # this will be used for field determination
         fieldDeterminationDict = dict()
 
-        # [polyAcres,finalHELvalue,finalHELacres,finalHELpct,"VALUE_2","SHAPE@AREA","CLUNBR"]
+        # [polyAcres,finalHELvalue,finalHELacres,finalHELpct,"OID@","SHAPE@AREA","CLUNBR",MUHELCL]
         with arcpy.da.UpdateCursor(finalHELSummary,newFields) as cursor:
             for row in cursor:
 
                 # Calculate polygon acres
                 row[0] = row[5] / acreConversionDict.get(arcpy.Describe(finalHELSummary).SpatialReference.LinearUnitName)
 
-                # Convert "VALUE_2" values to acres.  Represent acres from a poly that is HEL.
+                # Field was not processed; the polygon is HEL if its initial HEL value is HEL
+                # and NHEL otherwise (PHEL, NA), consistent with Final_HEL_Acres.
+                if not row[6] in lidarCLUs:
+                    if row[7] == 'HEL':
+                        row[1] = "HEL"
+                        row[2] = row[0]
+                        row[3] = 100.0
+                    else:
+                        row[1] = "NHEL"
+                        row[2] = 0.0
+                        row[3] = 0.0
+
+                    cursor.updateRow(row)
+                    continue
+
+                # Convert the HEL area of the polygon to acres.
                 # The intersection of CLU and soils may cause slivers below the tabulate cell size
-                # which will create NULLs.  Set these slivers to 0 acres.
-                try:
-                    row[2] = row[4] / acreConversionDict.get(arcpy.Describe(finalHELSummary).SpatialReference.LinearUnitName)
-                except:
+                # which will not have any cells.  Set these slivers to 0 acres.
+                if row[4] < len(polyTabulate):
+                    row[2] = polyTabulate[row[4],2] / acreConversionDict.get(arcpy.Describe(finalHELSummary).SpatialReference.LinearUnitName)
+                else:
                     row[2] = 0
 
                 # Calculate percentage of the polygon that is HEL
@@ -2036,7 +2959,8 @@ if __name__ == '__main__':
                 cursor.updateRow(row)
 
         # Delete unwanted fields from the finalHELSummary Layer
-        newFields.remove("VALUE_2")
+        newFields.remove("OID@")
+        newFields.remove(helFld)
         validFlds = [cluNumberFld,"STATECD","TRACTNBR","FARMNBR","COUNTYCD","CALCACRES",helFld,"MUSYM","MUNAME","MUWATHEL","MUWNDHEL"] + newFields
 
         deleteFlds = list()
@@ -2046,7 +2970,7 @@ if __name__ == '__main__':
                 deleteFlds.append(fld)
 
         arcpy.DeleteField_management(finalHELSummary,deleteFlds)
-        del zoneFld,finalHELSummaryFlds,tabulateFields,newFields,validFlds
+        del zoneFld,polyTabulate,newFields,validFlds
 
         ### ---------------------------------------------------------------------------------------------------- Determine if field is HEL/NHEL"""
         # Add 3 fields to fieldDetermination layer
@@ -2066,8 +2990,21 @@ if __name__ == '__main__':
         with arcpy.da.UpdateCursor(fieldDetermination,fieldList) as cursor:
             for row in cursor:
 
+                # Field was not processed; keep the original rating and get total clu acres from ogCLUinfoDict
+                if not row[3] in lidarCLUs:
+                    if ogCLUinfoDict.get(row[3])[0] == "HEL":
+                        helAcres = ogCLUinfoDict.get(row[3])[1]
+                        nhelAcres = 0.0
+                        helPct = 100.0
+                        nhelPct = 0.0
+                    else:
+                        nhelAcres = ogCLUinfoDict.get(row[3])[1]
+                        helAcres = 0.0
+                        helPct = 0.0
+                        nhelPct = 100.0
+
                 # if results are completely HEL or NHEL then get total clu acres from ogCLUinfoDict
-                if bOnlyHEL or bOnlyNHEL:
+                elif bOnlyHEL or bOnlyNHEL:
                     if bOnlyHEL:
                         helAcres = ogCLUinfoDict.get(row[3])[1]
                         nhelAcres = 0.0
@@ -2135,6 +3072,9 @@ if __name__ == '__main__':
         """----------------------------------------------------------------------------------------------------- Prepare Symboloby for ArcMap and 1026 form"""
         AddLayersToArcMap()
 
+        if bResultCache:
+            storeCachedResult(True)
+
         if not populateForm():
             AddMsgAndPrint("\nFailed to correclty populate NRCS-CPA-026e form",2)
 